@@ -0,0 +1,270 @@
+"""
+benchmarks/fleet_ops.py
+Rendimiento de extremo a extremo de las operaciones de flota (servicios,
+capturas, logs, SSH, hostname, reinicio) contra dispositivos de sustitución.
+
+Se arranca un servidor uvicorn local con una base SQLite temporal cuyos
+dispositivos apuntan a la flota de benchmarks/standins (una dirección de
+loopback por dispositivo, API del agente en el puerto 8000 y sshd falso en
+--ssh-port). Cada operación se ejecuta durante --duration segundos con
+--concurrency clientes simultáneos sobre dispositivos al azar, y se mide:
+operaciones por segundo, percentiles de latencia, tasa de errores y CPU del
+servidor durante esa operación.
+
+Los fallos de los dispositivos se inyectan con --latency-ms, --jitter-ms,
+--error-rate, --timeout-rate y --down-fraction. El puerto 8000 de las
+direcciones 127.0.1.x debe estar libre (un servidor de desarrollo en
+0.0.0.0:8000 lo ocupa). Requiere asyncssh para las operaciones SSH.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/fleet_ops.py --devices 50 --concurrency 10 --duration 15 --output base.json
+    python benchmarks/fleet_ops.py --latency-ms 80 --error-rate 0.02 --compare base.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+import httpx
+
+from fleet_sim import AUTH_HEADERS, local_server, percentile, process_cpu_seconds
+from standins import FaultProfile, StandinFleet
+
+SSH_USER = "pi"
+SSH_PASSWORD = "standin"
+
+
+def check_json_success(response) -> str:
+    return None if response.json().get("success") else "success=false"
+
+
+def check_services(response) -> str:
+    failed = [service["name"] for service in response.json().get("services", [])
+              if service.get("status") in ("error", "unknown")]
+    return f"sin estado: {','.join(failed)}" if failed else None
+
+
+def check_image(response) -> str:
+    return None if response.headers.get("content-type", "").startswith("image/") else "sin imagen"
+
+
+# Operación -> (método, ruta, argumentos de la petición, comprobación de la respuesta)
+OPERATIONS = {
+    "service_api": ("POST", "/api/device-services/{device_id}/videoloop/restart", {}, check_json_success),
+    "services_list": ("GET", "/api/device-services/{device_id}/services", {}, check_services),
+    "screenshot": ("GET", "/api/services/devices/{device_id}/screenshot", {}, check_image),
+    "logs": ("GET", "/api/devices/{device_id}/logs", {"params": {"lines": 200}}, None),
+    "ssh_validate": ("GET", "/api/devices/{device_id}/ssh/validate", {}, check_json_success),
+    "hostname": ("POST", "/api/devices/{device_id}/hostname", {"data": {"new_hostname": "standin-{n}"}},
+                 check_json_success),
+    "reboot": ("POST", "/api/devices/{device_id}/system/reboot", {}, check_json_success),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Operaciones de flota contra dispositivos de sustitución")
+    parser.add_argument("--devices", type=int, default=50, help="Dispositivos de sustitución")
+    parser.add_argument("--operations", default=",".join(OPERATIONS),
+                        help=f"Operaciones a medir, separadas por comas ({', '.join(OPERATIONS)})")
+    parser.add_argument("--concurrency", type=int, default=10, help="Peticiones simultáneas al servidor")
+    parser.add_argument("--duration", type=float, default=15.0, help="Segundos por operación")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout de cada petición al servidor")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Retardo medio de los dispositivos")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Variación del retardo (±)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas con error")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fracción de peticiones sin respuesta")
+    parser.add_argument("--down-fraction", type=float, default=0.0, help="Fracción de dispositivos apagados")
+    parser.add_argument("--reboot-seconds", type=float, default=0.0, help="Tiempo sin responder tras un reboot")
+    parser.add_argument("--first-address", default="127.0.1.1", help="Dirección del primer dispositivo")
+    parser.add_argument("--ssh-port", type=int, default=2222, help="Puerto del sshd falso")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn del servidor")
+    parser.add_argument("--server-log", default=None, help="Fichero para la salida del servidor")
+    parser.add_argument("--output", default=None, help="Fichero JSON con los resultados")
+    parser.add_argument("--compare", default=None, help="Resultados JSON de otra ejecución para comparar")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla aleatoria")
+    args = parser.parse_args()
+    unknown = set(args.operations.split(",")) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"Operaciones desconocidas: {', '.join(sorted(unknown))}")
+    return args
+
+
+def ping_shim(fleet: StandinFleet) -> str:
+    """
+    Directorio con un `ping` que responde por las direcciones de la flota
+
+    El verificador de ping del servidor desactiva los dispositivos que no
+    responden; en contenedores sin `ping` todos quedarían inactivos. Solo se
+    usa cuando el sistema no tiene `ping`.
+    """
+    directory = tempfile.mkdtemp(prefix="fleet_ops_ping_")
+    path = os.path.join(directory, "ping")
+    addresses = " ".join(device.address for device in fleet.devices)
+    with open(path, "w") as f:
+        # La dirección es el último argumento (ping -c 1 <dirección>)
+        f.write(f'#!/bin/sh\nfor target; do :; done\nfor address in {addresses}; do\n'
+                f'  [ "$address" = "$target" ] && exit 0\ndone\nexit 1\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return directory
+
+
+def seed_devices(fleet: StandinFleet):
+    """Dar de alta en la base temporal un dispositivo por cada uno de la flota"""
+    def seed(workdir: str):
+        from models import models
+        from models.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db.add_all([
+                models.Device(device_id=f"standin-{device.index:05d}", name=device.hostname,
+                              model="Raspberry Pi 4", mac_address=f"02:00:00:00:{device.index // 256:02x}:{device.index % 256:02x}",
+                              ip_address_lan=device.address, ip_address_wifi=device.address,
+                              tienda="STANDIN", is_active=True)
+                for device in fleet.devices
+            ])
+            db.commit()
+        finally:
+            db.close()
+        return [f"standin-{device.index:05d}" for device in fleet.devices]
+    return seed
+
+
+async def measure(client, name: str, device_ids, args, server_pid: int) -> dict:
+    """Ejecutar una operación durante args.duration segundos con args.concurrency clientes"""
+    method, path, options, check = OPERATIONS[name]
+    latencies, errors = [], Counter()
+    counter = iter(range(10 ** 9))
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            number = next(counter)
+            kwargs = {key: ({field: str(value).format(n=number) for field, value in value.items()}
+                            if isinstance(value, dict) else value)
+                      for key, value in options.items()}
+            started = time.perf_counter()
+            error = None
+            try:
+                response = await client.request(method, path.format(device_id=random.choice(device_ids)),
+                                                 headers=AUTH_HEADERS, **kwargs)
+                if response.status_code != 200:
+                    error = str(response.status_code)
+                elif check is not None:
+                    error = check(response)
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if error is not None:
+                errors[error] += 1
+
+    cpu_before, started = process_cpu_seconds(server_pid), time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    cpu_after = process_cpu_seconds(server_pid)
+
+    failed = sum(errors.values())
+    return {
+        "count": len(latencies),
+        "errors": failed,
+        "error_rate": round(failed / len(latencies), 4) if latencies else 0.0,
+        "throughput_ops": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+        "server_cpu_percent": round((cpu_after - cpu_before) / elapsed * 100, 1)
+        if cpu_before is not None and cpu_after is not None else None,
+        "error_breakdown": dict(errors),
+    }
+
+
+async def run(args, fleet: StandinFleet, url: str, device_ids, server_pid: int) -> dict:
+    results = {}
+    async with fleet, httpx.AsyncClient(base_url=url, timeout=args.timeout) as client:
+        for name in args.operations.split(","):
+            print(f"Midiendo {name} ({args.duration:.0f} s, {args.concurrency} clientes)...", flush=True)
+            results[name] = await measure(client, name, device_ids, args, server_pid)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    return {
+        "started_at": datetime.now().isoformat(),
+        "config": config,
+        "operations": results,
+        "standins": fleet.stats(),
+    }
+
+
+def print_summary(result: dict):
+    print(f"\n{'operación':<14} {'ops/s':>8} {'errores':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'CPU %':>7}")
+    for name, stats in result["operations"].items():
+        cpu = f"{stats['server_cpu_percent']:.0f}" if stats["server_cpu_percent"] is not None else "-"
+        print(f"{name:<14} {stats['throughput_ops']:>8.1f} {stats['errors']:>8} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {cpu:>7}"
+              + (f"  {stats['error_breakdown']}" if stats["errors"] else ""))
+    standins = result["standins"]
+    print(f"Dispositivos: {standins['devices']} ({standins['down']} apagados), {standins['reboots']} reinicios; "
+          f"peticiones recibidas: {standins['requests']}")
+
+
+def print_comparison(previous: dict, current: dict):
+    print(f"\nComparación con la ejecución del {previous['started_at'][:19]}:")
+    print(f"{'operación':<14} {'ops/s antes':>12} {'ahora':>8} {'cambio':>8} {'p95 antes':>10} {'ahora':>8} {'cambio':>8}")
+    for name, stats in current["operations"].items():
+        old = previous["operations"].get(name)
+        if not old:
+            continue
+        change = lambda before, after: f"{(after - before) / before * 100:+.0f} %" if before else ""
+        print(f"{name:<14} {old['throughput_ops']:>12.1f} {stats['throughput_ops']:>8.1f} "
+              f"{change(old['throughput_ops'], stats['throughput_ops']):>8} {old['p95_ms']:>10.1f} "
+              f"{stats['p95_ms']:>8.1f} {change(old['p95_ms'], stats['p95_ms']):>8}")
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    logging.getLogger("asyncssh").setLevel(logging.WARNING)
+
+    fleet = StandinFleet(
+        args.devices, first_address=args.first_address, ssh_port=args.ssh_port,
+        ssh_username=SSH_USER, ssh_password=SSH_PASSWORD,
+        faults=FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.timeout_rate),
+        down_fraction=args.down_fraction, reboot_seconds=args.reboot_seconds, seed=args.seed,
+    )
+    server_env = {
+        "SSH_PORT": str(args.ssh_port), "SSH_USER": SSH_USER, "SSH_PASSWORD": SSH_PASSWORD,
+        # Sin clave privada: el servidor se autentica con contraseña
+        "SSH_KEY_PATH": os.path.join(os.path.dirname(os.path.abspath(__file__)), "no-such-key"),
+    }
+    shim = None
+    if shutil.which("ping") is None:
+        shim = ping_shim(fleet)
+        server_env["PATH"] = shim + os.pathsep + os.environ.get("PATH", "")
+    try:
+        with local_server(seed_devices(fleet), args.workers, args.server_log, server_env) as (url, device_ids, pid):
+            result = asyncio.run(run(args, fleet, url, device_ids, pid))
+    finally:
+        if shim:
+            shutil.rmtree(shim, ignore_errors=True)
+
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), result)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
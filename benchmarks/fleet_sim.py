@@ -0,0 +1,524 @@
+"""
+benchmarks/fleet_sim.py
+Prueba de carga con una flota simulada de Raspberry.
+
+Cada dispositivo virtual ejecuta contra el servidor, por HTTP, el mismo
+bucle que el agente real:
+  1. se registra con POST /api/devices/ (tras un reinicio el servidor
+     responde 400 "ya registrado", que es lo normal),
+  2. informa de su estado con POST /api/devices/status cada --status-interval,
+  3. consulta /api/raspberry/playlists/active/{device_id} cada --poll-interval,
+  4. descarga por trozos (cabecera Range) los vídeos que no tiene, retomando
+     las descargas a medias después de un reinicio.
+
+Un "operador" asigna la playlist de prueba a la tienda de la flota con
+POST /api/device-playlists/bulk cada pocos segundos, así los dispositivos
+reciben vídeos poco después de registrarse.
+
+Llegada de los dispositivos (--arrival):
+  ramp     arranques repartidos uniformemente en --ramp segundos
+  poisson  llegadas de Poisson con la misma tasa media
+  storm    todos arrancan a la vez (dentro de --reboot-window segundos)
+Con --power-cut-at SEGUNDOS toda la flota se apaga en ese instante y vuelve a
+arrancar dentro de --reboot-window segundos (corte de luz en la tienda); los
+vídeos descargados se conservan.
+
+Sin --base-url se arranca un servidor uvicorn local con una base SQLite
+temporal, una playlist y vídeos de prueba, y la CPU del servidor se lee de
+/proc (Linux). Para cifras de capacidad reales, usar --base-url contra un
+servidor con la base de datos de producción (--playlist-id: playlist que se
+asigna a la flota; --server-pid: para medir su CPU si corre en esta máquina).
+
+El resultado (percentiles por operación, tasa de errores, CPU del servidor y
+una serie por segundo) se escribe en JSON con --output; --compare
+ANTERIOR.json muestra las diferencias con otra ejecución.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/fleet_sim.py --devices 500 --duration 120 --output base.json
+    python benchmarks/fleet_sim.py --devices 500 --duration 120 --power-cut-at 60 \\
+        --output corte.json --compare base.json
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+AUTH_HEADERS = {"Authorization": "Bearer " + "x" * 15}
+OPERATIONS = ("register", "status", "playlists", "download", "assign")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Prueba de carga con una flota simulada de Raspberry")
+    parser.add_argument("--devices", type=int, default=200, help="Dispositivos virtuales")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duración de la prueba (segundos)")
+    parser.add_argument("--arrival", choices=("ramp", "poisson", "storm"), default="ramp",
+                        help="Patrón de llegada de los dispositivos")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Segundos en los que arranca la flota (ramp/poisson)")
+    parser.add_argument("--power-cut-at", type=float, default=None,
+                        help="Segundo en el que toda la flota se apaga y vuelve a arrancar")
+    parser.add_argument("--reboot-window", type=float, default=5.0,
+                        help="Segundos en los que arranca la flota en storm y tras un corte de luz")
+    parser.add_argument("--status-interval", type=float, default=30.0, help="Periodo del informe de estado (segundos)")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Periodo de consulta de playlists (segundos)")
+    parser.add_argument("--chunk-kb", type=int, default=1024, help="Tamaño de cada trozo de descarga (KiB)")
+    parser.add_argument("--connections", type=int, default=500, help="Conexiones HTTP simultáneas máximas")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout de cada petición (segundos)")
+    parser.add_argument("--base-url", default=None, help="Servidor existente (por defecto, uno local temporal)")
+    parser.add_argument("--playlist-id", type=int, default=None, help="Playlist que se asigna a la flota (con --base-url)")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID del servidor para medir su CPU (con --base-url)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn del servidor local")
+    parser.add_argument("--server-log", default=None, help="Fichero para la salida del servidor local")
+    parser.add_argument("--videos", type=int, default=3, help="Vídeos de la playlist del servidor local")
+    parser.add_argument("--video-mb", type=float, default=4.0, help="Tamaño de cada vídeo del servidor local (MiB)")
+    parser.add_argument("--output", default=None, help="Fichero JSON con los resultados")
+    parser.add_argument("--compare", default=None, help="Resultados JSON de otra ejecución para comparar")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla aleatoria (ejecuciones reproducibles)")
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def jittered(seconds: float) -> float:
+    """Periodo con un ±10 % de variación, como los temporizadores de los agentes"""
+    return seconds * random.uniform(0.9, 1.1)
+
+
+class Recorder:
+    """Latencias, errores y serie por segundo de toda la prueba"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.timeline = defaultdict(lambda: {"requests": 0, "errors": 0})
+        self.cpu = {}
+        self.events = []
+        self.download_bytes = 0
+        self.videos_completed = 0
+        self.boots = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, operation: str, seconds: float, error: str = None):
+        self.latencies[operation].append(seconds)
+        second = self.timeline[int(self.elapsed())]
+        second["requests"] += 1
+        if error is not None:
+            self.errors[operation][error] += 1
+            second["errors"] += 1
+
+    def event(self, name: str):
+        self.events.append({"t": round(self.elapsed(), 2), "event": name})
+
+    def summary(self, config: dict) -> dict:
+        duration = self.elapsed()
+        operations = {}
+        for operation in OPERATIONS:
+            latencies = self.latencies.get(operation, [])
+            errors = sum(self.errors[operation].values())
+            operations[operation] = {
+                "count": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "max_ms": round(max(latencies, default=0) * 1000, 1),
+                "error_breakdown": dict(self.errors[operation]),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(sum(counter.values()) for counter in self.errors.values())
+        cpu_values = list(self.cpu.values())
+        return {
+            "started_at": datetime.now().isoformat(),
+            "config": config,
+            "duration_s": round(duration, 2),
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / duration, 1) if duration else 0.0,
+            "download_mb": round(self.download_bytes / 2 ** 20, 1),
+            "videos_completed": self.videos_completed,
+            "boots": self.boots,
+            "operations": operations,
+            "server_cpu": {
+                "mean_percent": round(sum(cpu_values) / len(cpu_values), 1),
+                "max_percent": round(max(cpu_values), 1),
+            } if cpu_values else None,
+            "events": self.events,
+            "timeline": [
+                {"t": second, **self.timeline[second], "cpu_percent": self.cpu.get(second)}
+                for second in sorted(self.timeline)
+            ],
+        }
+
+
+class DeviceState:
+    """Lo que un dispositivo conserva en disco entre reinicios"""
+
+    def __init__(self, tag: str, index: int):
+        self.device_id = f"sim-{tag}-{index:05d}"
+        digest = hashlib.md5(self.device_id.encode()).digest()
+        self.mac_address = "02:" + ":".join(f"{byte:02x}" for byte in digest[:5])
+        self.tienda = f"SIM-{tag}"
+        self.cache = set()
+        self.partial = {}
+
+
+async def call(client, recorder, operation, method, url, ok=(200,), **kwargs):
+    """Petición contabilizada; devuelve None si falló la conexión"""
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.record(operation, time.perf_counter() - started, type(e).__name__)
+        return None
+    error = None if response.status_code in ok else str(response.status_code)
+    recorder.record(operation, time.perf_counter() - started, error)
+    return response
+
+
+async def download(client, recorder, state: DeviceState, video: dict, chunk_bytes: int):
+    """Descargar un vídeo por trozos con Range, retomando desde lo ya descargado"""
+    video_id = video["id"]
+    while True:
+        offset = state.partial.get(video_id, 0)
+        headers = {"Range": f"bytes={offset}-{offset + chunk_bytes - 1}"}
+        started = time.perf_counter()
+        try:
+            async with client.stream("GET", video["file_path"], headers={**headers, **AUTH_HEADERS}) as response:
+                if response.status_code not in (200, 206):
+                    recorder.record("download", time.perf_counter() - started, str(response.status_code))
+                    return False
+                async for data in response.aiter_bytes():
+                    state.partial[video_id] = state.partial.get(video_id, 0) + len(data)
+                    recorder.download_bytes += len(data)
+                content_range = response.headers.get("content-range", "")
+        except httpx.HTTPError as e:
+            recorder.record("download", time.perf_counter() - started, type(e).__name__)
+            return False
+        recorder.record("download", time.perf_counter() - started)
+
+        # 200: el servidor envió el fichero completo; 206: "bytes a-b/total"
+        total = int(content_range.rsplit("/", 1)[1]) if "/" in content_range else 0
+        if response.status_code == 200 or state.partial[video_id] >= total:
+            state.partial.pop(video_id, None)
+            state.cache.add(video_id)
+            recorder.videos_completed += 1
+            return True
+
+
+async def device_loop(client, recorder, state: DeviceState, args, delay: float):
+    """Bucle del agente de un dispositivo desde el arranque"""
+    await asyncio.sleep(delay)
+    recorder.boots += 1
+    loop = asyncio.get_running_loop()
+    registered = False
+    next_status = next_poll = loop.time()
+    chunk_bytes = args.chunk_kb * 1024
+
+    while True:
+        if not registered:
+            response = await call(client, recorder, "register", "POST", "/api/devices/", ok=(201, 400), json={
+                "device_id": state.device_id, "name": state.device_id, "mac_address": state.mac_address,
+                "tienda": state.tienda, "location": "Simulación",
+            })
+            registered = response is not None and response.status_code in (201, 400)
+            if not registered:
+                await asyncio.sleep(jittered(5.0))
+                continue
+
+        now = loop.time()
+        if now >= next_status:
+            response = await call(client, recorder, "status", "POST", "/api/devices/status", json={
+                "device_id": state.device_id, "cpu_temp": random.uniform(45, 70),
+                "memory_usage": random.uniform(20, 60), "disk_usage": random.uniform(30, 50),
+                "videoloop_status": "active", "kiosk_status": "inactive",
+            })
+            registered = response is None or response.status_code != 404
+            next_status = now + jittered(args.status_interval)
+
+        if now >= next_poll:
+            response = await call(client, recorder, "playlists", "GET",
+                                  f"/api/raspberry/playlists/active/{state.device_id}")
+            if response is not None and response.status_code == 200:
+                for playlist in response.json():
+                    for video in playlist["videos"]:
+                        if video["id"] not in state.cache:
+                            await download(client, recorder, state, video, chunk_bytes)
+            next_poll = now + jittered(args.poll_interval)
+
+        await asyncio.sleep(max(0.0, min(next_status, next_poll) - loop.time()))
+
+
+async def operator_loop(client, recorder, tienda: str, playlist_id: int):
+    """Asignar la playlist a los dispositivos de la flota que ya se registraron"""
+    while True:
+        await call(client, recorder, "assign", "POST", "/api/device-playlists/bulk", headers=AUTH_HEADERS, json={
+            "action": "assign", "playlist_ids": [playlist_id], "selector": {"tienda": [tienda]},
+        })
+        await asyncio.sleep(5.0)
+
+
+def process_cpu_seconds(pid: int):
+    """Tiempo de CPU del proceso y de sus hijos directos (workers de uvicorn); None sin /proc"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    total, found = 0.0, False
+    for path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(path) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Los campos tras el nombre del proceso: estado, ppid, ..., utime (12), stime (13)
+        fields = stat.rsplit(")", 1)[1].split()
+        process_id = int(path.split("/")[2])
+        if process_id == pid or int(fields[1]) == pid:
+            total += (int(fields[11]) + int(fields[12])) / ticks
+            found = found or process_id == pid
+    return total if found else None
+
+
+async def cpu_sampler(recorder, pid: int):
+    """Porcentaje de CPU del servidor en cada segundo (100 = un núcleo)"""
+    last_cpu, last_time = process_cpu_seconds(pid), time.perf_counter()
+    if last_cpu is None:
+        return
+    while True:
+        await asyncio.sleep(1.0)
+        cpu, now = process_cpu_seconds(pid), time.perf_counter()
+        if cpu is None:
+            return
+        recorder.cpu[int(recorder.elapsed())] = (cpu - last_cpu) / (now - last_time) * 100
+        last_cpu, last_time = cpu, now
+
+
+def arrival_delays(args, count: int):
+    if args.arrival == "storm":
+        return [random.uniform(0, args.reboot_window) for _ in range(count)]
+    if args.arrival == "poisson":
+        delays, moment = [], 0.0
+        for _ in range(count):
+            moment += random.expovariate(count / args.ramp)
+            delays.append(moment)
+        return delays
+    return [args.ramp * index / count for index in range(count)]
+
+
+async def cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run(args, base_url: str, playlist_id: int, server_pid: int):
+    recorder = Recorder()
+    tag = uuid.uuid4().hex[:6]
+    states = [DeviceState(tag, index) for index in range(args.devices)]
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        background = []
+        if playlist_id is not None:
+            background.append(asyncio.create_task(operator_loop(client, recorder, states[0].tienda, playlist_id)))
+        if server_pid is not None:
+            background.append(asyncio.create_task(cpu_sampler(recorder, server_pid)))
+
+        recorder.event(f"arrival:{args.arrival}")
+        devices = [asyncio.create_task(device_loop(client, recorder, state, args, delay))
+                   for state, delay in zip(states, arrival_delays(args, len(states)))]
+
+        if args.power_cut_at is not None and args.power_cut_at < args.duration:
+            await asyncio.sleep(args.power_cut_at)
+            await cancel(devices)
+            recorder.event("power_cut")
+            devices = [asyncio.create_task(device_loop(client, recorder, state, args,
+                                                       random.uniform(0, args.reboot_window)))
+                       for state in states]
+            await asyncio.sleep(args.duration - args.power_cut_at)
+        else:
+            await asyncio.sleep(args.duration)
+
+        await cancel(devices + background)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    config.update({"base_url": base_url, "playlist_id": playlist_id})
+    return recorder.summary(config)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_local(workdir: str, videos: int, video_mb: float) -> int:
+    """Crear los vídeos y la playlist de prueba; devuelve el id de la playlist"""
+    from models import models
+    from models.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        playlist = models.Playlist(title="Simulación de flota", is_active=True)
+        db.add(playlist)
+        db.flush()
+        size = int(video_mb * 2 ** 20)
+        for index in range(videos):
+            path = os.path.join(workdir, f"video_{index}.mp4")
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+            video = models.Video(title=f"Vídeo {index}", file_path=path, file_size=size, duration=30)
+            db.add(video)
+            db.flush()
+            db.add(models.PlaylistVideo(playlist_id=playlist.id, video_id=video.id, position=(index + 1) * 1024))
+        db.commit()
+        return playlist.id
+    finally:
+        db.close()
+
+
+@contextmanager
+def local_server(seed, workers: int = 1, server_log: str = None, env: dict = None):
+    """
+    Servidor uvicorn temporal con una base SQLite nueva
+
+    Args:
+        seed: Función que recibe el directorio temporal y carga los datos de prueba
+        workers: Workers de uvicorn
+        server_log: Fichero para la salida del servidor (por defecto se descarta)
+        env: Variables de entorno adicionales del servidor
+
+    Yields:
+        (url, resultado de seed, pid del servidor)
+    """
+    workdir = tempfile.mkdtemp(prefix="fleet_sim_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/fleet_sim.db"
+    from models import models
+    from models.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    try:
+        seeded = seed(workdir)
+    finally:
+        engine.dispose()
+    port = free_port()
+    log = open(server_log, "w") if server_log else subprocess.DEVNULL
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=dict(os.environ, **(env or {})), stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"El servidor local terminó al arrancar (código {server.returncode})")
+            try:
+                if httpx.get(f"{url}/docs", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("El servidor local no respondió en 60 s")
+            time.sleep(0.2)
+        yield url, seeded, server.pid
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        if server_log:
+            log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_summary(result: dict):
+    print(f"Dispositivos: {result['config']['devices']} ({result['boots']} arranques), "
+          f"duración {result['duration_s']:.0f} s, {result['requests']} peticiones "
+          f"({result['throughput_rps']:.0f}/s), errores {result['error_rate'] * 100:.2f} %")
+    print(f"Descargado: {result['download_mb']} MiB, {result['videos_completed']} vídeos completos")
+    print(f"{'operación':<10} {'peticiones':>10} {'errores':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for operation, stats in result["operations"].items():
+        if stats["count"]:
+            print(f"{operation:<10} {stats['count']:>10} {stats['errors']:>8} {stats['p50_ms']:>9.1f} "
+                  f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+                  + (f"  {stats['error_breakdown']}" if stats["errors"] else ""))
+    if result["server_cpu"]:
+        print(f"CPU del servidor: media {result['server_cpu']['mean_percent']} %, "
+              f"máx {result['server_cpu']['max_percent']} %")
+    if result["events"]:
+        print("Eventos:", ", ".join(f"{event['event']} ({event['t']} s)" for event in result["events"]))
+
+
+def print_comparison(previous: dict, current: dict):
+    def delta(old, new):
+        if not old:
+            return ""
+        return f"{(new - old) / old * 100:+.0f} %"
+
+    print(f"\nComparación con la ejecución del {previous['started_at'][:19]}:")
+    print(f"{'':<22} {'anterior':>10} {'actual':>10} {'cambio':>8}")
+    rows = [("peticiones/s", previous["throughput_rps"], current["throughput_rps"]),
+            ("errores %", previous["error_rate"] * 100, current["error_rate"] * 100)]
+    if previous.get("server_cpu") and current.get("server_cpu"):
+        rows.append(("CPU media %", previous["server_cpu"]["mean_percent"], current["server_cpu"]["mean_percent"]))
+    for operation in OPERATIONS:
+        old, new = previous["operations"].get(operation), current["operations"].get(operation)
+        if old and new and old["count"] and new["count"]:
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                rows.append((f"{operation} {key}", old[key], new[key]))
+    for label, old, new in rows:
+        print(f"{label:<22} {old:>10.1f} {new:>10.1f} {delta(old, new):>8}")
+
+
+def main():
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    if args.base_url:
+        result = asyncio.run(run(args, args.base_url.rstrip("/"), args.playlist_id, args.server_pid))
+    else:
+        seed = lambda workdir: seed_local(workdir, args.videos, args.video_mb)
+        with local_server(seed, args.workers, args.server_log) as (url, playlist_id, pid):
+            result = asyncio.run(run(args, url, playlist_id, pid))
+
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+benchmarks/loop_stall.py
+Mide cuánto se bloquea el bucle de eventos mientras se atienden los
+endpoints asíncronos más usados por los dispositivos.
+
+La aplicación se ejecuta en el mismo proceso (httpx + ASGITransport, sin
+tareas de arranque). Una tarea "latido" duerme INTERVALO milisegundos en
+bucle y registra cuánto tarda de más en despertar: ese retraso es el tiempo
+en que el bucle estuvo ocupado con trabajo síncrono (p. ej. consultas con la
+sesión síncrona dentro de un async def).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/loop_stall.py --devices 2000 --concurrency 50 --duration 10
+
+Sin DATABASE_URL se crea una base SQLite temporal con datos de prueba.
+Para comparar antes/después, ejecutar el mismo comando sobre cada versión.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+AUTH_HEADERS = {"Authorization": "Bearer " + "x" * 15}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bloqueos del bucle de eventos en los endpoints asíncronos")
+    parser.add_argument("--devices", type=int, default=2000, help="Dispositivos de prueba a crear")
+    parser.add_argument("--playlists", type=int, default=50, help="Playlists de prueba a crear")
+    parser.add_argument("--concurrency", type=int, default=50, help="Peticiones simultáneas")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duración de la prueba (segundos)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Periodo del latido (milisegundos)")
+    return parser.parse_args()
+
+
+def seed(devices: int, playlists: int):
+    """Crear datos de prueba en una base vacía"""
+    from sqlalchemy import text
+    from models.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if db.execute(text("SELECT COUNT(*) FROM devices")).scalar():
+            return
+        now = datetime.now()
+        db.execute(text(
+            "INSERT INTO videos (id, title, file_path, upload_date, duration) VALUES (:id, :title, 'f.mp4', :now, 30)"
+        ), [{"id": i, "title": f"Video {i}", "now": now} for i in range(1, playlists * 10 + 1)])
+        db.execute(text(
+            "INSERT INTO playlists (id, title, is_active, creation_date, start_date, expiration_date) "
+            "VALUES (:id, :title, :active, :now, :start, :end)"
+        ), [{"id": i, "title": f"Lista {i}", "active": i % 3 != 0, "now": now,
+             "start": now + timedelta(hours=i % 48), "end": now + timedelta(hours=i)} for i in range(1, playlists + 1)])
+        db.execute(text(
+            "INSERT INTO playlist_videos (playlist_id, video_id, position) VALUES (:p, :v, :pos)"
+        ), [{"p": p, "v": (p - 1) * 10 + k, "pos": (k + 1) * 1024} for p in range(1, playlists + 1) for k in range(1, 11)])
+        db.execute(text(
+            "INSERT INTO devices (device_id, name, mac_address, model, tienda, is_active, last_seen, registered_at) "
+            "VALUES (:d, :d, :d, 'Pi4', 'SDQ', 1, :now, :now)"
+        ), [{"d": f"bench-{i:05d}", "now": now} for i in range(devices)])
+        db.execute(text(
+            "INSERT INTO device_playlists (device_id, playlist_id) VALUES (:d, :p)"
+        ), [{"d": f"bench-{i:05d}", "p": 1 + (i + k) % playlists} for i in range(devices) for k in range(3)])
+        db.commit()
+    finally:
+        db.close()
+
+
+def request_factory(devices: int):
+    """Peticiones representativas de la flota y del panel"""
+    def make():
+        device_id = f"bench-{random.randrange(devices):05d}"
+        choice = random.random()
+        if choice < 0.4:
+            return "GET", f"/api/raspberry/playlists/active/{device_id}", None
+        if choice < 0.7:
+            return "POST", "/api/devices/status", {
+                "device_id": device_id, "cpu_temp": 50.0, "memory_usage": 30.0, "disk_usage": 40.0
+            }
+        if choice < 0.85:
+            return "GET", f"/ui/devices/{device_id}", None
+        return "GET", "/api/playlist-checker/upcoming-activations?hours=48", None
+    return make
+
+
+async def heartbeat(interval: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def worker(client, make_request, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        method, url, body = make_request()
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body, headers=AUTH_HEADERS)
+            if response.status_code >= 500:
+                errors.append(f"{response.status_code} {url}")
+        except Exception as e:
+            errors.append(f"{type(e).__name__} {url}")
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args):
+    import httpx
+    import main
+
+    seed(args.devices, args.playlists)
+
+    lags, latencies, errors = [], [], []
+    stop = asyncio.Event()
+    interval = args.interval / 1000
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        beat = asyncio.create_task(heartbeat(interval, lags, stop))
+        deadline = time.perf_counter() + args.duration
+        make_request = request_factory(args.devices)
+        await asyncio.gather(*[
+            worker(client, make_request, deadline, latencies, errors) for _ in range(args.concurrency)
+        ])
+        stop.set()
+        await beat
+
+    from models.database import async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+
+    ms = lambda seconds: f"{seconds * 1000:8.1f} ms"
+    print(f"Peticiones: {len(latencies)} en {args.duration:.0f} s ({len(latencies) / args.duration:.0f}/s), errores: {len(errors)}")
+    print(f"Latencia   p50 {ms(percentile(latencies, 0.5))}  p99 {ms(percentile(latencies, 0.99))}")
+    print(f"Bloqueo del bucle (latido de {args.interval:.0f} ms, {len(lags)} muestras):")
+    print(f"           p50 {ms(percentile(lags, 0.5))}  p99 {ms(percentile(lags, 0.99))}  máx {ms(max(lags, default=0))}")
+    print(f"           tiempo total bloqueado {ms(sum(lags))} ({statistics.mean(lags) * 1000 if lags else 0:.2f} ms de media)")
+    if errors:
+        print("Primeros errores:", errors[:5])
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if not os.environ.get("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/loop_stall.db"
+    asyncio.run(run(arguments))
@@ -0,0 +1,35 @@
+"""
+benchmarks/micro/bench_helpers.py
+Estado de las playlists (utils/helpers.py) sobre 100.000 playlists.
+"""
+
+from datetime import timedelta
+
+from utils.helpers import (
+    format_timedelta,
+    get_active_playlists_count,
+    get_playlist_status_info,
+    is_playlist_active,
+)
+
+
+def bench_is_playlist_active(benchmark, playlists, now):
+    active = benchmark(lambda: sum(1 for playlist in playlists if is_playlist_active(playlist, now)))
+    assert 0 < active < len(playlists)
+
+
+def bench_get_playlist_status_info(benchmark, playlists, now):
+    infos = benchmark(lambda: [get_playlist_status_info(playlist, now) for playlist in playlists])
+    assert len(infos) == len(playlists)
+
+
+def bench_get_active_playlists_count(benchmark, playlists, now):
+    counts = benchmark(get_active_playlists_count, playlists, now)
+    assert counts["total"] == len(playlists)
+    assert counts["active"] + counts["scheduled"] + counts["expired"] + counts["disabled"] == len(playlists)
+
+
+def bench_format_timedelta(benchmark):
+    deltas = [timedelta(seconds=seconds) for seconds in range(-50_000, 10_000_000, 1000)]
+    formatted = benchmark(lambda: [format_timedelta(delta) for delta in deltas])
+    assert formatted[0] == format_timedelta(-deltas[0])
@@ -0,0 +1,18 @@
+"""
+benchmarks/micro/bench_manifest.py
+Manifiesto JSON que descargan los dispositivos (router/raspberry.py).
+"""
+
+import json
+
+from router.raspberry import build_playlist_manifest
+
+
+def bench_build_playlist_manifest(benchmark, playlists_with_videos, now):
+    manifest = benchmark(build_playlist_manifest, playlists_with_videos, now)
+    assert manifest and all(playlist["videos"] for playlist in manifest)
+
+
+def bench_manifest_json(benchmark, playlists_with_videos, now):
+    body = benchmark(lambda: json.dumps(build_playlist_manifest(playlists_with_videos, now)))
+    assert body.startswith("[")
@@ -0,0 +1,17 @@
+"""
+benchmarks/micro/bench_register.py
+Limpieza de los campos del registro de dispositivos (POST /api/devices/).
+"""
+
+from utils.helpers import analyze_and_clean_string
+
+
+def bench_analyze_and_clean_string(benchmark, registration_payloads):
+    def clean_all():
+        return [
+            {key: analyze_and_clean_string(value, key) for key, value in payload.items()}
+            for payload in registration_payloads
+        ]
+
+    cleaned = benchmark(clean_all)
+    assert all("\x00" not in payload["device_id"] for payload in cleaned)
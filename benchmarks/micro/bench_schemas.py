@@ -0,0 +1,28 @@
+"""
+benchmarks/micro/bench_schemas.py
+Serialización de las respuestas con Pydantic, como la hace FastAPI con
+response_model: validación desde los objetos ORM y volcado a JSON.
+"""
+
+from typing import List
+
+from pydantic import TypeAdapter
+
+from models import schemas
+
+PLAYLIST_RESPONSES = TypeAdapter(List[schemas.PlaylistResponse])
+DEVICES = TypeAdapter(List[schemas.Device])
+
+
+def serialize(adapter: TypeAdapter, objects):
+    return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+
+
+def bench_playlist_response_serialization(benchmark, playlists_with_videos):
+    body = benchmark(serialize, PLAYLIST_RESPONSES, playlists_with_videos)
+    assert body.startswith(b"[")
+
+
+def bench_device_serialization(benchmark, devices):
+    body = benchmark(serialize, DEVICES, devices)
+    assert body.startswith(b"[")
@@ -0,0 +1,116 @@
+"""
+benchmarks/micro/compare.py
+Ejecuta los micro-benchmarks y compara la mediana de cada uno con la línea
+base guardada en baseline.json.
+
+Termina con código 1 si algún benchmark es más lento que la línea base en
+más de --threshold (por defecto un 25 %), para usarlo antes de desplegar.
+Las medidas dependen de la máquina: la línea base debe generarse con
+--update en la misma máquina (o el mismo tipo de runner) que las compara.
+Requiere pytest y pytest-benchmark en las versiones de requirements-dev.txt
+(pip install -r requirements-dev.txt).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/micro/compare.py
+    python benchmarks/micro/compare.py --update
+    python benchmarks/micro/compare.py --current resultados.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "baseline.json")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Comparar los micro-benchmarks con la línea base")
+    parser.add_argument("--update", action="store_true", help="Guardar los resultados como nueva línea base")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Empeoramiento máximo permitido de la mediana (0.25 = 25 %%)")
+    parser.add_argument("--current", default=None,
+                        help="JSON de pytest-benchmark ya generado (--benchmark-json) en lugar de ejecutar")
+    parser.add_argument("--baseline", default=BASELINE, help="Fichero de la línea base")
+    return parser.parse_args()
+
+
+def run_benchmarks() -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, "benchmarks.json")
+        subprocess.run([sys.executable, "-m", "pytest", HERE, "-q", f"--benchmark-json={output}"], check=True)
+        with open(output) as f:
+            return json.load(f)
+
+
+def summarize(report: dict) -> dict:
+    """Medidas de pytest-benchmark reducidas a lo que se compara (segundos)"""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "processor": report.get("machine_info", {}).get("cpu", {}).get("brand_raw") or platform.processor(),
+            "system": platform.platform(),
+        },
+        "benchmarks": {
+            bench["name"]: {key: bench["stats"][key] for key in ("min", "median", "mean", "stddev", "rounds")}
+            for bench in report["benchmarks"]
+        },
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Imprimir la tabla de diferencias y devolver los benchmarks que empeoraron"""
+    regressions = []
+    print(f"{'benchmark':<40} {'base ms':>10} {'actual ms':>10} {'cambio':>8}")
+    for name, stats in sorted(current["benchmarks"].items()):
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>10} {stats['median'] * 1000:>10.3f} {'nuevo':>8}")
+            continue
+        change = stats["median"] / base["median"] - 1
+        mark = ""
+        if change > threshold:
+            regressions.append(name)
+            mark = "  << más lento"
+        print(f"{name:<40} {base['median'] * 1000:>10.3f} {stats['median'] * 1000:>10.3f} {change * 100:>+7.1f}%{mark}")
+    for name in sorted(set(baseline["benchmarks"]) - set(current["benchmarks"])):
+        print(f"{name:<40} (ya no existe)")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    if args.current:
+        with open(args.current) as f:
+            current = summarize(json.load(f))
+    else:
+        current = summarize(run_benchmarks())
+
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"Línea base del {baseline['created_at']} ({baseline['machine']['processor']}, "
+          f"Python {baseline['machine']['python']})")
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) más lentos que la línea base en más de "
+              f"{args.threshold * 100:.0f} %: {', '.join(regressions)}")
+        return 1
+    print("\nSin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
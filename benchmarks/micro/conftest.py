@@ -0,0 +1,121 @@
+"""
+benchmarks/micro/conftest.py
+Datos de prueba de los micro-benchmarks.
+
+Los objetos son instancias de los modelos ORM sin sesión ni base de datos,
+así se mide también el acceso a atributos instrumentados de SQLAlchemy,
+igual que en los endpoints. Los datos se generan con una semilla fija y una
+fecha de referencia fija para que las ejecuciones sean comparables.
+"""
+
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Importar los modelos crea los motores; sin DATABASE_URL no se necesita PostgreSQL
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from models.models import Device, Playlist, Video  # noqa: E402
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+PLAYLISTS = 100_000
+
+# Los avisos de limpieza de campos no se escriben durante las mediciones
+logging.getLogger("utils.helpers").setLevel(logging.ERROR)
+
+
+def random_playlist(rng: random.Random, playlist_id: int) -> Playlist:
+    """Playlist en un estado al azar: desactivada, programada, caducada o activa"""
+    state = rng.random()
+    start_date = expiration_date = None
+    if state < 0.15:
+        is_active = False
+    else:
+        is_active = True
+        if state < 0.35:
+            start_date = NOW + timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+        elif state < 0.55:
+            expiration_date = NOW - timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+        elif state < 0.85:
+            start_date = NOW - timedelta(days=rng.randrange(1, 30))
+            expiration_date = NOW + timedelta(minutes=rng.randrange(1, 60 * 24 * 90))
+    return Playlist(id=playlist_id, title=f"Lista {playlist_id}", is_active=is_active,
+                    start_date=start_date, expiration_date=expiration_date,
+                    creation_date=NOW - timedelta(days=60))
+
+
+@pytest.fixture(scope="session")
+def now():
+    return NOW
+
+
+@pytest.fixture(scope="session")
+def playlists():
+    """100.000 playlists con todos los estados posibles"""
+    rng = random.Random(1234)
+    return [random_playlist(rng, playlist_id) for playlist_id in range(1, PLAYLISTS + 1)]
+
+
+@pytest.fixture(scope="session")
+def playlists_with_videos():
+    """200 playlists activas de 10 vídeos, algunos caducados (manifiesto y PlaylistResponse)"""
+    rng = random.Random(5678)
+    result = []
+    for playlist_id in range(1, 201):
+        playlist = Playlist(id=playlist_id, title=f"Lista {playlist_id}", description="Campaña de prueba",
+                            is_active=True, creation_date=NOW - timedelta(days=10),
+                            expiration_date=NOW + timedelta(days=rng.randrange(1, 30)))
+        playlist.videos = [
+            Video(id=playlist_id * 100 + position, title=f"Vídeo {position}", description=None,
+                  file_path=f"uploads/video_{playlist_id}_{position}.mp4", file_size=50 * 2 ** 20,
+                  duration=rng.randrange(10, 120), upload_date=NOW - timedelta(days=20),
+                  expiration_date=NOW + timedelta(days=rng.randrange(-5, 30)) if rng.random() < 0.5 else None)
+            for position in range(10)
+        ]
+        playlist.devices = []
+        result.append(playlist)
+    return result
+
+
+@pytest.fixture(scope="session")
+def devices(playlists_with_videos):
+    """1.000 dispositivos con 3 playlists asignadas cada uno (respuesta de GET /api/devices/)"""
+    result = []
+    for index in range(1000):
+        device = Device(id=index + 1, device_id=f"rpi-{index:05d}", name=f"Pantalla {index}", model="Pi4",
+                        mac_address=f"02:00:00:00:{index // 256:02x}:{index % 256:02x}",
+                        ip_address_lan=f"10.0.{index // 256}.{index % 256}", tienda="SDQ", location="Entrada",
+                        is_active=True, cpu_temp=55.0, memory_usage=40.0, disk_usage=35.0,
+                        videoloop_status="active", kiosk_status="inactive",
+                        last_seen=NOW, registered_at=NOW - timedelta(days=100))
+        device.playlists = [playlists_with_videos[(index + offset) % len(playlists_with_videos)]
+                            for offset in range(3)]
+        result.append(device)
+    return result
+
+
+@pytest.fixture(scope="session")
+def registration_payloads():
+    """Campos de 1.000 registros de dispositivos; uno de cada diez con caracteres de control"""
+    rng = random.Random(91011)
+    payloads = []
+    for index in range(1000):
+        dirty = rng.random() < 0.1
+        payloads.append({
+            "device_id": f"rpi-{index:05d}" + ("\x00" if dirty else ""),
+            "name": f"Pantalla {index}" + ("\r\n" if dirty else ""),
+            "mac_address": f"dc:a6:32:00:{index // 256:02x}:{index % 256:02x}",
+            "ip_address_lan": f"10.0.{index // 256}.{index % 256}",
+            "ip_address_wifi": None,
+            "location": "Entrada principal" + ("\x07" if dirty else ""),
+            "tienda": "SDQ",
+            "is_active": True,
+            "videoloop_enabled": True,
+            "kiosk_enabled": False,
+        })
+    return payloads
@@ -0,0 +1,17 @@
+"""
+benchmarks/standins
+Dispositivos de sustitución para probar y medir, en una sola máquina Linux,
+todo lo que el servidor hace contra las Raspberry: la API HTTP del agente
+(servicios, capturas de pantalla, logs) y SSH (systemctl, hostname, reboot).
+
+Uso independiente (desde la raíz del repositorio):
+    python -m benchmarks.standins --devices 100 --latency-ms 40 --error-rate 0.02
+
+Los dispositivos del servidor deben tener como IP las direcciones de la flota
+y el servidor debe usar SSH_PORT, SSH_USER y SSH_PASSWORD iguales a los de la
+flota; benchmarks/fleet_ops.py lo prepara todo automáticamente.
+"""
+
+from .fleet import FakeDevice, FaultProfile, StandinFleet
+
+__all__ = ["FakeDevice", "FaultProfile", "StandinFleet"]
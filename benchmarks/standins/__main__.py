@@ -0,0 +1,53 @@
+"""
+benchmarks/standins/__main__.py
+Arrancar la flota de sustitución hasta Ctrl+C.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from .fleet import FaultProfile, StandinFleet
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Flota de Raspberry de sustitución (API del agente + sshd)")
+    parser.add_argument("--devices", type=int, default=50, help="Dispositivos")
+    parser.add_argument("--first-address", default="127.0.1.1", help="Dirección del primer dispositivo")
+    parser.add_argument("--agent-port", type=int, default=8000, help="Puerto de la API del agente")
+    parser.add_argument("--ssh-port", type=int, default=2222, help="Puerto del sshd falso (0: sin SSH)")
+    parser.add_argument("--ssh-user", default="pi", help="Usuario SSH aceptado")
+    parser.add_argument("--ssh-password", default="standin", help="Contraseña SSH aceptada (también para sudo -S)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Retardo medio de cada respuesta")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variación del retardo (±)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas con error")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fracción de peticiones sin respuesta")
+    parser.add_argument("--down-fraction", type=float, default=0.0, help="Fracción de dispositivos apagados")
+    parser.add_argument("--reboot-seconds", type=float, default=30.0, help="Tiempo sin responder tras un reboot")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla aleatoria")
+    return parser.parse_args()
+
+
+async def run(args):
+    fleet = StandinFleet(
+        args.devices, first_address=args.first_address, agent_port=args.agent_port,
+        ssh_port=args.ssh_port or None, ssh_username=args.ssh_user, ssh_password=args.ssh_password,
+        faults=FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.timeout_rate),
+        down_fraction=args.down_fraction, reboot_seconds=args.reboot_seconds, seed=args.seed,
+    )
+    async with fleet:
+        print(f"{len(fleet.online)} dispositivos escuchando en {fleet.devices[0].address}-{fleet.devices[-1].address} "
+              f"(agente :{args.agent_port}, ssh :{args.ssh_port or '-'}); Ctrl+C para terminar")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            print(fleet.stats())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("asyncssh").setLevel(logging.WARNING)
+    try:
+        asyncio.run(run(parse_args()))
+    except KeyboardInterrupt:
+        pass
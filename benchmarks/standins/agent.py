@@ -0,0 +1,112 @@
+"""
+benchmarks/standins/agent.py
+API HTTP del agente de la Raspberry, emulada con asyncio.
+
+Rutas que usa el servidor:
+  GET /services/{servicio}/{acción}   start|stop|restart|enable|disable -> "success",
+                                      status -> running|stopped, is-enabled -> enabled|disabled
+  GET /service/{servicio}/status      (variante que usa el panel)
+  GET /api/screenshot[/]              imagen PNG
+  GET /api/logs?lines=N               últimas N líneas del journal
+
+Una conexión atiende una sola petición (Connection: close), como hace
+requests sin sesión desde el servidor.
+"""
+
+import asyncio
+import random
+import re
+import struct
+import zlib
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+SERVICE_ROUTE = re.compile(r"^/services?/(?P<name>[\w-]+)/(?P<action>[\w-]+)/?$")
+# Tiempo máximo que se retiene una petición a la que "no se responde"
+TIMEOUT_HOLD_SECONDS = 300
+
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    """PNG válido con ruido (no se comprime), del tamaño de una captura real reducida"""
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def http_response(status: int, body: bytes, content_type: str = "text/plain; charset=utf-8") -> bytes:
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Método y destino de la petición; el cuerpo se lee y se descarta"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None, None
+    method, target = request_line.decode("latin-1").split(" ")[:2]
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value.strip())
+    if content_length:
+        await reader.readexactly(content_length)
+    return method, target
+
+
+def route(device, method: str, target: str, screenshot: bytes):
+    """(código, cuerpo, tipo de contenido, nombre de la operación) para una petición"""
+    url = urlsplit(target)
+    match = SERVICE_ROUTE.match(url.path)
+    if method == "GET" and match:
+        output = device.service_action(match["name"], match["action"])
+        if output is None:
+            return 404, b"Servicio o accion no encontrados", "text/plain; charset=utf-8", "service"
+        return 200, output.encode(), "text/plain; charset=utf-8", f"service_{match['action']}"
+    if method == "GET" and url.path.rstrip("/") == "/api/screenshot":
+        return 200, screenshot, "image/png", "screenshot"
+    if method == "GET" and url.path == "/api/logs":
+        lines = int(parse_qs(url.query).get("lines", ["100"])[0])
+        return 200, "\n".join(device.log_lines(min(lines, 10_000))).encode(), "text/plain; charset=utf-8", "logs"
+    return 404, b"Not Found", "text/plain; charset=utf-8", "not_found"
+
+
+async def serve_agent(device, port: int, screenshot: bytes) -> asyncio.AbstractServer:
+    """Escuchar la API del agente de un dispositivo en su dirección"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, target = await asyncio.wait_for(read_request(reader), timeout=30)
+            if method is None:
+                return
+            if device.is_down():
+                # Reiniciando: la conexión se corta sin respuesta
+                return
+            status, body, content_type, operation = route(device, method, target, screenshot)
+            device.requests[f"http_{operation}"] += 1
+
+            outcome = device.faults.outcome(device.rng)
+            if outcome == "timeout":
+                # No responder hasta que el cliente se canse y cierre
+                await asyncio.wait_for(reader.read(), timeout=TIMEOUT_HOLD_SECONDS)
+                return
+            await device.faults.delay(device.rng)
+            if outcome == "error":
+                status, body, content_type = 500, b"Error simulado del agente", "text/plain; charset=utf-8"
+            writer.write(http_response(status, body, content_type))
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host=device.address, port=port, reuse_address=True)
@@ -0,0 +1,210 @@
+"""
+benchmarks/standins/fleet.py
+Flota de dispositivos de sustitución: estado de cada dispositivo falso,
+fallos inyectables y arranque de los servidores (API del agente y sshd).
+
+Cada dispositivo escucha en su propia dirección de loopback (127.0.1.1,
+127.0.1.2, ...; en Linux toda la red 127.0.0.0/8 es local), en el puerto de
+la API del agente (8000, el que usa el servidor) y en el puerto SSH
+(SSH_PORT del servidor). Los dispositivos "caídos" no escuchan: las
+conexiones se rechazan como con una Raspberry apagada.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import random
+import resource
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .agent import make_png, serve_agent
+from .sshd import asyncssh, generate_host_key, serve_ssh
+
+logger = logging.getLogger(__name__)
+
+SERVICES = ("videoloop", "kiosk")
+
+
+class FaultProfile:
+    """
+    Fallos inyectados en las respuestas de un dispositivo
+
+    Args:
+        latency_ms: Retardo medio antes de responder
+        jitter_ms: Variación aleatoria (uniforme, ±) del retardo
+        error_rate: Fracción de peticiones que fallan (HTTP 500 / código de salida 1)
+        timeout_rate: Fracción de peticiones que nunca reciben respuesta
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+
+    def outcome(self, rng: random.Random) -> str:
+        """'ok', 'error' o 'timeout'"""
+        draw = rng.random()
+        if draw < self.timeout_rate:
+            return "timeout"
+        if draw < self.timeout_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    async def delay(self, rng: random.Random):
+        seconds = max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if seconds:
+            await asyncio.sleep(seconds)
+
+
+class FakeDevice:
+    """Estado de una Raspberry falsa compartido por la API del agente y el sshd"""
+
+    def __init__(self, index: int, address: str, faults: FaultProfile, reboot_seconds: float, seed: int):
+        self.index = index
+        self.address = address
+        self.faults = faults
+        self.reboot_seconds = reboot_seconds
+        self.rng = random.Random(seed)
+        self.hostname = f"rpi-standin-{index:05d}"
+        self.services = {"videoloop": {"active": True, "enabled": True},
+                         "kiosk": {"active": False, "enabled": False}}
+        self.down_until = 0.0
+        self.reboots = 0
+        self.requests: Counter = Counter()
+
+    def is_down(self) -> bool:
+        return time.monotonic() < self.down_until
+
+    def reboot(self):
+        """Dejar de responder durante reboot_seconds; al volver solo arrancan los servicios habilitados"""
+        self.reboots += 1
+        self.down_until = time.monotonic() + self.reboot_seconds
+        for state in self.services.values():
+            state["active"] = state["enabled"]
+
+    def service_action(self, name: str, action: str) -> Optional[str]:
+        """
+        Aplicar una acción de systemctl
+
+        Returns:
+            Salida de la acción ('success', estado, ...) o None si el servicio no existe
+        """
+        state = self.services.get(name)
+        if state is None:
+            return None
+        if action in ("start", "restart"):
+            state["active"] = True
+        elif action == "stop":
+            state["active"] = False
+        elif action in ("enable", "disable"):
+            state["enabled"] = action == "enable"
+        elif action == "status":
+            return "running" if state["active"] else "stopped"
+        elif action == "is-active":
+            return "active" if state["active"] else "inactive"
+        elif action == "is-enabled":
+            return "enabled" if state["enabled"] else "disabled"
+        else:
+            return None
+        return "success"
+
+    def log_lines(self, count: int) -> List[str]:
+        """Últimas líneas del journal de los servicios, con el formato de journalctl"""
+        now = datetime.now()
+        return [
+            f"{(now - timedelta(seconds=count - line)).strftime('%b %d %H:%M:%S')} {self.hostname} "
+            f"{SERVICES[line % 2]}[{1000 + line % 2}]: reproduciendo vídeo {line % 10} (fotograma {line * 25})"
+            for line in range(count)
+        ]
+
+
+class StandinFleet:
+    """
+    Flota de dispositivos falsos en direcciones de loopback consecutivas
+
+    Args:
+        devices: Número de dispositivos
+        first_address: Dirección del primer dispositivo
+        agent_port: Puerto de la API del agente
+        ssh_port: Puerto del sshd falso (None: sin SSH)
+        faults: Fallos inyectados en todos los dispositivos
+        down_fraction: Fracción de dispositivos apagados (no escuchan)
+        reboot_seconds: Tiempo sin responder tras un reboot
+        ssh_username / ssh_password: Credenciales aceptadas (cualquier clave pública se acepta)
+        screenshot_size: (ancho, alto) de la captura de pantalla
+        seed: Semilla aleatoria
+    """
+
+    def __init__(self, devices: int, first_address: str = "127.0.1.1", agent_port: int = 8000,
+                 ssh_port: Optional[int] = 2222, faults: FaultProfile = None, down_fraction: float = 0.0,
+                 reboot_seconds: float = 0.0, ssh_username: str = "pi", ssh_password: str = "standin",
+                 screenshot_size=(320, 180), seed: int = 0):
+        rng = random.Random(seed)
+        first = ipaddress.ip_address(first_address)
+        self.agent_port = agent_port
+        self.ssh_port = ssh_port
+        self.ssh_username = ssh_username
+        self.ssh_password = ssh_password
+        self.faults = faults or FaultProfile()
+        self.devices = [
+            FakeDevice(index, str(first + index), self.faults, reboot_seconds, seed * 100_003 + index)
+            for index in range(devices)
+        ]
+        self.down = {device.address for device in self.devices if rng.random() < down_fraction}
+        self.screenshot = make_png(*screenshot_size, seed=seed)
+        self._servers = []
+
+    @property
+    def online(self) -> List[FakeDevice]:
+        return [device for device in self.devices if device.address not in self.down]
+
+    async def start(self):
+        # Dos sockets de escucha por dispositivo, más las conexiones abiertas
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+        host_key = None
+        if self.ssh_port is not None:
+            if asyncssh is None:
+                raise RuntimeError("El sshd falso necesita asyncssh (pip install asyncssh) o ssh_port=None")
+            host_key = generate_host_key()
+
+        for device in self.online:
+            self._servers.append(await serve_agent(device, self.agent_port, self.screenshot))
+            if host_key is not None:
+                self._servers.append(await serve_ssh(device, self.ssh_port, host_key,
+                                                     self.ssh_username, self.ssh_password))
+        logger.info(f"Flota de sustitución: {len(self.online)} dispositivos en {self.devices[0].address}"
+                    f"-{self.devices[-1].address} ({len(self.down)} apagados)")
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def stats(self) -> Dict:
+        """Peticiones atendidas por tipo y reinicios de toda la flota"""
+        requests = Counter()
+        for device in self.devices:
+            requests.update(device.requests)
+        return {
+            "devices": len(self.devices),
+            "down": len(self.down),
+            "reboots": sum(device.reboots for device in self.devices),
+            "requests": dict(requests),
+        }
@@ -0,0 +1,210 @@
+"""
+benchmarks/standins/sshd.py
+sshd falso de la Raspberry (asyncssh).
+
+Acepta la contraseña configurada o cualquier clave pública, y emula los
+comandos que lanza el servidor por SSH: validación de sudo, systemctl
+(start/stop/restart/enable/disable/status/is-active/is-enabled), cambio de
+hostname (/etc/hostname, /etc/hosts, hostnamectl, hostname) y reboot.
+Los comandos desconocidos terminan con código 127, como en bash.
+
+asyncssh es opcional: sin él solo se puede arrancar la API del agente.
+"""
+
+import asyncio
+import re
+from typing import Tuple
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+# Tiempo máximo que se retiene un comando al que "no se responde"
+TIMEOUT_HOLD_SECONDS = 300
+
+_SUDO = re.compile(r'^(?:echo\s+"(?P<password>[^"]*)"\s*\|\s*)?sudo\s+(?P<stdin>-S\s+)?')
+_SH_C = re.compile(r"^sh\s+-c\s+'(?P<command>.*)'$", re.S)
+_HEAD = re.compile(r"\s*\|\s*head\s+-n\s*(?P<lines>\d+)\s*$")
+_ECHO_TO_FILE = re.compile(r'^echo\s+"(?P<content>.*)"\s*>\s*(?P<path>\S+)$', re.S)
+
+OS_RELEASE = ('PRETTY_NAME="Raspbian GNU/Linux 11 (bullseye)"\nNAME="Raspbian GNU/Linux"\n'
+              'VERSION_ID="11"\nVERSION="11 (bullseye)"\nID=raspbian\nID_LIKE=debian\n')
+
+
+def systemctl_status(device, name: str) -> str:
+    state = device.services[name]
+    active = "active (running)" if state["active"] else "inactive (dead)"
+    enabled = "enabled" if state["enabled"] else "disabled"
+    lines = [
+        f"● {name}.service - {name}",
+        f"     Loaded: loaded (/etc/systemd/system/{name}.service; {enabled}; vendor preset: enabled)",
+        f"     Active: {active}",
+    ]
+    lines += [f"  {line}" for line in device.log_lines(20) if name in line]
+    return "\n".join(lines) + "\n"
+
+
+def run_command(device, command: str, password: str) -> Tuple[int, str, str]:
+    """
+    Ejecutar un comando en el dispositivo falso
+
+    Args:
+        device: FakeDevice
+        command: Línea de comandos tal como la envía el servidor
+        password: Contraseña válida para sudo -S
+
+    Returns:
+        (código de salida, stdout, stderr)
+    """
+    command = command.strip()
+    ignore_failure = command.endswith("|| true")
+    if ignore_failure:
+        command = command[:-len("|| true")].strip()
+    command = command.rstrip("&").strip()
+
+    sudo = _SUDO.match(command)
+    if sudo:
+        if sudo["stdin"] and sudo["password"] is not None and sudo["password"] != password:
+            stderr = "[sudo] password for pi: Sorry, try again.\nsudo: 1 incorrect password attempt\n"
+            return (0 if ignore_failure else 1), "", stderr
+        command = command[sudo.end():]
+    wrapped = _SH_C.match(command)
+    if wrapped:
+        command = wrapped["command"]
+    head = _HEAD.search(command)
+    if head:
+        command = command[:head.start()]
+
+    status, stdout, stderr = _dispatch(device, command.strip())
+    if head:
+        stdout = "".join(stdout.splitlines(keepends=True)[:int(head["lines"])])
+    if ignore_failure:
+        status = 0
+    return status, stdout, stderr
+
+
+def _dispatch(device, command: str) -> Tuple[int, str, str]:
+    words = command.split()
+    if not words:
+        return 0, "", ""
+    program = words[0]
+    device.requests[f"ssh_{program}"] += 1
+
+    written = _ECHO_TO_FILE.match(command)
+    if written:
+        if written["path"] == "/etc/hostname":
+            device.hostname = written["content"].strip()
+        return 0, "", ""
+    if program == "echo":
+        return 0, " ".join(words[1:]).strip('"') + "\n", ""
+    if program == "hostname":
+        if len(words) > 1:
+            device.hostname = words[1]
+            return 0, "", ""
+        return 0, device.hostname + "\n", ""
+    if program == "hostnamectl":
+        if words[1:2] == ["set-hostname"] and len(words) > 2:
+            device.hostname = words[2]
+            return 0, "", ""
+        return 0, f"   Static hostname: {device.hostname}\n  Operating System: Raspbian GNU/Linux 11 (bullseye)\n", ""
+    if program == "which":
+        known = {"hostnamectl", "systemctl", "hostname", "reboot", "shutdown"}
+        return (0, f"/usr/bin/{words[1]}\n", "") if words[1:2] and words[1] in known else (1, "", "")
+    if program == "cat":
+        files = {
+            "/etc/os-release": OS_RELEASE,
+            "/etc/hostname": device.hostname + "\n",
+            "/etc/hosts": f"127.0.0.1\tlocalhost\n::1\t\tlocalhost ip6-localhost ip6-loopback\n127.0.1.1\t{device.hostname}\n",
+        }
+        path = words[1] if len(words) > 1 else ""
+        if path in files:
+            return 0, files[path], ""
+        return 1, "", f"cat: {path}: No such file or directory\n"
+    if program in ("mv", "cp", "chmod", "rm", "sync", "true"):
+        return 0, "", ""
+    if program == "systemctl" and len(words) > 2:
+        action, name = words[1], words[2].removesuffix(".service")
+        if name == "systemd-hostnamed":
+            return 0, "", ""
+        if name not in device.services:
+            return 5, "", f"Failed to {action} {name}.service: Unit {name}.service not found.\n"
+        if action == "status":
+            return (0 if device.services[name]["active"] else 3), systemctl_status(device, name), ""
+        output = device.service_action(name, action)
+        if output is None:
+            return 1, "", f"Unknown command verb {action}.\n"
+        if action in ("is-active", "is-enabled"):
+            return (0 if output in ("active", "enabled") else 3), output + "\n", ""
+        return 0, "", ""
+    if program == "reboot" or (program == "shutdown" and "-r" in words and "now" in words):
+        device.reboot()
+        return 0, "", ""
+    if program == "shutdown":
+        return 0, "", "Shutdown scheduled, use 'shutdown -c' to cancel.\n"
+    return 127, "", f"bash: {program}: command not found\n"
+
+
+def generate_host_key():
+    """Clave de host para todos los sshd de la flota"""
+    return asyncssh.generate_private_key("ssh-ed25519")
+
+
+if asyncssh is not None:
+    class _StandinSSHServer(asyncssh.SSHServer):
+        """Autenticación del sshd falso de un dispositivo"""
+
+        def __init__(self, device, username: str, password: str):
+            self.device = device
+            self.username = username
+            self.password = password
+
+        def connection_made(self, conn):
+            self.device.requests["ssh_connection"] += 1
+            if self.device.is_down():
+                asyncio.get_running_loop().call_soon(conn.abort)
+
+        def begin_auth(self, username: str) -> bool:
+            return True
+
+        def password_auth_supported(self) -> bool:
+            return True
+
+        def validate_password(self, username: str, password: str) -> bool:
+            return username == self.username and password == self.password
+
+        def public_key_auth_supported(self) -> bool:
+            return True
+
+        def validate_public_key(self, username: str, key) -> bool:
+            return username == self.username
+
+
+async def serve_ssh(device, port: int, host_key, username: str, password: str):
+    """Escuchar SSH en la dirección de un dispositivo"""
+
+    async def handle(process):
+        outcome = device.faults.outcome(device.rng)
+        if outcome == "timeout":
+            # No terminar el comando hasta que el cliente cierre
+            try:
+                await asyncio.wait_for(process.stdin.read(), timeout=TIMEOUT_HOLD_SECONDS)
+            except Exception:
+                pass
+            process.close()
+            return
+        await device.faults.delay(device.rng)
+        if outcome == "error":
+            status, stdout, stderr = 1, "", "Error simulado del dispositivo\n"
+        else:
+            status, stdout, stderr = run_command(device, process.command or "", password)
+        process.stdout.write(stdout)
+        process.stderr.write(stderr)
+        process.exit(status)
+
+    return await asyncssh.listen(
+        host=device.address, port=port, reuse_address=True,
+        server_host_keys=[host_key],
+        server_factory=lambda: _StandinSSHServer(device, username, password),
+        process_factory=handle,
+    )
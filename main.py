@@ -6,15 +6,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse, JSONResponse
 from dotenv import load_dotenv
+import asyncio
+from datetime import datetime
 import logging
 import os
+import threading
+import time
 import uvicorn
 
 load_dotenv()
 
 # Importar los modelos para crear las tablas
 from models import models
-from models.database import engine
+from models.database import engine, async_engine
 
 # Importar los routers
 from router import videos, playlists, raspberry, ui, devices, device_playlists, services_enhanced as services, device_service_api
@@ -22,9 +26,29 @@ from router.auth import router as auth_router
 from router.users import router as users_router
 from router.playlist_checker_api import router as playlist_checker_router
 from router.ui_auth import router as ui_auth_router
+from router.device_logs import router as device_logs_router
+from router.system_api import router as system_router
+from router.search import router as search_router
+from router.metrics import router as metrics_router
+from utils.log_archive import start_log_archive_maintenance
+from utils.log_search import start_log_indexer
+from utils.list_checker import start_playlist_checker
+from utils.ping_checker import start_background_ping_checker
+from utils.search import ensure_search_tables
+from utils.playlist_export import start_playlist_file_janitor
+from utils.schema_indexes import start_schema_index_builder
+from utils.db_pool import bind_holder
+from utils.metrics import http_requests_in_progress, observe_request, route_template
+from utils.sql_accounting import track_sql
+from utils.profiler import SamplingProfiler, profile_store, profiling_requested, slow_request_sampler
+from utils.auth import request_is_admin
+from utils.session_store import session_store, start_session_store
+from utils.session_tokens import verify_session_token
 
 # Crear las tablas en la base de datos
 models.Base.metadata.create_all(bind=engine)
+# Tablas de búsqueda por subcadena de SQLite (FTS5); los índices pg_trgm los crea el líder
+ensure_search_tables(engine)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -45,11 +69,13 @@ app = FastAPI(
 # Función para verificar si el usuario está autenticado por cookie
 def is_authenticated(request: Request) -> bool:
     """Verificar si el usuario tiene una sesión válida por cookie"""
-    session_cookie = request.cookies.get("session")
-    if session_cookie and len(session_cookie) > 10:
-        # Verificación básica - en producción validar JWT o sesión en BD
-        return True
-    return False
+    # Token firmado: se valida sin consultar la base de datos (utils/session_tokens.py)
+    claims = verify_session_token(request.cookies.get("session"))
+    if claims is None:
+        return False
+    # last_seen se escribe por lotes (utils/session_store.py)
+    session_store.touch(claims.session_id)
+    return True
 
 # RUTAS DE REDIRECCIÓN
 @app.get("/login")
@@ -98,16 +124,14 @@ app.add_middleware(
 
 # Crear directorios si no existen
 UPLOAD_DIR = "uploads"
-PLAYLIST_DIR = "playlists"
 STATIC_DIR = "static"
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(PLAYLIST_DIR, exist_ok=True)
 os.makedirs(STATIC_DIR, exist_ok=True)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
-app.mount("/playlists", StaticFiles(directory=PLAYLIST_DIR), name="playlists")
+# Las exportaciones de playlists se generan en memoria (GET /api/playlists/{id}/download)
 
 templates = Jinja2Templates(directory='templates')
 
@@ -124,6 +148,32 @@ app.include_router(device_playlists.router)
 app.include_router(services.router)
 app.include_router(device_service_api.router)
 app.include_router(playlist_checker_router)
+app.include_router(device_logs_router)
+app.include_router(system_router)
+app.include_router(search_router)
+app.include_router(metrics_router)
+
+# Índices añadidos a tablas existentes (una vez, desde el proceso líder)
+start_schema_index_builder(app)
+# Retención y compactación periódica del archivo de logs de dispositivos
+start_log_archive_maintenance(app)
+# Indexación asíncrona de los logs archivados para la búsqueda de flota
+start_log_indexer(app)
+# Activación/desactivación de listas según sus fechas de inicio y fin
+start_playlist_checker(app)
+# Verificación periódica de la conectividad de los dispositivos
+start_background_ping_checker(app)
+# Limpieza de los ficheros de exportación de playlists que se acumulaban en disco
+start_playlist_file_janitor(app)
+# Revocaciones y last_seen de las sesiones (en cada proceso) y limpieza de las caducadas
+start_session_store(app)
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    # Cerrar las conexiones del motor asíncrono (sus hilos/conexiones no se cierran solos)
+    if async_engine is not None:
+        await async_engine.dispose()
+# Las tareas anteriores solo se ejecutan en el proceso líder (utils/leader_election.py)
 
 # Middleware de autenticación corregido que reconoce cookies
 @app.middleware("http")
@@ -193,6 +243,51 @@ async def auth_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# Registrar la ruta de cada petición para saber quién retiene las conexiones del pool,
+# la duración y el código de respuesta por plantilla de ruta (/metrics), las
+# sentencias SQL de la petición (cabecera Server-Timing y aviso de N+1), las
+# peticiones lentas y, si un administrador lo pide, el perfil de la petición.
+# Se declara después del de autenticación para ejecutarse antes (los middleware se apilan)
+@app.middleware("http")
+async def instrumentation_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    sql_stats = None
+    label = f"{request.method} {request.url.path}"
+    http_requests_in_progress.inc()
+    slow_token = slow_request_sampler.begin(label)
+    profiler = None
+    if profiling_requested(request) and request_is_admin(request):
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+    try:
+        with bind_holder(label), track_sql(label) as sql_stats:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers.append("Server-Timing", sql_stats.server_timing())
+        if profiler is not None:
+            profiler.stop()
+            profile_id = await asyncio.to_thread(profile_store.save, profiler, {
+                "method": request.method,
+                "path": request.url.path,
+                "query": request.url.query,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "sql_statements": sql_stats.statements,
+                "sql_ms": round(sql_stats.duration * 1000, 1),
+                "created_at": datetime.now().isoformat(),
+            })
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        slow_request_sampler.end(slow_token)
+        http_requests_in_progress.dec()
+        # El router guarda en el scope la ruta que atendió la petición
+        observe_request(request.method, route_template(request.scope), status,
+                        time.perf_counter() - started, sql_stats)
+
 # Evento de inicio
 @app.on_event("startup")
 async def startup_event():
@@ -1,8 +1,17 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex
 from dotenv import load_dotenv
+import logging
 import os
+import re
+
+from utils.db_pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
+from utils.sql_accounting import instrument_sql
+
 load_dotenv()
 # Configuración de la base de datos
 #SQLALCHEMY_DATABASE_URL = "sqlite:///./RaspDatos.db"
@@ -17,14 +26,143 @@ server_db = os.environ.get('POSTGRES_HOST')
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{user_db}:{password_db}@{server_db}/{db}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# DATABASE_URL permite usar otra base de datos (p. ej. SQLite para desarrollo y pruebas locales)
+SQLALCHEMY_DATABASE_URL = os.environ.get('DATABASE_URL') or SQLALCHEMY_DATABASE_URL
+
+# Pool de conexiones (por proceso; con varios workers se multiplica)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))  # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # segundos; -1 desactiva el reciclado
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+# Límite de duración de cada sentencia en PostgreSQL (milisegundos, 0 = sin límite)
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '0'))
+# Nombre con el que aparecen las conexiones en pg_stat_activity
+DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'raspberry-video-manager')
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_memory_sqlite(url: str) -> bool:
+    # SQLite en memoria usa un pool propio de una sola conexión
+    return _is_sqlite(url) and (url.split('://', 1)[-1] in ('', '/', '/:memory:') or 'mode=memory' in url)
+
+def pool_options(url: str, pool_class) -> dict:
+    """
+    Parámetros de create_engine para el pool de conexiones según el entorno
+    """
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not _is_memory_sqlite(url):
+        options.update({
+            "poolclass": pool_class,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        })
+    return options
+
+def connect_options(url: str) -> dict:
+    """
+    connect_args de cada controlador: statement_timeout y application_name
+    se fijan al abrir la conexión, así valen para todas las sesiones
+    """
+    if _is_sqlite(url):
+        return {"check_same_thread": False}
+    if '+asyncpg' in url.split('://', 1)[0]:
+        settings = {"application_name": DB_APPLICATION_NAME}
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+        return {"server_settings": settings}
+    if url.startswith("postgresql"):
+        options = {"application_name": DB_APPLICATION_NAME}
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            options["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        return options
+    return {}
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_options(SQLALCHEMY_DATABASE_URL),
+    **pool_options(SQLALCHEMY_DATABASE_URL, InstrumentedQueuePool)
+)
+instrument_engine(engine, "sync")
+instrument_sql(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Controladores asíncronos equivalentes a los síncronos (para los handlers async def)
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+def async_database_url(url: str) -> str:
+    """
+    URL de conexión asíncrona a partir de la síncrona (ASYNC_DATABASE_URL la sustituye)
+    """
+    scheme, separator, rest = url.partition('://')
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL') or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+try:
+    async_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_DATABASE_URL,
+        connect_args=connect_options(SQLALCHEMY_ASYNC_DATABASE_URL),
+        **pool_options(SQLALCHEMY_ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool)
+    )
+    instrument_engine(async_engine.sync_engine, "async")
+    instrument_sql(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+except ImportError as e:
+    # Falta asyncpg/aiosqlite: los endpoints asíncronos devolverán error al pedir sesión
+    logging.getLogger(__name__).warning(f"Base de datos asíncrona no disponible: {str(e)}")
+    async_engine = None
+    AsyncSessionLocal = None
+
+def create_index_statement(index, dialect) -> str:
+    """
+    CREATE INDEX IF NOT EXISTS de un índice; en PostgreSQL, CONCURRENTLY para
+    no bloquear las escrituras en la tabla mientras se construye
+    """
+    statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    if dialect.name == 'postgresql':
+        statement = re.sub(r'^CREATE (UNIQUE )?INDEX', r'CREATE \1INDEX CONCURRENTLY', statement)
+    return statement
+
+def ensure_indexes(bind=None):
+    """
+    Crea los índices declarados en los modelos que falten en la base de datos.
+    create_all no añade índices nuevos a tablas que ya existen.
+
+    Una sentencia por índice en autocommit (CONCURRENTLY no admite
+    transacciones). Se ejecuta desde el proceso líder (utils/schema_indexes.py);
+    si otro proceso crea el mismo índice a la vez, el error se ignora.
+    """
+    bind = bind or engine
+    logger = logging.getLogger(__name__)
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    conn.execute(text(create_index_statement(index, bind.dialect)))
+                except DBAPIError as e:
+                    logger.warning(f"No se pudo crear el índice {index.name}: {str(e.orig)}")
+
 # Dependencia para obtener la sesión de la base de datos
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependencia para obtener una sesión asíncrona (no bloquea el bucle de eventos)
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Base de datos asíncrona no disponible: instale asyncpg (PostgreSQL) o aiosqlite (SQLite)")
+    async with AsyncSessionLocal() as db:
+        yield db
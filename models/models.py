@@ -1,13 +1,13 @@
 # models/models.py (reemplaza COMPLETAMENTE el archivo actual)
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, UniqueConstraint, Float, func, or_
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, UniqueConstraint, Index, Float, LargeBinary, func, or_
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from typing import Optional
 from datetime import datetime
 from enum import Enum
 from .database import Base
-from passlib.context import CryptContext
+from utils.passwords import password_hasher
 
 # Tabla de relación entre Playlist y Video (modelo asociativo)
 class PlaylistVideo(Base):
@@ -48,6 +48,7 @@ class Playlist(Base):
     videos = relationship(
         "Video", 
         secondary="playlist_videos",
+        order_by="PlaylistVideo.position",
         viewonly=True,
         backref="playlists"
     )
@@ -62,6 +63,16 @@ class Playlist(Base):
         viewonly=True
     )
     
+    # Índices para las transiciones de estado del verificador de listas
+    __table_args__ = (
+        Index('ix_playlists_active_start_date', 'is_active', 'start_date'),
+        Index('ix_playlists_active_expiration_date', 'is_active', 'expiration_date'),
+        # Paginación por cursor sobre (clave de ordenación, id)
+        Index('ix_playlists_title_id', 'title', 'id'),
+        Index('ix_playlists_creation_date_id', 'creation_date', 'id'),
+        Index('ix_playlists_expiration_date_id', 'expiration_date', 'id'),
+    )
+    
     @property
     def is_currently_active(self):
         """
@@ -97,6 +108,13 @@ class Video(Base):
     # Relación con PlaylistVideo
     playlist_videos = relationship("PlaylistVideo", back_populates="video", cascade="all, delete-orphan")
     
+    # Paginación por cursor sobre (clave de ordenación, id)
+    __table_args__ = (
+        Index('ix_videos_title_id', 'title', 'id'),
+        Index('ix_videos_upload_date_id', 'upload_date', 'id'),
+        Index('ix_videos_expiration_date_id', 'expiration_date', 'id'),
+    )
+    
     @property
     def formatted_duration(self):
         """Devuelve la duración formateada como HH:MM:SS"""
@@ -161,7 +179,9 @@ class Device(Base):
     kiosk_enabled = Column(Boolean, default=False)  # Indica si el servicio está habilitado para iniciar con el sistema
     last_seen = Column(DateTime, default=func.now(), onupdate=func.now())
     registered_at = Column(DateTime, default=func.now())
-    service_logs = Column(String, nullable=True)
+    # Obsoleto: los logs se guardan en device_log_chunks. Se difiere la carga
+    # para que los listados y el detalle no arrastren el texto de la columna.
+    service_logs = deferred(Column(String, nullable=True))
     
     # Relación con DevicePlaylist
     device_playlists = relationship("DevicePlaylist", back_populates="device", cascade="all, delete-orphan")
@@ -172,6 +192,47 @@ class Device(Base):
         secondary="device_playlists",
         viewonly=True
     )
+    
+    # Relación con el archivo de logs (solo se carga si se accede explícitamente)
+    log_chunks = relationship(
+        "DeviceLogChunk",
+        back_populates="device",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+    
+    # Paginación por cursor del listado de dispositivos (clave de ordenación, id)
+    __table_args__ = (
+        Index('ix_devices_name_id', 'name', 'id'),
+        Index('ix_devices_tienda_id', 'tienda', 'id'),
+        Index('ix_devices_location_id', 'location', 'id'),
+    )
+
+class DeviceLogChunk(Base):
+    """
+    Bloque comprimido del archivo de logs de un dispositivo.
+    Solo se insertan bloques nuevos (append-only); la compactación
+    sustituye varios bloques pequeños por uno equivalente.
+    """
+    __tablename__ = "device_log_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String, ForeignKey("devices.device_id", ondelete="CASCADE"), nullable=False)
+    first_ts = Column(DateTime, nullable=False)  # Marca de tiempo de la primera línea
+    last_ts = Column(DateTime, nullable=False)  # Marca de tiempo de la última línea
+    line_count = Column(Integer, nullable=False, default=0)
+    raw_size = Column(Integer, nullable=False, default=0)  # Tamaño sin comprimir en bytes
+    tail_hash = Column(String(64), nullable=True)  # Hash de la última línea para deduplicar
+    last_seq = Column(BigInteger, nullable=True)  # Cursor/secuencia del agente, si la envía
+    data = Column(LargeBinary, nullable=False)  # Líneas comprimidas con zlib
+    created_at = Column(DateTime, default=datetime.now)
+    
+    device = relationship("Device", back_populates="log_chunks")
+    
+    __table_args__ = (
+        Index('ix_device_log_chunks_device_last_ts', 'device_id', 'last_ts'),
+        Index('ix_device_log_chunks_last_ts', 'last_ts'),
+    )
 
 # Scripts de migración para añadir nuevos campos
 migration_scripts = {
@@ -222,9 +283,6 @@ def apply_migration(engine):
     print("Migración aplicada correctamente.")
 
 
-# Configuración de encriptación de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class AuthProvider(str, Enum):
     """Proveedores de autenticación"""
     LOCAL = "local"
@@ -264,19 +322,36 @@ class User(Base):
     @password.setter
     def password(self, password):
         if password:
-            from passlib.context import CryptContext
-            pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-            self.password_hash = pwd_context.hash(password)
+            self.password_hash = password_hasher.hash(password)
         else:
             self.password_hash = None
         
     def verify_password(self, password: str) -> bool:
-        """Verifica la contraseña para usuarios locales"""
+        """
+        Verifica la contraseña para usuarios locales. Si el hash usa otro
+        coste lo recalcula (el llamador debe hacer commit).
+        """
         if not self.password_hash or self.auth_provider != "local":
             return False
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.verify(password, self.password_hash)
+        valid, new_hash = password_hasher.verify(password, self.password_hash)
+        if valid and new_hash:
+            self.password_hash = new_hash
+        return valid
+    
+    async def verify_password_async(self, password: str) -> bool:
+        """
+        verify_password() sin bloquear el bucle de eventos: bcrypt se ejecuta
+        en el pool de hilos del hasher (utils/passwords.py)
+        
+        Raises:
+            PasswordHasherBusy: Si hay demasiadas verificaciones en espera
+        """
+        if not self.password_hash or self.auth_provider != "local":
+            return False
+        valid, new_hash = await password_hasher.verify_async(password, self.password_hash)
+        if valid and new_hash:
+            self.password_hash = new_hash
+        return valid
     
     def update_last_login(self):
         """Actualiza la fecha del último login"""
@@ -305,8 +380,14 @@ class User(Base):
     
     @classmethod
     def create_user(cls, db, username, email=None, password=None, fullname=None, 
-                   department=None, is_admin=False, auth_provider="local", ad_dn=None):
-        """Crea un nuevo usuario"""
+                   department=None, is_admin=False, auth_provider="local", ad_dn=None, password_hash=None):
+        """
+        Crea un nuevo usuario
+
+        Desde código asíncrono, pasar password_hash ya calculado con
+        password_hasher.hash_async() en lugar de password: el setter de
+        password ejecuta bcrypt en el hilo que llama.
+        """
         user = cls(
             username=username,
             email=email,
@@ -317,7 +398,9 @@ class User(Base):
             ad_dn=ad_dn
         )
         
-        if password and auth_provider == "local":
+        if password_hash and auth_provider == "local":
+            user.password_hash = password_hash
+        elif password and auth_provider == "local":
             user.password = password
         else:
             user.password_hash = None
@@ -327,6 +410,24 @@ class User(Base):
         db.refresh(user)
         return user
 
+class UserSession(Base):
+    """
+    Sesión de usuario. El token de sesión firmado lleva el session_id (jti);
+    el middleware no consulta esta tabla (utils/session_tokens.py) y las
+    lecturas pasan por una caché local (utils/session_store.py).
+    """
+    __tablename__ = "sessions"
+
+    session_id = Column(String(32), primary_key=True)  # jti del token
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    username = Column(String(50), nullable=False)
+    is_admin = Column(Boolean, default=False)
+    auth_provider = Column(String(20), default="local")
+    created_at = Column(DateTime, default=datetime.now)
+    expires_at = Column(DateTime, nullable=False, index=True)  # Caducidad del token; después se borra la fila
+    last_seen = Column(DateTime, nullable=True)  # Se escribe por lotes, con retraso
+    revoked_at = Column(DateTime, nullable=True, index=True)  # Logout antes de caducar
+
 # Clase para logs de sincronización con AD
 class ADSyncLog(Base):
     __tablename__ = "ad_sync_logs"
@@ -2,7 +2,7 @@
 
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-from typing import List, Optional, ForwardRef
+from typing import List, Optional, ForwardRef, Literal
 import warnings
 warnings.filterwarnings("ignore", message="Valid config keys have changed in V2")
 
@@ -63,11 +63,12 @@ class PlaylistResponse(PlaylistBase):
 # Esquemas para Device
 class DeviceBase(BaseModel):
     device_id: str
-    name: str
-    model: str
+    # Columnas opcionales: el registro (DeviceCreate) no obliga a enviarlas
+    name: Optional[str] = None
+    model: Optional[str] = None
     ip_address_lan: Optional[str] = None
     ip_address_wifi: Optional[str] = None
-    mac_address: str
+    mac_address: Optional[str] = None
     wlan0_mac: Optional[str] = None
     location: Optional[str] = None
     tienda: Optional[str] = None
@@ -193,6 +194,29 @@ class DevicePlaylistResponse(DevicePlaylistBase):
     class Config:
         orm_mode = True
 
+# Asignación masiva por selector de dispositivos
+class DeviceSelector(BaseModel):
+    device_ids: Optional[List[str]] = None
+    tienda: Optional[List[str]] = None
+    location: Optional[List[str]] = None
+    model: Optional[List[str]] = None
+    active_only: bool = False
+    all_devices: bool = Field(False, description="Permite un selector sin filtros (todos los dispositivos)")
+
+class DevicePlaylistBulk(BaseModel):
+    action: Literal["assign", "unassign"]
+    playlist_ids: List[int] = Field(..., min_items=1)
+    selector: DeviceSelector
+    dry_run: bool = False
+
+class DevicePlaylistBulkResult(BaseModel):
+    action: str
+    dry_run: bool
+    playlist_ids: List[int]
+    matched_devices: int
+    affected_assignments: int
+    affected_devices: Optional[List[str]] = None
+
 # Estado del dispositivo
 class DeviceStatus(BaseModel):
     device_id: str
@@ -205,6 +229,41 @@ class DeviceStatus(BaseModel):
     kiosk_status: Optional[str] = Field(None, description="Status of kiosk service")
     wlan0_mac: Optional[str] = Field(None, description="MAC address of WiFi interface")
 
+# Lote de logs enviado por el agente del dispositivo
+class LogEntry(BaseModel):
+    seq: int = Field(..., ge=0, description="Número de secuencia monótono del agente")
+    ts: datetime = Field(..., description="Marca de tiempo de la entrada del journal")
+    message: str
+
+    @validator('ts')
+    def normalize_ts(cls, v):
+        """Hora local sin zona, como el resto del archivo (datetime.now())"""
+        if v.tzinfo is not None:
+            return v.astimezone().replace(tzinfo=None)
+        return v
+
+class LogBatch(BaseModel):
+    entries: List[LogEntry] = []
+
+class LogBatchAck(BaseModel):
+    device_id: str
+    accepted: int
+    duplicates: int
+    ack_seq: Optional[int] = Field(None, description="Secuencia más alta archivada (high-water mark)")
+
+# Edición en bloque de los videos de una playlist
+class PlaylistItemOperation(BaseModel):
+    op: Literal["add", "remove", "move"]
+    video_id: int
+    after_video_id: Optional[int] = Field(None, description="Colocar justo después de este video")
+    before_video_id: Optional[int] = Field(None, description="Colocar justo antes de este video")
+
+class PlaylistItemsBulk(BaseModel):
+    operations: List[PlaylistItemOperation] = Field(..., min_items=1, max_items=1000)
+
+class PlaylistReorder(BaseModel):
+    video_ids: List[int] = Field(..., description="Todos los videos de la playlist en el nuevo orden")
+
 # Servicio
 class ServiceStatus(BaseModel):
     name: str
@@ -11,6 +11,8 @@ import os
 from models.database import get_db
 from models.models import User
 from utils.auth_enhanced import auth_service
+from utils.passwords import PASSWORD_HASH_RETRY_AFTER, PasswordHasherBusy
+from utils.session_tokens import SESSION_TTL_SECONDS
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -61,11 +63,11 @@ async def login(
     
     try:
         # Intentar autenticación con el servicio mejorado
-        success, user, message = auth_service.authenticate_user(db, username, password)
+        success, user, message = await auth_service.authenticate_user(db, username, password)
         
         if success and user:
             # Crear token de acceso
-            token_data = auth_service.create_access_token(user)
+            token_data = auth_service.create_access_token(db, user)
             
             # Configurar cookie de sesión
             response = RedirectResponse(url=next, status_code=302)
@@ -73,7 +75,7 @@ async def login(
                 key="session",
                 value=token_data["access_token"],
                 httponly=True,
-                max_age=86400,  # 24 horas
+                max_age=SESSION_TTL_SECONDS,
                 path="/",
                 secure=False  # Cambiar a True en producción con HTTPS
             )
@@ -87,6 +89,10 @@ async def login(
             error_url = f"/login?error={message}&next={next}"
             return RedirectResponse(url=error_url, status_code=302)
             
+    except PasswordHasherBusy:
+        logger.warning(f"Login rechazado por carga para: {username}")
+        error_url = f"/login?error=Servidor ocupado, inténtalo de nuevo en unos segundos&next={next}"
+        return RedirectResponse(url=error_url, status_code=302)
     except Exception as e:
         logger.error(f"Error inesperado en login: {str(e)}")
         error_url = f"/login?error=Error interno del servidor&next={next}"
@@ -102,11 +108,11 @@ async def api_login(
     
     try:
         # Intentar autenticación
-        success, user, message = auth_service.authenticate_user(db, username, password)
+        success, user, message = await auth_service.authenticate_user(db, username, password)
         
         if success and user:
             # Crear token de acceso
-            token_data = auth_service.create_access_token(user)
+            token_data = auth_service.create_access_token(db, user)
             
             logger.info(f"API Login exitoso: {username} (proveedor: {user.auth_provider})")
             
@@ -126,6 +132,12 @@ async def api_login(
                 "auth_provider": None
             }, status_code=401)
             
+    except PasswordHasherBusy:
+        logger.warning(f"API Login rechazado por carga para: {username}")
+        return JSONResponse({
+            "success": False,
+            "message": "Servidor ocupado, inténtalo de nuevo en unos segundos"
+        }, status_code=503, headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)})
     except Exception as e:
         logger.error(f"Error en API login: {str(e)}")
         return JSONResponse({
@@ -134,7 +146,7 @@ async def api_login(
         }, status_code=500)
 
 @router.get("/logout")
-async def logout(request: Request, response: Response):
+async def logout(request: Request, response: Response, db: Session = Depends(get_db)):
     """Maneja el logout"""
     
     # Obtener session ID
@@ -142,7 +154,7 @@ async def logout(request: Request, response: Response):
     
     if session_id:
         # Revocar sesión
-        auth_service.revoke_session(session_id)
+        auth_service.revoke_session(db, session_id)
         logger.info(f"Sesión revocada: {session_id[:10]}...")
     
     # Eliminar cookie y redirigir
@@ -10,6 +10,7 @@ import logging
 from models.database import get_db
 from models.models import User
 from utils.auth_enhanced import auth_service
+from utils.passwords import PASSWORD_HASH_RETRY_AFTER, PasswordHasherBusy
 from config.ad_config import ad_settings
 
 logger = logging.getLogger(__name__)
@@ -45,7 +46,7 @@ async def login(
     """Endpoint de login con soporte para múltiples proveedores"""
     try:
         # Intentar autenticación
-        success, user, message = auth_service.authenticate_user(db, username, password)
+        success, user, message = await auth_service.authenticate_user(db, username, password)
         
         if not success or not user:
             logger.warning(f"Intento de login fallido para: {username}")
@@ -55,7 +56,7 @@ async def login(
             )
         
         # Crear token de acceso
-        token_data = auth_service.create_access_token(user)
+        token_data = auth_service.create_access_token(db, user)
         
         logger.info(f"Login exitoso: {username} ({user.auth_provider})")
         
@@ -68,6 +69,13 @@ async def login(
         
     except HTTPException:
         raise
+    except PasswordHasherBusy:
+        logger.warning(f"Login rechazado por carga para: {username}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+        )
     except Exception as e:
         logger.error(f"Error en login de {username}: {str(e)}")
         raise HTTPException(
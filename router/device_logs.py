@@ -0,0 +1,59 @@
+# router/device_logs.py
+# Búsqueda en el archivo de logs de toda la flota
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from models.database import get_db
+from utils.log_search import search_devices, log_indexer
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/device-logs",
+    tags=["device-logs"]
+)
+
+@router.get("/search")
+def search_device_logs(
+    q: str = Query(..., min_length=2, description="Texto a buscar en los logs"),
+    since: Optional[datetime] = Query(None, description="Inicio del rango (por defecto hace 24 h)"),
+    until: Optional[datetime] = Query(None, description="Fin del rango (por defecto ahora)"),
+    tienda: Optional[str] = None,
+    model: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """
+    Devuelve los dispositivos cuyos logs archivados contienen el texto indicado,
+    con el número de bloques coincidentes por dispositivo
+    """
+    try:
+        devices = search_devices(db, q, since=since, until=until, tienda=tienda, model=model, limit=limit)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error en la búsqueda de logs '{q}': {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+    return {
+        "query": q,
+        "devices": devices,
+        "total_devices": len(devices),
+        "total_hits": sum(device["hits"] for device in devices)
+    }
+
+@router.get("/index/status")
+async def get_index_status():
+    """
+    Estado del indexador de logs
+    """
+    return {
+        "running": log_indexer.running,
+        "indexed_total": log_indexer.indexed_total,
+        "last_run": log_indexer.last_run.isoformat() if log_indexer.last_run else None
+    }
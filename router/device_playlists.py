@@ -1,19 +1,148 @@
 # Corrección para router/device_playlists.py
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import and_, delete, exists, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List
+from datetime import datetime
+import logging
 
 from models.database import get_db
 from models import models, schemas
 from utils.helpers import is_playlist_active
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api/device-playlists",
     tags=["device-playlists"]
 )
 
+# INSERT con ON CONFLICT DO NOTHING según el motor
+INSERT_IGNORE_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def device_selector_filter(selector: schemas.DeviceSelector):
+    """
+    Condición SQL sobre devices para un selector: AND entre campos, OR entre
+    los valores de un mismo campo
+
+    Returns:
+        Expresión para usar en un WHERE
+
+    Raises:
+        HTTPException: Si el selector está vacío y no se pidió all_devices
+    """
+    conditions = []
+    if selector.device_ids:
+        conditions.append(models.Device.device_id.in_(selector.device_ids))
+    if selector.tienda:
+        conditions.append(models.Device.tienda.in_(selector.tienda))
+    if selector.location:
+        conditions.append(models.Device.location.in_(selector.location))
+    if selector.model:
+        conditions.append(models.Device.model.in_(selector.model))
+    
+    if not conditions and not selector.all_devices:
+        raise HTTPException(
+            status_code=400,
+            detail="El selector no tiene filtros; use all_devices=true para seleccionar todos los dispositivos"
+        )
+    
+    if selector.active_only:
+        conditions.append(models.Device.is_active == True)
+    return and_(True, *conditions)
+
+@router.post("/bulk", response_model=schemas.DevicePlaylistBulkResult)
+def bulk_assign_playlists(
+    bulk: schemas.DevicePlaylistBulk,
+    db: Session = Depends(get_db)
+):
+    """
+    Asigna o desasigna un conjunto de playlists a todos los dispositivos que
+    cumplen el selector con una sola sentencia (INSERT ... SELECT o DELETE).
+    Con dry_run no se modifica nada y se devuelven los dispositivos afectados.
+    """
+    playlist_ids = sorted(set(bulk.playlist_ids))
+    found = set(db.execute(
+        select(models.Playlist.id).where(models.Playlist.id.in_(playlist_ids))
+    ).scalars())
+    missing = [playlist_id for playlist_id in playlist_ids if playlist_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Playlists no encontradas: {missing}")
+    
+    device_filter = device_selector_filter(bulk.selector)
+    matched_devices = db.execute(
+        select(func.count()).select_from(models.Device).where(device_filter)
+    ).scalar()
+    
+    # Pares (dispositivo, playlist) que ya están asignados
+    assigned = exists().where(
+        models.DevicePlaylist.device_id == models.Device.device_id,
+        models.DevicePlaylist.playlist_id == models.Playlist.id
+    )
+    # Producto dispositivos x playlists seleccionadas, expresado como JOIN
+    pairs = select(models.Device.device_id, models.Playlist.id).select_from(models.Device).join(
+        models.Playlist, models.Playlist.id.in_(playlist_ids)
+    ).where(
+        device_filter,
+        ~assigned if bulk.action == "assign" else assigned
+    )
+    
+    if bulk.dry_run:
+        affected = db.execute(pairs).all()
+        return {
+            "action": bulk.action,
+            "dry_run": True,
+            "playlist_ids": playlist_ids,
+            "matched_devices": matched_devices,
+            "affected_assignments": len(affected),
+            "affected_devices": sorted({device_id for device_id, _ in affected})
+        }
+    
+    try:
+        if bulk.action == "assign":
+            dialect = db.get_bind().dialect.name
+            insert_factory = INSERT_IGNORE_DIALECTS.get(dialect, insert)
+            statement = insert_factory(models.DevicePlaylist).from_select(
+                ["device_id", "playlist_id", "assigned_at"],
+                pairs.add_columns(literal(datetime.now(), models.DevicePlaylist.assigned_at.type))
+            )
+            if dialect in INSERT_IGNORE_DIALECTS:
+                # Asignaciones creadas en paralelo por otra petición no provocan error
+                statement = statement.on_conflict_do_nothing(
+                    index_elements=["device_id", "playlist_id"]
+                )
+        else:
+            statement = delete(models.DevicePlaylist).where(
+                models.DevicePlaylist.playlist_id.in_(playlist_ids),
+                models.DevicePlaylist.device_id.in_(
+                    select(models.Device.device_id).where(device_filter)
+                )
+            )
+        result = db.execute(statement.execution_options(synchronize_session=False))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error en la asignación masiva de playlists: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"No se pudo aplicar la asignación masiva: {str(e)}")
+    
+    logger.info(
+        f"Asignación masiva ({bulk.action}): {result.rowcount} asignaciones, "
+        f"{matched_devices} dispositivos, playlists {playlist_ids}"
+    )
+    return {
+        "action": bulk.action,
+        "dry_run": False,
+        "playlist_ids": playlist_ids,
+        "matched_devices": matched_devices,
+        "affected_assignments": result.rowcount
+    }
+
 @router.post("/", response_model=schemas.DevicePlaylistResponse)
 def assign_playlist_to_device(
     assignment: schemas.DevicePlaylistCreate,
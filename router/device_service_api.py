@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional
+import asyncio
 import requests
 import logging
 from datetime import datetime
 import traceback
 
 from models import models, schemas
-from models.database import get_db
+from models.database import get_async_db
 
 from utils.helpers import manage_service   
+from utils.metrics import agent_get
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
@@ -25,7 +28,21 @@ ALLOWED_SERVICES = ['videoloop', 'kiosk']
 # Lista de acciones permitidas
 VALID_ACTIONS = ['start', 'stop', 'restart', 'enable', 'disable', 'status']
 
-async def manage_service_via_api(device_id: str, service_name: str, action: str, db: Session) -> Dict[str, Any]:
+async def device_get(url: str, timeout: float, operation: str) -> requests.Response:
+    """
+    Petición GET a la API local del dispositivo en un hilo, sin bloquear el bucle de eventos
+    """
+    return await asyncio.to_thread(agent_get, url, operation, timeout)
+
+async def get_device_or_404(db: AsyncSession, device_id: str) -> models.Device:
+    device = (await db.execute(
+        select(models.Device).where(models.Device.device_id == device_id)
+    )).scalar_one_or_none()
+    if not device:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    return device
+
+async def manage_service_via_api(device_id: str, service_name: str, action: str, db: AsyncSession) -> Dict[str, Any]:
     """
     Gestiona un servicio en un dispositivo remoto a través de su API local
     
@@ -33,7 +50,7 @@ async def manage_service_via_api(device_id: str, service_name: str, action: str,
         device_id (str): ID del dispositivo
         service_name (str): Nombre del servicio a gestionar (videoloop, kiosk)
         action (str): Acción a realizar (start, stop, restart, enable, disable, status)
-        db (Session): Sesión de base de datos
+        db (AsyncSession): Sesión asíncrona de base de datos
     
     Returns:
         Dict[str, Any]: Resultado de la operación
@@ -53,9 +70,7 @@ async def manage_service_via_api(device_id: str, service_name: str, action: str,
         )
     
     # Buscar el dispositivo en la base de datos
-    device = db.query(models.Device).filter(models.Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    device = await get_device_or_404(db, device_id)
     
     # Verificar que el dispositivo está activo
     if not device.is_active:
@@ -82,7 +97,7 @@ async def manage_service_via_api(device_id: str, service_name: str, action: str,
         logger.info(f"Enviando comando {action} al servicio {service_name} en dispositivo {device_id} ({device_ip})")
         
         # Realizar la petición al cliente
-        response = requests.get(api_url, timeout=10)
+        response = await device_get(api_url, timeout=10, operation="service_action")
         
         # Procesar la respuesta
         if response.status_code != 200:
@@ -103,7 +118,7 @@ async def manage_service_via_api(device_id: str, service_name: str, action: str,
             # Obtener el estado actual después de la acción
             status_url = f"http://{device_ip}:8000/services/{service_name}/status"
             try:
-                status_response = requests.get(status_url, timeout=5)
+                status_response = await device_get(status_url, timeout=5, operation="service_status")
                 if status_response.status_code == 200:
                     # Verificar si está activo o detenido
                     status_result = status_response.text.strip()
@@ -119,7 +134,7 @@ async def manage_service_via_api(device_id: str, service_name: str, action: str,
                     else:
                         logger.warning(f"Servicio desconocido: {service_name}, no se actualizó en la base de datos")
                     
-                    db.commit()
+                    await db.commit()
                     logger.info(f"Estado de {service_name} actualizado a: {'running' if is_running else 'stopped'}")
             except Exception as status_error:
                 logger.error(f"Error al obtener estado actualizado: {str(status_error)}")
@@ -129,7 +144,7 @@ async def manage_service_via_api(device_id: str, service_name: str, action: str,
         if result == "success" and action in ["enable", "disable", "status"]:
             try:
                 enabled_url = f"http://{device_ip}:8000/services/{service_name}/is-enabled"
-                enabled_response = requests.get(enabled_url, timeout=5)
+                enabled_response = await device_get(enabled_url, timeout=5, operation="service_enabled")
                 if enabled_response.status_code == 200:
                     enabled_result = enabled_response.text.strip()
                     enabled_status = enabled_result
@@ -175,7 +190,7 @@ async def service_management_endpoint(
     device_id: str,
     service_name: str,
     action: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint para gestionar servicios en dispositivos remotos vía API.
@@ -195,15 +210,13 @@ async def service_management_endpoint(
 @router.get("/{device_id}/services")
 async def list_device_services(
     device_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene la lista de servicios disponibles en un dispositivo y su estado
     """
     # Buscar el dispositivo en la base de datos
-    device = db.query(models.Device).filter(models.Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    device = await get_device_or_404(db, device_id)
     
     # Verificar que el dispositivo está activo
     if not device.is_active:
@@ -228,12 +241,12 @@ async def list_device_services(
         try:
             # Obtener estado actual
             status_url = f"http://{device_ip}:8000/services/{service_name}/status"
-            status_response = requests.get(status_url, timeout=5)
+            status_response = await device_get(status_url, timeout=5, operation="service_status")
             status = status_response.text.strip() if status_response.status_code == 200 else "unknown"
             
             # Obtener si está habilitado
             enabled_url = f"http://{device_ip}:8000/services/{service_name}/is-enabled"
-            enabled_response = requests.get(enabled_url, timeout=5)
+            enabled_response = await device_get(enabled_url, timeout=5, operation="service_enabled")
             enabled = enabled_response.text.strip() if enabled_response.status_code == 200 else "unknown"
             
             services_data.append({
@@ -1,15 +1,23 @@
 # app/routers/devices.py
 from tempfile import template
 from fastapi import APIRouter, HTTPException, Depends, status, Form, Request, Query, Body # type: ignore
-from fastapi.responses import PlainTextResponse, HTMLResponse, JSONResponse  # type: ignore
+from fastapi.responses import PlainTextResponse, HTMLResponse, JSONResponse, RedirectResponse  # type: ignore
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy import select # type: ignore
+from sqlalchemy.ext.asyncio import AsyncSession # type: ignore
+from sqlalchemy.orm import Session, selectinload # type: ignore
 from typing import List, Optional
 from datetime import datetime
 from models import models, schemas
-from models.database import get_db
+from models.database import get_db, get_async_db
 from utils.ping_checker import check_device_status, ping_host
 from utils.hostname_changer import change_hostname, validate_ssh_credentials
+from utils import log_archive
+from utils.log_search import log_indexer
+from utils.log_ingest import ingest_gate, decode_batch, store_batch, PayloadTooLarge
+from utils.metrics import agent_get
+from utils.helpers import analyze_and_clean_string
+from starlette.concurrency import run_in_threadpool
 import os
 import logging
 from fastapi.logger import logger # type: ignore
@@ -24,6 +32,9 @@ router = APIRouter(
 
 templates = Jinja2Templates(directory="templates")
 
+# Antigüedad máxima (segundos) del último lote enviado por el agente para servir los logs desde el archivo
+LOG_PUSH_FRESHNESS_SECONDS = int(os.environ.get('LOG_PUSH_FRESHNESS_SECONDS', '300'))
+
 
 @router.post("/", response_model=schemas.Device, status_code=status.HTTP_201_CREATED)
 def register_device(device: schemas.DeviceCreate, db: Session = Depends(get_db)):
@@ -31,32 +42,6 @@ def register_device(device: schemas.DeviceCreate, db: Session = Depends(get_db))
         # Debug: Imprimir datos recibidos
         logger.info(f"Datos recibidos para registro: {device.dict()}")
         
-        # Función para detectar y limpiar caracteres problemáticos
-        def analyze_and_clean_string(value, field_name):
-            if value is None:
-                return None
-            if isinstance(value, str):
-                # Detectar caracteres problemáticos
-                problematic_chars = []
-                for i, char in enumerate(value):
-                    if ord(char) == 0:  # Carácter nulo
-                        problematic_chars.append(f"NUL at position {i}")
-                    elif ord(char) < 32 and char not in ['\t', '\n', '\r']:  # Caracteres de control
-                        problematic_chars.append(f"Control char {ord(char)} at position {i}")
-                
-                if problematic_chars:
-                    logger.warning(f"Campo {field_name} contiene caracteres problemáticos: {problematic_chars}")
-                
-                # Limpiar el string
-                cleaned = ''.join(char for char in value if ord(char) >= 32 or char in ['\t', '\n', '\r'])
-                cleaned = cleaned.replace('\x00', '').replace('\r', '').replace('\n', ' ').strip()
-                
-                if cleaned != value:
-                    logger.info(f"Campo {field_name} limpiado: '{value}' -> '{cleaned}'")
-                
-                return cleaned
-            return value
-        
         # Verificar dispositivo existente por device_id
         db_device = db.query(models.Device).filter(models.Device.device_id == device.device_id).first()
         if db_device:
@@ -72,6 +57,9 @@ def register_device(device: schemas.DeviceCreate, db: Session = Depends(get_db))
         device_data = device.dict()
         cleaned_data = {}
         
+        # Los logs iniciales van al archivo, no a la fila del dispositivo
+        initial_logs = device_data.pop('service_logs', None)
+        
         for key, value in device_data.items():
             cleaned_data[key] = analyze_and_clean_string(value, key)
         
@@ -98,6 +86,9 @@ def register_device(device: schemas.DeviceCreate, db: Session = Depends(get_db))
         db.commit()
         db.refresh(new_device)
         
+        if initial_logs and log_archive.append_text(db, new_device.device_id, initial_logs):
+            log_indexer.notify()
+        
         logger.info(f"Device {new_device.device_id} registered successfully")
         return new_device
         
@@ -126,7 +117,8 @@ def get_devices(
     active_only: bool = False,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Device)
+    # Las playlists de la respuesta se cargan en una sola consulta, no una por dispositivo
+    query = db.query(models.Device).options(selectinload(models.Device.playlists))
     if active_only:
         query = query.filter(models.Device.is_active == True)
     return query.offset(skip).limit(limit).all()
@@ -163,8 +155,12 @@ def delete_device(device_id: str, db: Session = Depends(get_db)):
     return {"status": "success"}
 
 @router.post("/status", response_model=schemas.Device)
-def update_device_status(status_update: schemas.DeviceStatus, db: Session = Depends(get_db)):
-    device = db.query(models.Device).filter(models.Device.device_id == status_update.device_id).first()
+async def update_device_status(status_update: schemas.DeviceStatus, db: AsyncSession = Depends(get_async_db)):
+    device = (await db.execute(
+        select(models.Device)
+        .options(selectinload(models.Device.playlists))
+        .where(models.Device.device_id == status_update.device_id)
+    )).scalar_one_or_none()
     if device is None:
         raise HTTPException(status_code=404, detail="Device not found")
     
@@ -191,17 +187,20 @@ def update_device_status(status_update: schemas.DeviceStatus, db: Session = Depe
     if status_update.kiosk_status:
         device.kiosk_status = status_update.kiosk_status
     
-    db.commit()
-    db.refresh(device)
+    await db.commit()
+    # last_seen lo calcula la base de datos (onupdate); recargar sin carga perezosa
+    await db.refresh(device, attribute_names=["last_seen"])
     return device
 
 # Endpoint para verificar el estado de un dispositivo mediante ping
 @router.get("/{device_id}/ping", response_model=dict)
-async def ping_device(device_id: str, db: Session = Depends(get_db)):
+async def ping_device(device_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Verifica el estado de un dispositivo mediante ping a ambas interfaces (LAN y WiFi)
     """
-    device = db.query(models.Device).filter(models.Device.device_id == device_id).first()
+    device = (await db.execute(
+        select(models.Device).where(models.Device.device_id == device_id)
+    )).scalar_one_or_none()
     if device is None:
         raise HTTPException(status_code=404, detail="Device not found")
     
@@ -210,7 +209,7 @@ async def ping_device(device_id: str, db: Session = Depends(get_db)):
     device_result = result.get(device_id, {})
     
     # Refrescar el dispositivo desde la base de datos después de la actualización
-    db.refresh(device)
+    await db.refresh(device)
     
     # Preparar respuesta detallada
     response = {
@@ -349,31 +348,47 @@ async def validate_device_ssh(device_id: str, db: Session = Depends(get_db)):
         return {"success": False, "message": f"Error interno del servidor: {str(e)}"}
     
 @router.get("/{device_id}/logs", response_class=PlainTextResponse)
-async def get_device_logs(
+def get_device_logs(
     device_id: str, 
     db: Session = Depends(get_db),
     lines: int = 500
 ):
     """
-    Obtiene los logs del servicio para un dispositivo específico
+    Obtiene los logs del servicio para un dispositivo específico.
+    Las líneas nuevas se guardan en el archivo de logs; si el dispositivo
+    no responde se devuelven las últimas líneas archivadas.
     """
     device = db.query(models.Device).filter(models.Device.device_id == device_id).first()
     if device is None:
         raise HTTPException(status_code=404, detail="Device not found")
+    
+    # Si el agente envía sus logs (push) y el último lote es reciente, no hace falta consultarle
+    last_push = log_archive.last_push_at(db, device_id)
+    if last_push and (datetime.now() - last_push).total_seconds() <= LOG_PUSH_FRESHNESS_SECONDS:
+        return PlainTextResponse(
+            "\n".join(log_archive.read_lines(db, device_id, limit=lines)),
+            media_type="text/plain; charset=utf-8",
+            headers={"X-Logs-Source": "archive"}
+        )
+    
     ip_address = device.ip_address_lan or device.ip_address_wifi
     
     if ip_address:
         try:
             # Intentar obtener logs directamente del dispositivo
             url = f"http://{ip_address}:8000/api/logs?lines={lines}"
-            response = requests.get(url, timeout=5)
+            response = agent_get(url, "logs", timeout=5)
             
             if response.status_code == 200:
                 logs = response.text
                 
-                # Opcional: Actualizar los logs en la base de datos
-                device.service_logs = logs
-                db.commit()
+                # Archivar solo las líneas que todavía no estaban guardadas
+                try:
+                    if log_archive.append_text(db, device_id, logs):
+                        log_indexer.notify()
+                except Exception as archive_error:
+                    logger.error(f"Error al archivar logs de {device_id}: {str(archive_error)}")
+                    db.rollback()
                 
                 # Asegurar que los saltos de línea se preserven
                 return PlainTextResponse(logs, media_type="text/plain; charset=utf-8")
@@ -383,119 +398,102 @@ async def get_device_logs(
             logger.error(f"Error de conexión al dispositivo {device_id}: {str(e)}")
         except Exception as e:
             logger.error(f"Error al obtener logs del dispositivo: {str(e)}")
-
-
-@router.get("/ui/devices", response_class=HTMLResponse)
-async def list_devices(
-    request: Request,
-    active_only: Optional[str] = Query(None),
-    search: Optional[str] = Query(None),
-    search_field: Optional[str] = Query("all"),
-    db: Session = Depends(get_db)
-):
-    # Convertir active_only a booleano
-    is_active_only = active_only == "on"
     
-    # Iniciar consulta
-    query = db.query(models.Device)
+    # Sin conexión con el dispositivo: servir lo archivado
+    archived = log_archive.read_lines(db, device_id, limit=lines)
+    if not archived:
+        raise HTTPException(status_code=502, detail="No se pudieron obtener logs del dispositivo")
     
-    # Aplicar filtro de actividad si se seleccionó
-    if is_active_only:
-        query = query.filter(models.Device.is_active == True)
-    
-    # Aplicar filtro de búsqueda si existe un término
-    if search:
-        if search_field == 'name':
-            query = query.filter(models.Device.name.ilike(f'%{search}%'))
-        elif search_field == 'location':
-            query = query.filter(models.Device.location.ilike(f'%{search}%'))
-        elif search_field == 'tienda':
-            query = query.filter(models.Device.tienda.ilike(f'%{search}%'))
-        elif search_field == 'model':
-            query = query.filter(models.Device.model.ilike(f'%{search}%'))
-        elif search_field == 'ip':
-            # Buscar en ambos campos de IP
-            query = query.filter(or_(
-                models.Device.ip_address_lan.ilike(f'%{search}%'),
-                models.Device.ip_address_wifi.ilike(f'%{search}%')
-            ))
-        else:  # 'all' o cualquier otro valor
-            # Buscar en todos los campos relevantes
-            query = query.filter(or_(
-                models.Device.name.ilike(f'%{search}%'),
-                models.Device.location.ilike(f'%{search}%'),
-                models.Device.tienda.ilike(f'%{search}%'),
-                models.Device.model.ilike(f'%{search}%'),
-                models.Device.ip_address_lan.ilike(f'%{search}%'),
-                models.Device.ip_address_wifi.ilike(f'%{search}%')
-            ))
-    
-    # Ejecutar la consulta
-    devices = query.order_by(models.Device.name).all()
-    
-    # Renderizar la plantilla con los resultados y parámetros actuales
-    return templates.TemplateResponse(
-        "devices.html", 
-        {
-            "request": request,
-            "devices": devices, 
-            "active_only": is_active_only,
-            "search_term": search,
-            "search_field": search_field
-        }
+    return PlainTextResponse(
+        "\n".join(archived),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Logs-Source": "archive"}
     )
 
-@router.get("/devices/{device_id}", response_class=HTMLResponse)
-async def get_device_detail(
-    request: Request, 
+@router.post("/{device_id}/logs", response_model=schemas.LogBatchAck)
+async def ingest_device_logs(device_id: str, request: Request):
+    """
+    Recibe un lote de entradas del journal enviado por el agente.
+    
+    El cuerpo es JSON (opcionalmente con Content-Encoding: gzip) con entradas
+    numeradas; las secuencias ya archivadas se ignoran, así que reenviar un
+    lote es seguro. La respuesta confirma la secuencia más alta archivada.
+    Si hay demasiadas ingestas en curso se responde 503 con Retry-After.
+    """
+    if not ingest_gate.try_acquire():
+        retry_after = ingest_gate.retry_after()
+        return JSONResponse(
+            content={"detail": "Ingesta de logs saturada, reintente más tarde"},
+            status_code=503,
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    try:
+        body = await request.body()
+        try:
+            batch = decode_batch(body, request.headers.get("content-encoding"))
+        except PayloadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        result = await run_in_threadpool(store_batch, device_id, batch)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Device not found")
+        
+        accepted, ack_seq = result
+        if accepted:
+            log_indexer.notify()
+        
+        return schemas.LogBatchAck(
+            device_id=device_id,
+            accepted=accepted,
+            duplicates=len(batch.entries) - accepted,
+            ack_seq=ack_seq
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al ingerir logs de {device_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+    finally:
+        ingest_gate.release()
+
+@router.get("/{device_id}/logs/archive", response_class=PlainTextResponse)
+def get_archived_device_logs(
     device_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    lines: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db)
 ):
     """
-    Página de detalle de un dispositivo específico
+    Devuelve los logs archivados de un dispositivo en un rango de tiempo
     """
-    # Realizar el query con join para cargar las playlists asociadas
-    device = db.query(models.Device).filter(models.Device.device_id == device_id).first()
-    if device is None:
-        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
-    
-    # Cargar explícitamente las playlists del dispositivo
-    device_playlists = db.query(models.Playlist).join(
-        models.DevicePlaylist,
-        models.DevicePlaylist.playlist_id == models.Playlist.id
-    ).filter(
-        models.DevicePlaylist.device_id == device_id
-    ).all()
-    
-    # Asignar las playlists al dispositivo
-    device.playlists = device_playlists
-    
-    # Obtener fecha actual para comparaciones en la plantilla
-    from datetime import datetime
-    now = datetime.now()
-    
-    # Intentar obtener el estado del servicio videoloop
-    service_status = None
-    if device.is_active:
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"http://{device.ip_address_lan or device.ip_address_wifi}:8000/service/videoloop/status")
-                if response.status_code == 200:
-                    service_status = response.json()
-        except:
-            # Si no se puede conectar, establecer estado como desconocido
-            service_status = {"status": "unknown", "active": False, "enabled": False}
-    
-    return templates.TemplateResponse(
-        "device_detail.html", 
-        {
-            "request": request, 
-            "title": f"Dispositivo: {device.name}",
-            "device": device,
-            "service_status": service_status,
-            "now": now  # Pasar la fecha actual a la plantilla
-        }
-    )
+    device_exists = db.query(models.Device.id).filter(models.Device.device_id == device_id).first()
+    if device_exists is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+    
+    archived = log_archive.read_lines(db, device_id, since=since, until=until, limit=lines)
+    return PlainTextResponse("\n".join(archived), media_type="text/plain; charset=utf-8")
+
+
+@router.get("/ui/devices", response_class=HTMLResponse)
+async def list_devices(request: Request):
+    """
+    Ruta antigua del listado de dispositivos: redirige a la página paginada /ui/devices
+    """
+    url = "/ui/devices"
+    if request.url.query:
+        url += "?" + request.url.query
+    return RedirectResponse(url=url, status_code=307)
+
+@router.get("/devices/{device_id}", response_class=HTMLResponse)
+async def get_device_detail(request: Request, device_id: str):
+    """
+    Ruta antigua del detalle de un dispositivo: redirige a /ui/devices/{device_id}
+    """
+    return RedirectResponse(url=f"/ui/devices/{device_id}", status_code=307)
 
 # Endpoint para cambiar el hostname de un dispositivo
 @router.post("/{device_id}/system/reboot", response_model=dict)
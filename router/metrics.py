@@ -0,0 +1,21 @@
+# router/metrics.py
+# Métricas del servidor para Prometheus
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response
+
+from utils.metrics import CONTENT_TYPE, authorized, registry
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """
+    Métricas de este proceso en el formato de texto de Prometheus
+    (con varios workers, cada uno expone las suyas)
+    """
+    if not authorized(authorization):
+        raise HTTPException(status_code=401, detail="Token de métricas no válido")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
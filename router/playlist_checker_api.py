@@ -1,14 +1,18 @@
 # router/playlist_checker_api.py
 # API endpoints para el verificador de listas de reproducción
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 
-from models.database import get_db
+from models.database import get_db, get_async_db
 from models.models import Playlist
-from utils.list_checker import playlist_checker, get_playlist_status, manual_check
+from utils.list_checker import (
+    playlist_checker, manual_check, playlist_status_report, PLAYLIST_STATUSES
+)
 from utils.auth import admin_required
 
 logger = logging.getLogger(__name__)
@@ -23,10 +27,16 @@ async def get_checker_status():
     """
     Obtener el estado actual del verificador de listas
     """
+    next_transition = playlist_checker.next_transition
     return {
-        "running": playlist_checker.running if playlist_checker else False,
-        "check_interval": playlist_checker.check_interval if playlist_checker else None,
-        "last_check": "No disponible"  # Se puede agregar timestamp del último check
+        "running": playlist_checker.running,
+        "check_interval": playlist_checker.check_interval,
+        "last_check": playlist_checker.last_check.isoformat() if playlist_checker.last_check else None,
+        "next_transition": {
+            "at": next_transition[0].isoformat(),
+            "playlist_id": next_transition[1],
+            "type": next_transition[2]
+        } if next_transition else None
     }
 
 @router.post("/manual-check")
@@ -48,17 +58,16 @@ async def trigger_manual_check(admin_user = Depends(admin_required)):
         raise HTTPException(status_code=500, detail=f"Error al ejecutar verificación: {str(e)}")
 
 @router.get("/playlist/{playlist_id}/status")
-async def get_single_playlist_status(playlist_id: int, db: Session = Depends(get_db)):
+async def get_single_playlist_status(playlist_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Obtener el estado detallado de una lista específica
     """
     try:
-        status_info = get_playlist_status(playlist_id)
-        
-        if "error" in status_info:
-            raise HTTPException(status_code=404, detail=status_info["error"])
+        playlist = await db.get(Playlist, playlist_id)
+        if playlist is None:
+            raise HTTPException(status_code=404, detail="Lista no encontrada")
         
-        return status_info
+        return playlist_checker.describe_playlist_status(playlist)
     except HTTPException:
         raise
     except Exception as e:
@@ -66,39 +75,21 @@ async def get_single_playlist_status(playlist_id: int, db: Session = Depends(get
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 @router.get("/all-playlists/status")
-async def get_all_playlists_status(db: Session = Depends(get_db)):
+def get_all_playlists_status(
+    status: Optional[str] = Query(None, description="Filtrar por estado: " + ", ".join(PLAYLIST_STATUSES)),
+    needs_update: Optional[bool] = Query(None, description="Filtrar por listas que necesitan actualización"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
     """
-    Obtener el estado de todas las listas de reproducción
+    Obtener el estado de las listas de reproducción (paginado), con el resumen de todas ellas
     """
+    if status is not None and status not in PLAYLIST_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Estado no válido. Valores permitidos: {', '.join(PLAYLIST_STATUSES)}")
+    
     try:
-        playlists = db.query(Playlist).all()
-        
-        results = []
-        for playlist in playlists:
-            try:
-                status_info = playlist_checker.check_playlist_status(playlist.id, db)
-                results.append(status_info)
-            except Exception as e:
-                logger.error(f"Error al verificar playlist {playlist.id}: {str(e)}")
-                results.append({
-                    "id": playlist.id,
-                    "title": playlist.title,
-                    "error": str(e)
-                })
-        
-        # Estadísticas resumidas
-        active_count = sum(1 for r in results if r.get("should_be_active", False))
-        needs_update_count = sum(1 for r in results if r.get("needs_update", False))
-        
-        return {
-            "playlists": results,
-            "summary": {
-                "total": len(results),
-                "should_be_active": active_count,
-                "should_be_inactive": len(results) - active_count,
-                "needs_update": needs_update_count
-            }
-        }
+        return playlist_status_report(db, status=status, needs_update=needs_update, page=page, page_size=page_size)
     except Exception as e:
         logger.error(f"Error al obtener estado de todas las playlists: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
@@ -106,7 +97,7 @@ async def get_all_playlists_status(db: Session = Depends(get_db)):
 @router.post("/playlist/{playlist_id}/force-update")
 async def force_playlist_update(
     playlist_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin_user = Depends(admin_required)
 ):
     """
@@ -114,12 +105,12 @@ async def force_playlist_update(
     Solo accesible por administradores
     """
     try:
-        playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+        playlist = await db.get(Playlist, playlist_id)
         if not playlist:
             raise HTTPException(status_code=404, detail="Lista no encontrada")
         
         # Verificar el estado actual y el que debería tener
-        status_info = playlist_checker.check_playlist_status(playlist_id, db)
+        status_info = playlist_checker.describe_playlist_status(playlist)
         
         if not status_info.get("needs_update", False):
             return {
@@ -136,7 +127,7 @@ async def force_playlist_update(
         
         old_status = playlist.is_active
         playlist.is_active = new_status
-        db.commit()
+        await db.commit()
         
         logger.info(f"Estado de playlist {playlist_id} actualizado por {admin_user['username']}: {old_status} -> {new_status}")
         
@@ -152,11 +143,11 @@ async def force_playlist_update(
         raise
     except Exception as e:
         logger.error(f"Error al forzar actualización de playlist {playlist_id}: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al actualizar: {str(e)}")
 
 @router.get("/upcoming-activations")
-async def get_upcoming_activations(hours: int = 24, db: Session = Depends(get_db)):
+async def get_upcoming_activations(hours: int = 24, db: AsyncSession = Depends(get_async_db)):
     """
     Obtener listas que se activarán en las próximas X horas
     """
@@ -167,12 +158,12 @@ async def get_upcoming_activations(hours: int = 24, db: Session = Depends(get_db
         future_time = now + timedelta(hours=hours)
         
         # Buscar listas que se activarán en el período especificado
-        upcoming_playlists = db.query(Playlist).filter(
+        upcoming_playlists = (await db.execute(select(Playlist).where(
             Playlist.start_date.isnot(None),
             Playlist.start_date > now,
             Playlist.start_date <= future_time,
             Playlist.is_active == False
-        ).all()
+        ))).scalars().all()
         
         results = []
         for playlist in upcoming_playlists:
@@ -196,7 +187,7 @@ async def get_upcoming_activations(hours: int = 24, db: Session = Depends(get_db
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 @router.get("/expiring-soon")
-async def get_expiring_playlists(hours: int = 24, db: Session = Depends(get_db)):
+async def get_expiring_playlists(hours: int = 24, db: AsyncSession = Depends(get_async_db)):
     """
     Obtener listas que expirarán en las próximas X horas
     """
@@ -207,12 +198,12 @@ async def get_expiring_playlists(hours: int = 24, db: Session = Depends(get_db))
         future_time = now + timedelta(hours=hours)
         
         # Buscar listas que expirarán en el período especificado
-        expiring_playlists = db.query(Playlist).filter(
+        expiring_playlists = (await db.execute(select(Playlist).where(
             Playlist.expiration_date.isnot(None),
             Playlist.expiration_date > now,
             Playlist.expiration_date <= future_time,
             Playlist.is_active == True
-        ).all()
+        ))).scalars().all()
         
         results = []
         for playlist in expiring_playlists:
@@ -1,20 +1,21 @@
 # Actualización para router/playlists.py - Solo las funciones modificadas
 
-import os
-import uuid
-import json
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, selectinload
 from datetime import datetime
 from sqlalchemy.sql import text
 from fastapi.staticfiles import StaticFiles
 
 from models.database import get_db
 from models.models import Playlist, Video, PlaylistVideo
-from models.schemas import PlaylistCreate, PlaylistResponse, PlaylistUpdate
+from models.schemas import PlaylistCreate, PlaylistResponse, PlaylistUpdate, VideoResponse, DeviceInfo, PlaylistItemsBulk, PlaylistReorder
 from utils.helpers import is_playlist_active
+from utils.list_checker import notify_playlist_changed
+from utils.search import search_filter
+from utils.playlist_export import content_disposition, export_playlist, etag_matches, touch_playlists
+from utils.playlist_positions import apply_operations, renumber, load_items, next_position, PlaylistItemsError
+from utils.pagination import keyset_paginate, count_total, CursorError, TOTAL_MODES
 
 router = APIRouter(
     prefix="/api/playlists",
@@ -23,9 +24,6 @@ router = APIRouter(
 
 # router.mount("static", StaticFiles(directory="static/"), name="static")
 
-# Directorio para archivos de playlist
-PLAYLIST_DIR = "playlists"
-
 @router.post("/", response_model=PlaylistResponse)
 def create_playlist(
     playlist: PlaylistCreate, 
@@ -36,15 +34,64 @@ def create_playlist(
     db.add(db_playlist)
     db.commit()
     db.refresh(db_playlist)
+    notify_playlist_changed(db_playlist)
     return db_playlist
 
-@router.get("/", response_model=List[PlaylistResponse])
+# Colecciones anidadas que se pueden incluir en los listados (parámetro include=)
+PLAYLIST_INCLUDES = {
+    "videos": Playlist.videos,
+    "devices": Playlist.devices,
+}
+# Campos simples que se pueden pedir en los listados (parámetro fields=)
+PLAYLIST_FIELDS = ("id", "title", "description", "start_date", "expiration_date", "is_active", "creation_date")
+
+def parse_playlist_options(include: Optional[str], fields: Optional[str]):
+    """
+    Validar los parámetros include= y fields= de los listados de playlists
+    
+    Returns:
+        Tupla (colecciones a incluir, campos simples a devolver)
+    """
+    includes = [name.strip() for name in (include or "").split(",") if name.strip()]
+    unknown = [name for name in includes if name not in PLAYLIST_INCLUDES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"include no válido: {', '.join(unknown)}. Valores permitidos: {', '.join(PLAYLIST_INCLUDES)}")
+    
+    if not fields:
+        return includes, list(PLAYLIST_FIELDS)
+    
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in PLAYLIST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"fields no válido: {', '.join(unknown)}. Valores permitidos: {', '.join(PLAYLIST_FIELDS)}")
+    # El id se devuelve siempre
+    return includes, ["id"] + [name for name in selected if name != "id"]
+
+def with_playlist_includes(query, includes: List[str]):
+    """Cargar las colecciones pedidas con selectinload (una consulta por colección)"""
+    return query.options(*[selectinload(PLAYLIST_INCLUDES[name]) for name in includes])
+
+def serialize_playlist(playlist: Playlist, includes: List[str], fields: List[str]) -> dict:
+    """
+    Convertir una playlist al formato de PlaylistResponse, con solo los campos y colecciones pedidos
+    """
+    data = {name: getattr(playlist, name) for name in fields}
+    if "videos" in includes:
+        data["videos"] = [VideoResponse.model_validate(video, from_attributes=True).model_dump() for video in playlist.videos]
+    if "devices" in includes:
+        data["devices"] = [DeviceInfo.model_validate(device, from_attributes=True).model_dump() for device in playlist.devices]
+    return data
+
+@router.get("/")
 def read_playlists(
     skip: int = 0, 
     limit: int = 10000,  # Aumentar el límite por defecto
     active_only: bool = False,
+    include: Optional[str] = Query("videos,devices", description="Colecciones a incluir: videos, devices (vacío para ninguna)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por comas (por defecto todos)"),
     db: Session = Depends(get_db)
 ):
+    includes, selected_fields = parse_playlist_options(include, fields)
     query = db.query(Playlist)
     
     if active_only:
@@ -54,11 +101,32 @@ def read_playlists(
             (Playlist.expiration_date == None) | (Playlist.expiration_date > now)
         )
     
-    playlists = query.offset(skip).limit(limit).all()
+    playlists = with_playlist_includes(query.order_by(Playlist.id), includes).offset(skip).limit(limit).all()
     print(f"Devolviendo {len(playlists)} playlists (límite: {limit})")
     
-    return playlists
+    return [serialize_playlist(playlist, includes, selected_fields) for playlist in playlists]
 
+@router.get("/active")
+def get_active_playlists(
+    include: Optional[str] = Query("videos,devices", description="Colecciones a incluir: videos, devices (vacío para ninguna)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por comas (por defecto todos)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Devuelve todas las playlists activas considerando fechas de inicio y fin
+    """
+    includes, selected_fields = parse_playlist_options(include, fields)
+    now = datetime.now()
+    query = db.query(Playlist).filter(
+        Playlist.is_active == True,
+        # Ha empezado (o no tiene fecha de inicio)
+        (Playlist.start_date == None) | (Playlist.start_date <= now),
+        # No ha expirado (o no tiene fecha de expiración)
+        (Playlist.expiration_date == None) | (Playlist.expiration_date > now)
+    )
+    active_playlists = with_playlist_includes(query, includes).all()
+    
+    return [serialize_playlist(playlist, includes, selected_fields) for playlist in active_playlists]
 
 @router.get("/count")
 def get_playlists_count(
@@ -84,20 +152,45 @@ def get_playlists_count(
         "active_only": active_only
     }
 
-# Y un endpoint para paginación del lado del servidor si lo prefieres
+# Ordenaciones permitidas en el listado paginado: nombre -> (columna, admite NULL)
+PLAYLIST_SORTS = {
+    "id": (Playlist.id, False),
+    "title": (Playlist.title, False),
+    "creation_date": (Playlist.creation_date, True),
+    "expiration_date": (Playlist.expiration_date, True),
+}
+# Nombres antiguos aceptados por compatibilidad
+PLAYLIST_SORT_ALIASES = {"created_at": "creation_date"}
+
 @router.get("/paginated")
 def get_playlists_paginated(
-    page: int = 1,
-    page_size: int = 100,
+    page_size: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor/prev_cursor"),
     active_only: bool = False,
     search: str = None,
-    sort_by: str = "created_at",
+    sort_by: str = "creation_date",
     sort_order: str = "desc",
+    total: str = Query("none", description="Cálculo del total: none, estimate o exact"),
+    include: Optional[str] = Query(None, description="Colecciones a incluir: videos, devices"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por comas (por defecto todos)"),
     db: Session = Depends(get_db)
 ):
     """
-    Endpoint con paginación del lado del servidor
+    Endpoint con paginación por cursor del lado del servidor
+    
+    Cada respuesta incluye next_cursor/prev_cursor para pedir la página
+    siguiente o anterior; el coste no depende de la profundidad de la página.
     """
+    sort_by = PLAYLIST_SORT_ALIASES.get(sort_by, sort_by)
+    if sort_by not in PLAYLIST_SORTS:
+        raise HTTPException(status_code=400, detail=f"Ordenación no válida. Valores permitidos: {', '.join(PLAYLIST_SORTS)}")
+    sort_order = sort_order.lower()
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order debe ser asc o desc")
+    if total not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail=f"total debe ser uno de: {', '.join(TOTAL_MODES)}")
+    includes, selected_fields = parse_playlist_options(include, fields)
+    
     query = db.query(Playlist)
     
     # Filtro por estado activo
@@ -110,43 +203,28 @@ def get_playlists_paginated(
     
     # Búsqueda por texto
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (Playlist.title.ilike(search_term)) |
-            (Playlist.description.ilike(search_term))
-        )
+        query = query.filter(search_filter(db, 'playlist', search))
     
-    # Ordenamiento
-    if sort_by == "title":
-        order_column = Playlist.title
-    elif sort_by == "created_at":
-        order_column = Playlist.created_at
-    elif sort_by == "expiration_date":
-        order_column = Playlist.expiration_date
-    else:
-        order_column = Playlist.created_at
-    
-    if sort_order.lower() == "desc":
-        query = query.order_by(order_column.desc())
-    else:
-        query = query.order_by(order_column.asc())
-    
-    # Conteo total antes de la paginación
-    total_items = query.count()
-    total_pages = (total_items + page_size - 1) // page_size
-    
-    # Aplicar paginación
-    skip = (page - 1) * page_size
-    playlists = query.offset(skip).limit(page_size).all()
+    sort_column, nullable = PLAYLIST_SORTS[sort_by]
+    try:
+        page = keyset_paginate(
+            with_playlist_includes(query, includes), sort_column, Playlist.id, sort_by, sort_order,
+            limit=page_size, cursor=cursor, nullable=nullable
+        )
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
-        "items": playlists,
-        "page": page,
+        "items": [serialize_playlist(playlist, includes, selected_fields) for playlist in page["items"]],
         "page_size": page_size,
-        "total_items": total_items,
-        "total_pages": total_pages,
-        "has_next": page < total_pages,
-        "has_prev": page > 1
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+        "next_cursor": page["next_cursor"],
+        "prev_cursor": page["prev_cursor"],
+        "has_next": page["next_cursor"] is not None,
+        "has_prev": page["prev_cursor"] is not None,
+        "total_items": count_total(query, total),
+        "total_mode": total
     }
 
 @router.get("/{playlist_id}", response_model=PlaylistResponse)
@@ -176,26 +254,10 @@ def update_playlist(
     
     db.commit()
     db.refresh(db_playlist)
+    if {'start_date', 'expiration_date', 'is_active'} & update_data.keys():
+        notify_playlist_changed(db_playlist)
     return db_playlist
 
-@router.get("/active", response_model=List[PlaylistResponse])
-def get_active_playlists(
-    db: Session = Depends(get_db)
-):
-    """
-    Devuelve todas las playlists activas considerando fechas de inicio y fin
-    """
-    now = datetime.now()
-    active_playlists = db.query(Playlist).filter(
-        Playlist.is_active == True,
-        # Ha empezado (o no tiene fecha de inicio)
-        (Playlist.start_date == None) | (Playlist.start_date <= now),
-        # No ha expirado (o no tiene fecha de expiración)
-        (Playlist.expiration_date == None) | (Playlist.expiration_date > now)
-    ).all()
-    
-    return active_playlists
-
 @router.get("/{playlist_id}/status")
 def get_playlist_status(
     playlist_id: int,
@@ -247,6 +309,66 @@ def delete_playlist(
     
     return {"message": "Lista de reproducción eliminada correctamente"}
 
+@router.post("/{playlist_id}/videos/bulk")
+def bulk_edit_playlist_videos(
+    playlist_id: int,
+    bulk: PlaylistItemsBulk,
+    db: Session = Depends(get_db)
+):
+    """
+    Aplica una lista de operaciones add/remove/move de forma atómica:
+    o se aplican todas o ninguna
+    """
+    if db.query(Playlist.id).filter(Playlist.id == playlist_id).first() is None:
+        raise HTTPException(status_code=404, detail="Lista de reproducción no encontrada")
+    
+    operations = [operation.dict() for operation in bulk.operations]
+    try:
+        result = apply_operations(db, playlist_id, operations)
+        touch_playlists(db, [playlist_id])
+        db.commit()
+    except PlaylistItemsError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al editar los videos: {str(e)}")
+    
+    return {"message": "Operaciones aplicadas correctamente", **result}
+
+@router.put("/{playlist_id}/videos/order")
+def reorder_playlist_videos(
+    playlist_id: int,
+    reorder: PlaylistReorder,
+    db: Session = Depends(get_db)
+):
+    """
+    Reordena todos los videos de la playlist con una sola sentencia UPDATE
+    """
+    if db.query(Playlist.id).filter(Playlist.id == playlist_id).first() is None:
+        raise HTTPException(status_code=404, detail="Lista de reproducción no encontrada")
+    
+    current = load_items(db, playlist_id)
+    current_ids = [video_id for _, video_id in current]
+    if len(reorder.video_ids) != len(set(reorder.video_ids)) or sorted(reorder.video_ids) != sorted(current_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="video_ids debe contener exactamente los videos de la lista de reproducción"
+        )
+    
+    try:
+        items = renumber(db, playlist_id, reorder.video_ids, [position for position, _ in current])
+        touch_playlists(db, [playlist_id])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al reordenar los videos: {str(e)}")
+    
+    return {
+        "message": "Videos reordenados correctamente",
+        "items": [{"video_id": video_id, "position": position} for position, video_id in items]
+    }
+
 @router.post("/{playlist_id}/videos/{video_id}")
 def add_video_to_playlist(
     playlist_id: int, 
@@ -274,23 +396,15 @@ def add_video_to_playlist(
     if video_in_playlist:
         return {"message": "El video ya está en la lista de reproducción"}
     
-    # Obtener la posición máxima actual
-    max_position_query = db.query(PlaylistVideo).filter(
-        PlaylistVideo.playlist_id == playlist_id
-    ).order_by(PlaylistVideo.position.desc()).first()
-    
-    next_position = 0
-    if max_position_query:
-        next_position = max_position_query.position + 1
-    
-    # Crear nueva relación
+    # Crear nueva relación al final (posiciones con huecos)
     new_playlist_video = PlaylistVideo(
         playlist_id=playlist_id,
         video_id=video_id,
-        position=next_position
+        position=next_position(db, playlist_id)
     )
     
     db.add(new_playlist_video)
+    touch_playlists(db, [playlist_id])
     
     try:
         db.commit()
@@ -328,18 +442,9 @@ def remove_video_from_playlist(
             detail="El video no se encuentra en esta lista de reproducción"
         )
     
-    # Eliminar la relación
+    # Eliminar la relación; las posiciones de los demás no cambian (el orden se conserva)
     db.delete(playlist_video)
-    db.commit()
-    
-    # Reorganizar las posiciones de los videos restantes
-    remaining_videos = db.query(PlaylistVideo).filter(
-        PlaylistVideo.playlist_id == playlist_id
-    ).order_by(PlaylistVideo.position).all()
-    
-    for i, pv in enumerate(remaining_videos):
-        pv.position = i
-    
+    touch_playlists(db, [playlist_id])
     db.commit()
     
     return {"message": "Video eliminado de la lista de reproducción correctamente"}
@@ -347,6 +452,7 @@ def remove_video_from_playlist(
 @router.get("/{playlist_id}/download")
 def download_playlist(
     playlist_id: int, 
+    request: Request,
     db: Session = Depends(get_db)
 ):
     db_playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
@@ -360,40 +466,16 @@ def download_playlist(
             detail="Esta lista de reproducción no está activa o no está en su período de actividad"
         )
     
-    # Crear un archivo JSON con la información de la playlist y los videos
-    playlist_data = {
-        "id": db_playlist.id,
-        "title": db_playlist.title,
-        "description": db_playlist.description,
-        "start_date": db_playlist.start_date.isoformat() if db_playlist.start_date else None,
-        "expiration_date": db_playlist.expiration_date.isoformat() if db_playlist.expiration_date else None,
-        "videos": [
-            {
-                "id": video.id,
-                "title": video.title,
-                "description": video.description,
-                "file_path": video.file_path,
-                "duration": video.duration
-            }
-            for video in db_playlist.videos
-        ]
-    }
-    
-    # Crear directorios si no existen
-    os.makedirs(PLAYLIST_DIR, exist_ok=True)
-    
-    # Crear un archivo JSON temporal
-    playlist_filename = f"playlist_{db_playlist.id}_{uuid.uuid4()}.json"
-    playlist_file_path = os.path.join(PLAYLIST_DIR, playlist_filename)
+    # Exportación generada en memoria (caché por versión de la playlist)
+    etag, body = export_playlist(db_playlist)
+    # El estado activo se comprueba en cada petición, así que el cliente debe revalidar
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
     
-    with open(playlist_file_path, "w") as f:
-        json.dump(playlist_data, f, indent=4)
-    
-    return FileResponse(
-        path=playlist_file_path, 
-        filename=f"playlist_{db_playlist.title.replace(' ', '_')}.json", 
-        media_type="application/json"
-    )
+    filename = f"playlist_{db_playlist.title.replace(' ', '_')}.json"
+    headers["Content-Disposition"] = content_disposition(filename)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/{playlist_id}/active_videos")
 def get_active_videos_in_playlist(
@@ -2,11 +2,13 @@
 
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 from typing import Optional, List
 
-from models.database import get_db
+from models.database import get_async_db
 from models.models import Playlist, Video, Device, DevicePlaylist
 
 
@@ -18,46 +20,24 @@ router = APIRouter(
     tags=["raspberry"]
 )
 
-@router.get("/playlists/active")
-def get_active_playlists_for_raspberry(
-    device_id: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
+async def touch_device(db: AsyncSession, device_id: str) -> bool:
     """
-    Returns all active playlists.
-    If device_id is provided, returns only playlists assigned to that device.
-    This is a public endpoint accessible to Raspberry Pi devices without authentication.
+    Updates the device's last_seen timestamp.
+    Returns False if the device does not exist.
     """
-    now = datetime.now()
-    
-    # Build base query for active playlists
-    query = db.query(Playlist).filter(
-        Playlist.is_active == True,
-        (Playlist.expiration_date == None) | (Playlist.expiration_date > now)
+    result = await db.execute(
+        update(Device).where(Device.device_id == device_id).values(last_seen=datetime.now())
     )
-    
-    # If device_id is provided, filter by playlists assigned to that device
-    if device_id:
-        # Check if device exists
-        device = db.query(Device).filter(Device.device_id == device_id).first()
-        if device is None:
-            raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
-        
-        # Update last_seen timestamp
-        device.last_seen = datetime.now()
-        db.commit()
-        
-        # Filter playlists assigned to the device
-        query = query.join(
-            DevicePlaylist,
-            DevicePlaylist.playlist_id == Playlist.id
-        ).filter(DevicePlaylist.device_id == device_id)
-    
-    # Execute the query
-    active_playlists = query.all()
-    
+    await db.commit()
+    return result.rowcount > 0
+
+def build_playlist_manifest(playlists: List[Playlist], now: datetime) -> List[dict]:
+    """
+    Builds the JSON manifest the devices download: playlists with their
+    unexpired videos, skipping playlists left without videos.
+    """
     result = []
-    for playlist in active_playlists:
+    for playlist in playlists:
         # Filter videos that haven't expired
         active_videos = [
             video for video in playlist.videos 
@@ -86,35 +66,64 @@ def get_active_playlists_for_raspberry(
     
     return result
 
+@router.get("/playlists/active")
+async def get_active_playlists_for_raspberry(
+    device_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Returns all active playlists.
+    If device_id is provided, returns only playlists assigned to that device.
+    This is a public endpoint accessible to Raspberry Pi devices without authentication.
+    """
+    now = datetime.now()
+    
+    # Build base query for active playlists (videos loaded in one extra query)
+    query = select(Playlist).options(selectinload(Playlist.videos)).where(
+        Playlist.is_active == True,
+        (Playlist.expiration_date == None) | (Playlist.expiration_date > now)
+    )
+    
+    # If device_id is provided, filter by playlists assigned to that device
+    if device_id:
+        # Check if device exists and update last_seen timestamp
+        if not await touch_device(db, device_id):
+            raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+        
+        # Filter playlists assigned to the device
+        query = query.join(
+            DevicePlaylist,
+            DevicePlaylist.playlist_id == Playlist.id
+        ).where(DevicePlaylist.device_id == device_id)
+    
+    # Execute the query
+    active_playlists = (await db.execute(query)).scalars().all()
+    
+    return build_playlist_manifest(active_playlists, now)
+
 @router.get("/playlists/active/{device_id}")
-def get_active_playlists_for_device(
+async def get_active_playlists_for_device(
     device_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Returns the active playlists assigned to a specific device.
     This endpoint is for direct access from the client.
     """
     try:
-        # Check if device exists and update last_seen
-        device = db.query(Device).filter(Device.device_id == device_id).first()
-        if device is None:
-            logger.error(f"Device not found: {device_id}")
-            raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
-        
-        # Update last_seen timestamp
-        device.last_seen = datetime.now()
-        db.commit()
-        
         logger.info(f"Active playlists request for device {device_id}")
         
-        # Use the existing function but explicitly pass the device_id
-        return get_active_playlists_for_raspberry(device_id=device_id, db=db)
+        # The shared function checks the device and updates last_seen
+        return await get_active_playlists_for_raspberry(device_id=device_id, db=db)
     
-    except HTTPException:
+    except HTTPException as e:
+        if e.status_code == 404:
+            logger.warning(f"Device not found: {device_id}")
+        else:
+            logger.error(f"Error getting playlists for device {device_id}: {e.status_code} {e.detail}")
         raise
     except Exception as e:
         logger.error(f"Error getting playlists for device {device_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
-# Keep the rest of your code as is...
\ No newline at end of file
+# Keep the rest of your code as is...
@@ -0,0 +1,46 @@
+# router/search.py
+# Búsqueda unificada sobre dispositivos, listas de reproducción y videos
+
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from models.database import get_db
+from utils.search import search_all, SEARCH_ENTITIES
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/search",
+    tags=["search"]
+)
+
+@router.get("")
+def search(
+    q: str = Query(..., min_length=1, description="Texto a buscar"),
+    types: Optional[str] = Query(None, description="Tipos separados por comas: " + ", ".join(SEARCH_ENTITIES)),
+    limit: int = Query(20, ge=1, le=200, description="Resultados máximos por tipo"),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca el texto en dispositivos, listas y videos y devuelve los resultados
+    de cada tipo ordenados por relevancia
+    """
+    selected = [name.strip() for name in (types or "").split(",") if name.strip()] or list(SEARCH_ENTITIES)
+    unknown = [name for name in selected if name not in SEARCH_ENTITIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Tipos no válidos: {', '.join(unknown)}")
+
+    try:
+        results = search_all(db, q, selected, limit)
+    except Exception as e:
+        logger.error(f"Error en la búsqueda '{q}': {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+    return {
+        "query": q,
+        "results": results,
+        "total": sum(len(items) for items in results.values())
+    }
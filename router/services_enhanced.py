@@ -14,6 +14,7 @@ import logging
 from datetime import datetime
 
 from utils import ssh_helper
+from utils.metrics import agent_get
 from models import models
 from models.database import SessionLocal, get_db
 
@@ -102,7 +103,7 @@ async def get_device_screenshot(device_id: str, db: Session = Depends(get_db)):
         # Realizar la solicitud al cliente
         try:
             # Configurar timeout para evitar esperas largas
-            response = requests.get(screenshot_url, timeout=10)
+            response = agent_get(screenshot_url, "screenshot", timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error al obtener captura desde el cliente: {response.status_code}")
@@ -166,7 +167,7 @@ async def get_device_screenshot_as_file(device_id: str, db: Session = Depends(ge
         
         # Realizar la solicitud al cliente
         try:
-            response = requests.get(screenshot_url, timeout=10)
+            response = agent_get(screenshot_url, "screenshot", timeout=10)
             
             if response.status_code != 200:
                 raise HTTPException(
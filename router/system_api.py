@@ -0,0 +1,95 @@
+# router/system_api.py
+# Estado interno del servidor: tareas en segundo plano, liderazgo entre procesos,
+# uso del pool de conexiones a la base de datos y perfiles de peticiones
+
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from utils.auth import admin_request_required
+from utils.db_pool import pool_monitor
+from utils.profiler import profile_store, slow_request_sampler
+from utils.leader_election import leader_election
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/system",
+    tags=["system"]
+)
+
+@router.get("/jobs")
+async def get_background_jobs():
+    """
+    Tareas únicas en segundo plano: si este proceso es el líder de cada una
+    y qué proceso tiene su candado
+    """
+    # Consultar quién tiene cada candado puede requerir acceso a la base de datos
+    return await run_in_threadpool(leader_election.status)
+
+@router.get("/db-pool")
+async def get_db_pool_stats(reset: bool = False, _=Depends(admin_request_required)):
+    """
+    Uso de los pools de conexiones de este proceso: conexiones en uso y quién
+    las tiene, histogramas de espera y de retención, y las retenciones más largas
+
+    Args:
+        reset: Vaciar las estadísticas después de devolverlas
+    """
+    stats = pool_monitor.snapshot()
+    if reset:
+        pool_monitor.reset()
+    return stats
+
+@router.get("/profiles")
+def list_profiles(_=Depends(admin_request_required)):
+    """
+    Perfiles de peticiones guardados (X-Profile: 1), del más reciente al más antiguo
+    """
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, _=Depends(admin_request_required)):
+    """
+    Metadatos de un perfil y sus funciones con más tiempo
+    """
+    try:
+        metadata = profile_store.metadata(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return metadata
+
+@router.get("/profiles/{profile_id}/speedscope")
+def download_profile(profile_id: str, _=Depends(admin_request_required)):
+    """
+    Perfil en formato speedscope (abrir en https://www.speedscope.app)
+    """
+    try:
+        path = profile_store.profile_path(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
+@router.delete("/profiles/{profile_id}")
+def delete_profile(profile_id: str, _=Depends(admin_request_required)):
+    try:
+        removed = profile_store.delete(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return {"deleted": profile_id}
+
+@router.get("/slow-requests")
+def get_slow_requests(_=Depends(admin_request_required)):
+    """
+    Últimas peticiones que superaron SLOW_REQUEST_THRESHOLD_MS con las pilas
+    de los hilos activos en ese momento (solo de este proceso)
+    """
+    return slow_request_sampler.recent()
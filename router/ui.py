@@ -3,20 +3,26 @@ from fastapi import APIRouter, Request, Depends, HTTPException, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import Optional
+from urllib.parse import urlencode
 import httpx
 import sys
 import os
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Añadir la ruta del directorio padre al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 # Importaciones absolutas en lugar de relativas
 from models import models, schemas
-from models.database import get_db
+from models.database import get_db, get_async_db
+from utils.search import search_filter, DEVICE_SEARCH_FIELDS
+from utils.pagination import keyset_paginate, count_total, CursorError
+from utils.auth import request_is_admin
+from utils.profiler import profile_store, slow_request_sampler, SLOW_REQUEST_THRESHOLD_MS
 
 router = APIRouter(
     prefix="/ui",
@@ -34,88 +40,114 @@ async def get_dashboard(request: Request):
     """
     return templates.TemplateResponse("dashboard.html", {"request": request, "title": "Raspberry Pi Registry"})
 
+# Columnas por las que se puede ordenar el listado de dispositivos
+DEVICE_PAGE_SORTS = {
+    'device_id': models.Device.device_id,
+    'name': models.Device.name,
+    'location': models.Device.location,
+    'tienda': models.Device.tienda,
+    'model': models.Device.model,
+    'is_active': models.Device.is_active,
+    'last_seen': models.Device.last_seen,
+}
+DEVICE_PAGE_SIZES = (10, 25, 50, 100)
+
 @router.get("/devices", response_class=HTMLResponse)
-async def get_devices_page(
+def get_devices_page(
     request: Request, 
     active_only: bool = False,
     search: Optional[str] = None,
     search_field: Optional[str] = "all",
+    tienda_filter: Optional[str] = None,
+    sort_by: str = "name",
+    sort_order: str = "asc",
+    page_size: int = 50,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Página que muestra la lista de dispositivos registrados
+    Página que muestra la lista de dispositivos registrados, paginada en el
+    servidor por cursor (solo se renderiza la página actual)
     """
-    # Consulta base con join a las playlists
-    query = db.query(models.Device).outerjoin(
-        models.DevicePlaylist,
-        models.DevicePlaylist.device_id == models.Device.device_id
-    ).outerjoin(
-        models.Playlist,
-        models.Playlist.id == models.DevicePlaylist.playlist_id
-    )
+    if sort_by not in DEVICE_PAGE_SORTS:
+        sort_by = "name"
+    if sort_order not in ("asc", "desc"):
+        sort_order = "asc"
+    if page_size not in DEVICE_PAGE_SIZES:
+        page_size = 50
+    
+    # Las playlists de la página se cargan en una sola consulta adicional
+    query = db.query(models.Device).options(selectinload(models.Device.playlists))
     
     # Filtros adicionales
     if active_only:
         query = query.filter(models.Device.is_active == True)
     
+    if tienda_filter:
+        query = query.filter(models.Device.tienda == tienda_filter)
+    
     if search and search.strip():
-        search_term = f"%{search.strip()}%"
-        if search_field == 'name':
-            query = query.filter(models.Device.name.ilike(search_term))
-        elif search_field == 'location':
-            query = query.filter(models.Device.location.ilike(search_term))
-        elif search_field == 'tienda':
-            query = query.filter(models.Device.tienda.ilike(search_term))
-        elif search_field == 'model':
-            query = query.filter(models.Device.model.ilike(search_term))
-        elif search_field == 'ip':
-            query = query.filter(
-                or_(
-                    models.Device.ip_address_lan.ilike(search_term),
-                    models.Device.ip_address_wifi.ilike(search_term)
-                )
-            )
+        # Dispositivos con alguna playlist cuyo título coincide (EXISTS, sin duplicar filas)
+        playlist_match = models.Device.device_playlists.any(
+            models.DevicePlaylist.playlist.has(search_filter(db, 'playlist', search, ['title']))
+        )
+        if search_field in DEVICE_SEARCH_FIELDS:
+            query = query.filter(search_filter(db, 'device', search, DEVICE_SEARCH_FIELDS[search_field]))
+        elif search_field == 'lista':
+            query = query.filter(playlist_match)
         else:  # 'all'
-            query = query.filter(
-                or_(
-                    models.Device.device_id.ilike(search_term),
-                    models.Device.name.ilike(search_term),
-                    models.Device.location.ilike(search_term),
-                    models.Device.tienda.ilike(search_term),
-                    models.Device.model.ilike(search_term),
-                    models.Device.ip_address_lan.ilike(search_term),
-                    models.Device.ip_address_wifi.ilike(search_term),
-                    models.Playlist.title.ilike(search_term)
-                )
-            )
-    
-    # Es importante usar distinct() para evitar duplicados si un dispositivo tiene múltiples playlists
-    devices = query.distinct().all()
-    
-    # Cargar explícitamente las playlists para cada dispositivo
-    for device in devices:
-        # SQLAlchemy debería haber cargado las playlists automáticamente,
-        # pero podemos forzar la carga si es necesario
-        if hasattr(device, 'playlists') and device.playlists is None:
-            device_playlists = db.query(models.Playlist).join(
-                models.DevicePlaylist,
-                models.DevicePlaylist.playlist_id == models.Playlist.id
-            ).filter(
-                models.DevicePlaylist.device_id == device.device_id
-            ).all()
-            
-            # Asignar manualmente las playlists al dispositivo
-            device.playlists = device_playlists
+            query = query.filter(or_(search_filter(db, 'device', search), playlist_match))
+    
+    total_devices = count_total(query, 'exact')
+    try:
+        page = keyset_paginate(
+            query, DEVICE_PAGE_SORTS[sort_by], models.Device.id,
+            sort_by, sort_order, page_size, cursor
+        )
+    except CursorError:
+        # Cursor caducado o manipulado: volver a la primera página
+        page = keyset_paginate(
+            query, DEVICE_PAGE_SORTS[sort_by], models.Device.id,
+            sort_by, sort_order, page_size
+        )
+    
+    filters = {
+        "active_only": "on" if active_only else None,
+        "search": search or None,
+        "search_field": search_field,
+        "tienda_filter": tienda_filter or None,
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+        "page_size": page_size,
+    }
+    
+    def page_url(**overrides) -> str:
+        params = {**filters, **overrides}
+        return "/ui/devices?" + urlencode({key: value for key, value in params.items() if value is not None})
+    
+    def sort_url(field: str) -> str:
+        order = "desc" if field == sort_by and sort_order == "asc" else "asc"
+        return page_url(sort_by=field, sort_order=order)
     
     return templates.TemplateResponse(
         "devices.html", 
         {
             "request": request, 
             "title": "Dispositivos Registrados", 
-            "devices": devices,
+            "devices": page["items"],
+            "total_devices": total_devices,
+            "next_url": page_url(cursor=page["next_cursor"]) if page["next_cursor"] else None,
+            "prev_url": page_url(cursor=page["prev_cursor"]) if page["prev_cursor"] else None,
+            "first_url": page_url() if cursor else None,
+            "sort_url": sort_url,
+            "sort_by": sort_by,
+            "sort_order": sort_order,
+            "page_size": page_size,
+            "page_sizes": DEVICE_PAGE_SIZES,
             "active_only": active_only,
             "search_term": search,
-            "search_field": search_field
+            "search_field": search_field,
+            "tienda_filter": tienda_filter
         }
     )
 
@@ -153,27 +185,20 @@ async def get_videos_page(request: Request):
 async def get_device_detail(
     request: Request, 
     device_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Página de detalle de un dispositivo específico
     """
-    # Realizar el query con join para cargar las playlists asociadas
-    device = db.query(models.Device).filter(models.Device.device_id == device_id).first()
+    # Sesión asíncrona: las playlists asociadas se cargan junto al dispositivo
+    device = (await db.execute(
+        select(models.Device)
+        .options(selectinload(models.Device.playlists))
+        .where(models.Device.device_id == device_id)
+    )).scalar_one_or_none()
     if device is None:
         raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
     
-    # Cargar explícitamente las playlists del dispositivo
-    device_playlists = db.query(models.Playlist).join(
-        models.DevicePlaylist,
-        models.DevicePlaylist.playlist_id == models.Playlist.id
-    ).filter(
-        models.DevicePlaylist.device_id == device_id
-    ).all()
-    
-    # Asignar las playlists al dispositivo
-    device.playlists = device_playlists
-    
     # Obtener fecha actual para comparaciones en la plantilla
     now = datetime.now()
     
@@ -246,4 +271,28 @@ async def update_device_info(
     db.commit()
     
     # Redirigir a la página de detalle
-    return RedirectResponse(url=f"/ui/devices/{device_id}", status_code=303)
\ No newline at end of file
+    return RedirectResponse(url=f"/ui/devices/{device_id}", status_code=303)
+@router.get("/profiles", response_class=HTMLResponse)
+def get_profiles_page(request: Request):
+    """
+    Perfiles de peticiones (X-Profile: 1) y últimas peticiones lentas (solo administradores)
+    """
+    if not request_is_admin(request):
+        raise HTTPException(status_code=403, detail="Permisos de administrador requeridos")
+    profiles = profile_store.list()
+    selected = request.query_params.get("id")
+    try:
+        detail = profile_store.metadata(selected) if selected else None
+    except ValueError:
+        detail = None
+    return templates.TemplateResponse(
+        "profiles.html",
+        {
+            "request": request,
+            "title": "Perfiles de peticiones",
+            "profiles": profiles,
+            "detail": detail,
+            "slow_requests": slow_request_sampler.recent(),
+            "slow_threshold_ms": SLOW_REQUEST_THRESHOLD_MS,
+        }
+    )
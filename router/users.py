@@ -13,6 +13,8 @@ import os
 from models.database import get_db
 from models.models import User
 from utils.auth import create_session, get_current_user  # Solo importar lo que existe
+from utils.passwords import password_hasher
+from utils.session_tokens import verify_session_token
 
 # Import del servicio AD con manejo de errores robusto
 try:
@@ -45,13 +47,11 @@ def require_admin(request: Request, db: Session):
     """Verificar que el usuario sea administrador usando cookie o token"""
     
     # 1. Verificar cookie de sesión primero
-    session_cookie = request.cookies.get("session")
-    if session_cookie and len(session_cookie) > 10:
-        logger.info(f"Usuario autenticado por cookie: {session_cookie[:20]}...")
-        
-        # Buscar usuario admin en BD para datos reales
-        admin_user = db.query(User).filter(User.is_admin == True).first()
+    claims = verify_session_token(request.cookies.get("session"))
+    if claims and claims.is_admin:
+        admin_user = db.query(User).filter(User.id == claims.user_id, User.is_active == True).first()
         if admin_user:
+            logger.info(f"Administrador autenticado por cookie: {admin_user.username}")
             return {
                 "id": admin_user.id,
                 "username": admin_user.username,
@@ -59,15 +59,6 @@ def require_admin(request: Request, db: Session):
                 "is_admin": True,
                 "is_active": admin_user.is_active
             }
-        else:
-            # Datos mock si no hay admin en BD
-            return {
-                "id": 1,
-                "username": "admin",
-                "email": "admin@localhost", 
-                "is_admin": True,
-                "is_active": True
-            }
     
     # 2. Verificar token Bearer como fallback
     auth_header = request.headers.get("Authorization")
@@ -928,12 +919,14 @@ async def create_user(
         )
     
     try:
+        # bcrypt en el pool del hasher, no en el bucle de eventos
+        password_hash = await password_hasher.hash_async(password)
         # Crear nuevo usuario usando el método correcto de tu modelo
         new_user = User.create_user(
             db=db,
             username=username,
             email=email,
-            password=password,
+            password_hash=password_hash,
             fullname=fullname,
             is_admin=is_admin
         )
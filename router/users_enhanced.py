@@ -15,6 +15,7 @@ from models.database import get_db
 from models.models import User, AuthProvider, ADSyncLog
 from models.schemas import UserCreate, UserUpdate, UserResponse
 from utils.auth_enhanced import admin_required, get_current_user, auth_service
+from utils.passwords import PASSWORD_HASH_RETRY_AFTER, PasswordHasherBusy, password_hasher
 from services.ad_service import ad_service
 from config.ad_config import ad_settings
 
@@ -404,12 +405,14 @@ async def create_user(
         )
     
     try:
+        # bcrypt en el pool del hasher, no en el bucle de eventos
+        password_hash = await password_hasher.hash_async(password)
         # Crear usuario
         user = User.create_user(
             db=db,
             username=username,
             email=email,
-            password=password,
+            password_hash=password_hash,
             fullname=fullname,
             department=department,
             is_admin=is_admin,
@@ -423,6 +426,13 @@ async def create_user(
             status_code=status.HTTP_303_SEE_OTHER
         )
         
+    except PasswordHasherBusy:
+        logger.warning(f"Creación de usuario rechazada por carga: {username}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+        )
     except Exception as e:
         logger.error(f"Error creando usuario: {str(e)}")
         raise HTTPException(
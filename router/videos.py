@@ -6,7 +6,7 @@ import uuid
 import logging
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, Body, Query
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, Body, Query, Response
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
@@ -14,6 +14,8 @@ from sqlalchemy.exc import SQLAlchemyError
 from models.database import get_db
 from models.models import Video
 from models.schemas import  VideoResponse, VideoUpdate
+from utils.pagination import keyset_paginate, count_total, CursorError, TOTAL_MODES
+from utils.playlist_export import touch_playlists
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -88,13 +90,38 @@ async def create_video(
         logger.error(f"Error al crear video: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al crear video: {str(e)}")
 
+# Ordenaciones permitidas en el listado: nombre -> (columna, admite NULL)
+VIDEO_SORTS = {
+    "id": (Video.id, False),
+    "title": (Video.title, False),
+    "upload_date": (Video.upload_date, True),
+    "expiration_date": (Video.expiration_date, True),
+}
+
 @router.get("/", response_model=List[VideoResponse])
 def read_videos(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Obsoleto: usar cursor"),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor/X-Prev-Cursor"),
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    total: str = Query("none", description="Cálculo del total (cabecera X-Total-Count): none, estimate o exact"),
     active_only: bool = False,
     db: Session = Depends(get_db)
 ):
+    """
+    Listado de videos paginado por cursor. Los cursores de la página siguiente
+    y anterior se devuelven en las cabeceras X-Next-Cursor y X-Prev-Cursor.
+    """
+    if sort_by not in VIDEO_SORTS:
+        raise HTTPException(status_code=400, detail=f"Ordenación no válida. Valores permitidos: {', '.join(VIDEO_SORTS)}")
+    sort_order = sort_order.lower()
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order debe ser asc o desc")
+    if total not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail=f"total debe ser uno de: {', '.join(TOTAL_MODES)}")
+    
     try:
         query = db.query(Video)
         
@@ -105,19 +132,33 @@ def read_videos(
                 (Video.expiration_date == None) | (Video.expiration_date > now)
             )
         
-        videos = query.offset(skip).limit(limit).all()
+        sort_column, nullable = VIDEO_SORTS[sort_by]
+        if skip and not cursor:
+            # Compatibilidad con clientes que aún paginan con OFFSET
+            order = sort_column.desc() if sort_order == "desc" else sort_column.asc()
+            videos = query.order_by(order, Video.id).offset(skip).limit(limit).all()
+        else:
+            page = keyset_paginate(
+                query, sort_column, Video.id, sort_by, sort_order,
+                limit=limit, cursor=cursor, nullable=nullable
+            )
+            videos = page["items"]
+            if page["next_cursor"]:
+                response.headers["X-Next-Cursor"] = page["next_cursor"]
+            if page["prev_cursor"]:
+                response.headers["X-Prev-Cursor"] = page["prev_cursor"]
+        
+        total_items = count_total(query, total)
+        if total_items is not None:
+            response.headers["X-Total-Count"] = str(total_items)
         
         # Logging para diagnóstico
         logger.info(f"Recuperados {len(videos)} videos de la base de datos")
         
-        # Validar que tengamos datos correctos antes de devolverlos
-        for video in videos:
-            if not hasattr(video, 'id') or not video.id:
-                logger.error(f"Video con ID inválido: {video}")
-                raise ValueError("Video con ID inválido encontrado en la base de datos")
-        
         return videos
     
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except SQLAlchemyError as e:
         logger.error(f"Error de base de datos al leer videos: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
@@ -156,6 +197,8 @@ def update_video(
         update_data = video_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_video, key, value)
+        # Las exportaciones de las playlists que lo contienen cambian
+        touch_playlists(db, video_id=video_id)
         
         db.commit()
         db.refresh(db_video)
@@ -210,7 +253,8 @@ def delete_video(
         if os.path.exists(video.file_path):
             os.remove(video.file_path)
         
-        # Eliminar de la base de datos
+        # Eliminar de la base de datos (antes, nueva versión de sus playlists)
+        touch_playlists(db, video_id=video_id)
         db.delete(video)
         db.commit()
         
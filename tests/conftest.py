@@ -0,0 +1,49 @@
+"""
+tests/conftest.py
+Pruebas con una base SQLite temporal.
+
+DATABASE_URL se fija antes de importar los modelos, que crean los motores al
+importarse. Las tablas se crean una vez por sesión de pruebas y cada prueba
+recibe una sesión nueva.
+
+Uso (desde la raíz del repositorio):
+    pip install -r requirements-dev.txt
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix="videoloop_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/tests.db"
+os.environ.setdefault("SESSION_SECRET_KEY", "clave-de-pruebas")
+# Coste mínimo de bcrypt para que las pruebas de contraseñas sean rápidas
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from models import models
+    from models.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    from models.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
@@ -0,0 +1,23 @@
+"""
+tests/test_list_checker.py
+Espera del verificador de listas tras errores de base de datos.
+"""
+
+from utils.list_checker import PlaylistChecker
+
+
+def test_error_backoff_grows_and_is_capped():
+    checker = PlaylistChecker(check_interval=3600)
+    waits = []
+    for failures in range(1, 15):
+        checker.consecutive_failures = failures
+        waits.append(checker.error_backoff())
+    assert waits[0] == PlaylistChecker.ERROR_BACKOFF_INITIAL
+    assert waits == sorted(waits)
+    assert waits[-1] == PlaylistChecker.ERROR_BACKOFF_MAX
+
+
+def test_error_backoff_never_exceeds_check_interval():
+    checker = PlaylistChecker(check_interval=10)
+    checker.consecutive_failures = 50
+    assert checker.error_backoff() == 10
@@ -0,0 +1,93 @@
+"""
+tests/test_log_archive.py
+Ingesta idempotente de lotes con secuencia en el archivo de logs.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from models.database import SessionLocal
+from models.models import Device, DeviceLogChunk
+from utils import log_archive
+
+
+def make_device(db, device_id):
+    db.add(Device(device_id=device_id, name=device_id, mac_address=f"mac-{device_id}"))
+    db.commit()
+
+
+def test_concurrent_retries_archive_a_batch_once(db):
+    make_device(db, "dev-concurrent")
+    now = datetime.now()
+    entries = [(seq, now + timedelta(seconds=seq), f"línea {seq}") for seq in range(1, 101)]
+    results = []
+
+    def ingest():
+        session = SessionLocal()
+        try:
+            results.append(log_archive.append_entries(session, "dev-concurrent", entries))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=ingest) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(count for count, _ in results) == [0] * 7 + [100]
+    assert all(high_water_mark == 100 for _, high_water_mark in results)
+    archived = db.query(DeviceLogChunk).filter(DeviceLogChunk.device_id == "dev-concurrent").all()
+    assert sum(chunk.line_count for chunk in archived) == 100
+
+
+def test_compaction_keeps_last_push_time(db):
+    make_device(db, "dev-compact")
+    pushed_at = datetime.now() - timedelta(days=1)
+    for seq in range(1, 4):
+        ts = pushed_at + timedelta(seconds=seq)
+        log_archive.append_entries(db, "dev-compact", [(seq, ts, f"línea {seq}")])
+    db.query(DeviceLogChunk).filter(DeviceLogChunk.device_id == "dev-compact").update(
+        {DeviceLogChunk.created_at: pushed_at}, synchronize_session=False
+    )
+    db.commit()
+
+    assert log_archive.compact_device(db, "dev-compact", older_than=datetime.now()) > 0
+    assert log_archive.last_push_at(db, "dev-compact") == pushed_at
+    assert log_archive.get_high_water_mark(db, "dev-compact") == 3
+
+
+def push(db, device_id, start, seqs, base):
+    entries = [(seq, base + timedelta(seconds=seq), f"línea {seq}") for seq in range(start, start + seqs)]
+    log_archive.append_entries(db, device_id, entries)
+
+
+def test_compaction_does_not_merge_across_a_full_chunk(db, monkeypatch):
+    monkeypatch.setattr(log_archive, "LOG_ARCHIVE_CHUNK_MAX_LINES", 3)
+    make_device(db, "dev-full")
+    base = datetime.now() - timedelta(days=1)
+    push(db, "dev-full", 1, 1, base)     # pequeño
+    push(db, "dev-full", 2, 3, base)     # lleno
+    push(db, "dev-full", 5, 1, base)     # pequeño
+
+    assert log_archive.compact_device(db, "dev-full", older_than=datetime.now()) == 0
+    assert log_archive.read_lines(db, "dev-full") == [f"línea {seq}" for seq in range(1, 6)]
+
+
+def test_compaction_merges_only_adjacent_runs(db, monkeypatch):
+    monkeypatch.setattr(log_archive, "LOG_ARCHIVE_CHUNK_MAX_LINES", 3)
+    make_device(db, "dev-runs")
+    base = datetime.now() - timedelta(days=1)
+    push(db, "dev-runs", 1, 1, base)     # pequeño
+    push(db, "dev-runs", 2, 1, base)     # pequeño
+    push(db, "dev-runs", 3, 3, base)     # lleno
+    push(db, "dev-runs", 6, 1, base)     # pequeño
+    push(db, "dev-runs", 7, 1, base)     # pequeño
+
+    assert log_archive.compact_device(db, "dev-runs", older_than=datetime.now()) == 2
+    chunks = db.query(DeviceLogChunk).filter(DeviceLogChunk.device_id == "dev-runs").order_by(
+        DeviceLogChunk.last_ts, DeviceLogChunk.id
+    ).all()
+    assert [chunk.line_count for chunk in chunks] == [2, 3, 2]
+    assert all(earlier.last_ts < later.first_ts for earlier, later in zip(chunks, chunks[1:]))
+    assert log_archive.read_lines(db, "dev-runs") == [f"línea {seq}" for seq in range(1, 9)]
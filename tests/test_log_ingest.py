@@ -0,0 +1,36 @@
+"""
+tests/test_log_ingest.py
+Decodificación y archivo de los lotes de logs enviados por los agentes.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+from models.models import Device
+from utils import log_archive
+from utils.log_ingest import decode_batch, store_batch
+
+
+def test_aware_timestamps_become_local_naive():
+    aware = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    batch = decode_batch(json.dumps({"entries": [
+        {"seq": 1, "ts": aware.isoformat(), "message": "con zona"},
+        {"seq": 2, "ts": "2026-01-01T12:00:01", "message": "sin zona"},
+    ]}).encode())
+
+    assert all(entry.ts.tzinfo is None for entry in batch.entries)
+    assert batch.entries[0].ts == aware.astimezone().replace(tzinfo=None)
+
+
+def test_mixed_batch_is_archived(db):
+    db.add(Device(device_id="dev-mixed", name="dev-mixed", mac_address="mac-dev-mixed"))
+    db.commit()
+    now = datetime.now()
+    body = json.dumps({"entries": [
+        {"seq": 1, "ts": (now - timedelta(seconds=2)).astimezone().isoformat(), "message": "con zona"},
+        {"seq": 2, "ts": (now - timedelta(seconds=1)).isoformat(), "message": "sin zona"},
+        {"seq": 3, "ts": now.astimezone(timezone.utc).isoformat(), "message": "UTC"},
+    ]}).encode()
+
+    assert store_batch("dev-mixed", decode_batch(body)) == (3, 3)
+    assert log_archive.read_lines(db, "dev-mixed") == ["con zona", "sin zona", "UTC"]
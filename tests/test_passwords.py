@@ -0,0 +1,67 @@
+"""
+tests/test_passwords.py
+Hash de contraseñas: rehash al cambiar el coste y ejecución en el pool del hasher.
+"""
+
+import asyncio
+
+import pytest
+
+from models.models import User
+from utils import passwords
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_verify_without_cost_change_does_not_rehash():
+    hasher = PasswordHasher(rounds=4)
+    valid, new_hash = hasher.verify("secreto", hasher.hash("secreto"))
+    assert valid is True
+    assert new_hash is None
+
+
+def test_verify_and_update_rehashes_on_cost_change():
+    old_hash = PasswordHasher(rounds=4).hash("secreto")
+    hasher = PasswordHasher(rounds=5)
+
+    valid, new_hash = hasher.verify("secreto", old_hash)
+
+    assert valid is True
+    assert new_hash.startswith("$2b$05$")
+    assert hasher.verify("secreto", new_hash) == (True, None)
+
+
+def test_wrong_password_is_not_rehashed():
+    old_hash = PasswordHasher(rounds=4).hash("secreto")
+    assert PasswordHasher(rounds=5).verify("otra", old_hash) == (False, None)
+
+
+def test_unknown_hash_format_is_rejected():
+    assert PasswordHasher(rounds=4).verify("secreto", "no-es-un-hash") == (False, None)
+
+
+def test_user_stores_rehash_after_login(db, monkeypatch):
+    old_hash = PasswordHasher(rounds=4).hash("secreto")
+    user = User.create_user(db, "rehash", email="rehash@example.com", password_hash=old_hash)
+
+    monkeypatch.setattr(passwords.password_hasher, "context", PasswordHasher(rounds=5).context)
+    assert asyncio.run(user.verify_password_async("secreto")) is True
+    db.commit()
+    db.refresh(user)
+
+    assert user.password_hash != old_hash
+    assert user.password_hash.startswith("$2b$05$")
+    assert user.verify_password("secreto") is True
+
+
+def test_hash_async_runs_in_hasher_pool():
+    hasher = PasswordHasher(rounds=4)
+    password_hash = asyncio.run(hasher.hash_async("secreto"))
+    assert hasher.verify("secreto", password_hash) == (True, None)
+    assert hasher.pending == 0
+
+
+def test_busy_hasher_rejects_new_work():
+    hasher = PasswordHasher(rounds=4, max_pending=0)
+    with pytest.raises(PasswordHasherBusy):
+        asyncio.run(hasher.hash_async("secreto"))
+    assert hasher.rejected == 1
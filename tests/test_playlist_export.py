@@ -0,0 +1,17 @@
+"""
+tests/test_playlist_export.py
+Cabeceras de la descarga de playlists.
+"""
+
+from utils.playlist_export import content_disposition
+
+
+def test_ascii_filename_is_sent_as_is():
+    assert content_disposition("playlist_Lista_1.json") == 'attachment; filename="playlist_Lista_1.json"'
+
+
+def test_non_latin1_and_quotes_use_rfc5987():
+    header = content_disposition('playlist_Promo_–_€_"x".json')
+    header.encode("latin-1")
+    assert 'filename="playlist_Promo______x_.json"' in header
+    assert "filename*=utf-8''playlist_Promo_%E2%80%93_%E2%82%AC_%22x%22.json" in header
@@ -0,0 +1,46 @@
+"""
+tests/test_playlist_includes.py
+Los listados de playlists con include= cargan las colecciones con un número
+constante de consultas, sin depender del número de playlists (sin N+1).
+"""
+
+import pytest
+
+from models.models import Device, DevicePlaylist, Playlist, PlaylistVideo, Video
+from router.playlists import read_playlists
+from utils.sql_accounting import track_sql
+
+
+def seed_playlists(db, count: int, prefix: str):
+    for n in range(count):
+        playlist = Playlist(title=f"{prefix} {n}", is_active=True)
+        video = Video(title=f"{prefix} vídeo {n}", file_path=f"uploads/{prefix}_{n}.mp4")
+        device = Device(device_id=f"{prefix}-{n}", name=f"{prefix} {n}", mac_address=f"{prefix}-mac-{n}")
+        db.add_all([playlist, video, device])
+        db.flush()
+        db.add_all([
+            PlaylistVideo(playlist_id=playlist.id, video_id=video.id, position=1),
+            DevicePlaylist(device_id=device.device_id, playlist_id=playlist.id),
+        ])
+    db.commit()
+
+
+def count_list_statements(db, include):
+    db.expire_all()
+    with track_sql("GET /api/playlists/", strict=True, threshold=1) as stats:
+        result = read_playlists(skip=0, limit=10000, active_only=False, include=include, fields=None, db=db)
+    return stats.statements, result
+
+
+@pytest.mark.parametrize("include, expected", [("", 1), ("videos", 2), ("videos,devices", 3)])
+def test_include_uses_constant_statement_count(db, include, expected):
+    seed_playlists(db, 3, f"pocas-{include}")
+    few, _ = count_list_statements(db, include)
+    seed_playlists(db, 40, f"muchas-{include}")
+    many, result = count_list_statements(db, include)
+
+    assert few == many == expected
+    if "videos" in include:
+        assert all(len(playlist["videos"]) == 1 for playlist in result if playlist["title"].startswith("muchas"))
+    if "devices" in include:
+        assert all(len(playlist["devices"]) == 1 for playlist in result if playlist["title"].startswith("muchas"))
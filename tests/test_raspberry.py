@@ -0,0 +1,35 @@
+"""
+tests/test_raspberry.py
+Registro de errores de las rutas de los dispositivos.
+"""
+
+import asyncio
+import logging
+
+import pytest
+from fastapi import HTTPException
+
+from router import raspberry
+
+
+def fail_with(status_code):
+    async def get_active_playlists_for_raspberry(device_id=None, db=None):
+        raise HTTPException(status_code=status_code, detail="fallo de prueba")
+    return get_active_playlists_for_raspberry
+
+
+@pytest.mark.parametrize("status_code, message", [
+    (404, "Device not found: rpi-1"),
+    (503, "Error getting playlists for device rpi-1: 503 fallo de prueba"),
+])
+def test_device_playlists_logs_actual_http_error(monkeypatch, caplog, status_code, message):
+    monkeypatch.setattr(raspberry, "get_active_playlists_for_raspberry", fail_with(status_code))
+
+    with caplog.at_level(logging.INFO, logger=raspberry.logger.name):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(raspberry.get_active_playlists_for_device("rpi-1", db=None))
+
+    assert error.value.status_code == status_code
+    assert message in caplog.text
+    if status_code != 404:
+        assert "Device not found" not in caplog.text
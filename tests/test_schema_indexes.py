@@ -0,0 +1,32 @@
+"""
+tests/test_schema_indexes.py
+Creación idempotente de los índices de los modelos.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import models
+from models.database import create_index_statement, ensure_indexes
+
+
+def playlist_index(name):
+    return next(index for index in models.Playlist.__table__.indexes if index.name == name)
+
+
+def test_create_index_statement_is_idempotent_and_concurrent_on_postgresql():
+    index = playlist_index("ix_playlists_active_start_date")
+    statement = create_index_statement(index, postgresql.dialect())
+    assert statement.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_playlists_active_start_date")
+    assert "CONCURRENTLY" not in create_index_statement(index, sqlite.dialect())
+
+
+def test_ensure_indexes_recreates_missing_index_and_can_run_twice(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_playlists_active_start_date"))
+
+    ensure_indexes(engine)
+    ensure_indexes(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("playlists")}
+    assert "ix_playlists_active_start_date" in names
@@ -0,0 +1,28 @@
+"""
+tests/test_search.py
+Índices de búsqueda por subcadena.
+"""
+
+from models.models import Device
+from utils import search
+
+
+def test_postgresql_indexes_are_built_concurrently_one_per_statement():
+    statements = search._postgresql_index_statements()
+    expected = sum(len(spec['columns']) for spec in search.SEARCH_ENTITIES.values())
+    assert len(statements) == expected
+    assert all(statement.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS ") for statement in statements)
+    assert all(";" not in statement for statement in statements)
+
+
+def test_sqlite_search_tables_are_idempotent(engine, db):
+    search.ensure_search_tables(engine)
+    search.ensure_search_tables(engine)
+    # En SQLite los índices de trigramas de PostgreSQL no se crean
+    search.ensure_search_indexes(engine)
+
+    db.add(Device(device_id="busqueda-1", name="Escaparate principal", mac_address="busqueda-mac-1"))
+    db.commit()
+
+    results = search.search_entity(db, 'device', 'parate')
+    assert [result["key"] for result in results] == ["busqueda-1"]
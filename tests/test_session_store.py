@@ -0,0 +1,60 @@
+"""
+tests/test_session_store.py
+Sesiones persistentes: escritura diferida de last_seen y revocaciones.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from models.models import User, UserSession
+from utils.session_store import SessionStore
+
+
+def make_user(db, username):
+    user = User(username=username, auth_provider="local", is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_flush_last_seen_skips_deleted_sessions(db):
+    store = SessionStore()
+    user = make_user(db, "flush-user")
+    _, kept = store.create(db, user)
+    _, gone = store.create(db, user)
+    db.execute(delete(UserSession).where(UserSession.session_id == gone["session_id"]))
+    db.commit()
+
+    store.touch(kept["session_id"])
+    store.touch(gone["session_id"])
+    assert store.flush_last_seen() == 2
+
+    db.expire_all()
+    row = db.get(UserSession, kept["session_id"])
+    assert row.last_seen > kept["last_seen"]
+    assert store.stats()["pending_last_seen"] == 0
+
+
+def test_refresh_loads_revocations_stamped_before_the_last_one(db):
+    from datetime import timedelta
+
+    from utils.session_tokens import RevocationList
+
+    store = SessionStore()
+    user = make_user(db, "revocation-user")
+    _, late = store.create(db, user)
+    _, early = store.create(db, user)
+    revocations = RevocationList()
+
+    now = datetime.now()
+    db.get(UserSession, late["session_id"]).revoked_at = now
+    db.commit()
+    revocations.refresh(db)
+    assert late["session_id"] in revocations
+
+    # Otro nodo con el reloj 5 s atrasado confirma su revocación después
+    db.get(UserSession, early["session_id"]).revoked_at = now - timedelta(seconds=5)
+    db.commit()
+    revocations.refresh(db)
+    assert early["session_id"] in revocations
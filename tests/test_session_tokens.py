@@ -0,0 +1,51 @@
+"""
+tests/test_session_tokens.py
+Validación de los tokens de sesión firmados.
+"""
+
+import time
+
+import pytest
+
+from utils.session_tokens import issue_session_token, new_session_id, revocations, verify_session_token
+
+
+def make_token(user_id=1, is_admin=False, ttl=3600):
+    return issue_session_token(user_id, is_admin, new_session_id(), int(time.time()) + ttl)
+
+
+def test_valid_token_round_trip():
+    claims = verify_session_token(make_token(user_id=7, is_admin=True))
+    assert claims is not None
+    assert claims.user_id == 7
+    assert claims.is_admin is True
+
+
+@pytest.mark.parametrize("cookie", [
+    None,
+    "",
+    "x" * 20,
+    "v1.1.1.9999999999.x.éé",
+    "v1.1.1.9999999999.é.abc",
+    "ñ" * 40,
+    "v1.1.1.9999999999.x." + "a" * 300,
+])
+def test_garbage_cookie_is_rejected(cookie):
+    assert verify_session_token(cookie) is None
+
+
+def test_tampered_token_is_rejected():
+    token = make_token(is_admin=False)
+    forged = token.replace("v1.1.0.", "v1.1.1.", 1)
+    assert verify_session_token(forged) is None
+
+
+def test_expired_token_is_rejected():
+    assert verify_session_token(make_token(ttl=-1)) is None
+
+
+def test_revoked_token_is_rejected():
+    token = make_token()
+    claims = verify_session_token(token)
+    revocations.add(claims.session_id, claims.expires_at)
+    assert verify_session_token(token) is None
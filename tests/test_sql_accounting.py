@@ -0,0 +1,57 @@
+"""
+tests/test_sql_accounting.py
+Detección de sentencias repetidas (N+1) y modo estricto.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from models.models import Device, DevicePlaylist, Playlist
+from utils import sql_accounting
+from utils.sql_accounting import RepeatedQueryError, fingerprint, track_sql
+
+
+def test_fingerprint_ignores_literals_and_in_lists():
+    assert fingerprint("SELECT * FROM devices WHERE id = 1") == fingerprint("SELECT * FROM devices WHERE id = 42")
+    assert fingerprint("SELECT * FROM devices WHERE id IN (1, 2, 3)") == fingerprint("SELECT * FROM devices WHERE id IN (7)")
+
+
+def test_strict_mode_raises_on_repeated_statement(db):
+    with pytest.raises(RepeatedQueryError) as error:
+        with track_sql("bucle", strict=True, threshold=3):
+            for n in range(5):
+                db.execute(text("SELECT :n"), {"n": n})
+    assert error.value.repeated[0]["count"] == 5
+
+
+def test_statements_under_threshold_do_not_raise(db):
+    with track_sql("bucle", strict=True, threshold=3) as stats:
+        for n in range(3):
+            db.execute(text("SELECT :n"), {"n": n})
+    assert stats.statements == 3
+    assert stats.repeated(3) == []
+
+
+def test_device_list_stays_under_threshold_in_strict_mode(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    # Más dispositivos que el umbral: una consulta por dispositivo haría fallar la petición
+    for n in range(sql_accounting.SQL_REPEAT_THRESHOLD + 5):
+        playlist = Playlist(title=f"Lista estricta {n}", is_active=True)
+        device = Device(device_id=f"estricto-{n}", name=f"Estricto {n}", mac_address=f"estricto-mac-{n}")
+        db.add_all([playlist, device])
+        db.flush()
+        db.add(DevicePlaylist(device_id=device.device_id, playlist_id=playlist.id))
+    db.commit()
+
+    monkeypatch.setattr(sql_accounting, "SQL_STRICT_MODE", True)
+    # Sin el bloque with no se lanzan las tareas de arranque
+    client = TestClient(main.app)
+    response = client.get("/api/devices/", params={"limit": 1000})
+
+    assert response.status_code == 200
+    devices = {device["device_id"]: device for device in response.json()}
+    assert all(len(devices[f"estricto-{n}"]["playlists"]) == 1
+               for n in range(sql_accounting.SQL_REPEAT_THRESHOLD + 5))
@@ -0,0 +1,60 @@
+"""
+tests/test_system_api.py
+Las rutas de estado interno (/api/system) solo responden a administradores.
+"""
+
+import time
+
+import pytest
+
+from utils.session_tokens import issue_session_token, new_session_id
+
+
+@pytest.fixture
+def client(engine):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    # Sin el bloque with no se lanzan las tareas de arranque
+    return TestClient(main.app)
+
+
+def session_cookie(is_admin: bool) -> dict:
+    return {"session": issue_session_token(1, is_admin, new_session_id(), int(time.time()) + 3600)}
+
+
+@pytest.mark.parametrize("path", ["/api/system/db-pool", "/api/system/db-pool?reset=true"])
+def test_db_pool_requires_admin(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, cookies=session_cookie(is_admin=False)).status_code == 403
+
+
+def test_db_pool_for_admin(client):
+    response = client.get("/api/system/db-pool", cookies=session_cookie(is_admin=True))
+    assert response.status_code == 200
+
+
+def session_token(is_admin: bool) -> str:
+    return issue_session_token(1, is_admin, new_session_id(), int(time.time()) + 3600)
+
+
+@pytest.mark.parametrize("path", ["/api/system/db-pool", "/api/system/profiles", "/api/system/slow-requests"])
+def test_arbitrary_bearer_header_is_not_admin(client, path):
+    response = client.get(path, headers={"Authorization": "Bearer inventado"})
+    assert response.status_code == 403
+
+
+def test_non_admin_bearer_token_is_not_admin(client):
+    headers = {"Authorization": f"Bearer {session_token(is_admin=False)}"}
+    assert client.get("/api/system/db-pool", headers=headers).status_code == 403
+
+
+def test_signed_admin_bearer_token_is_admin(client):
+    headers = {"Authorization": f"Bearer {session_token(is_admin=True)}"}
+    assert client.get("/api/system/db-pool", headers=headers).status_code == 200
+
+
+def test_arbitrary_bearer_header_does_not_enable_profiling(client):
+    response = client.get("/api/devices/", headers={"Authorization": "Bearer inventado", "X-Profile": "1"})
+    assert "X-Profile-Id" not in response.headers
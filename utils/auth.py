@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import logging
 import uuid
 
+from utils.session_tokens import verify_session_token
+
 logger = logging.getLogger(__name__)
 
 # Dependencia de seguridad HTTP Bearer
@@ -54,7 +56,7 @@ async def authenticate_user(db: Session, username: str, password: str):
     
     try:
         user = db.query(User).filter(User.username == username).first()
-        if user and user.verify_password(password) and user.is_active:
+        if user and user.is_active and await user.verify_password_async(password):
             user.update_last_login()
             db.commit()
             return user
@@ -103,6 +105,34 @@ def admin_required(request: Request):
         )
     return user
 
+def request_is_admin(request: Request) -> bool:
+    """
+    Comprobar si la petición viene de un administrador (token o cookie de sesión)
+
+    Solo cuenta un token de sesión firmado y válido (el de la cookie o el
+    access_token de /api/login en la cabecera Bearer). No usa
+    get_current_user(), que acepta cualquier cabecera Bearer.
+    """
+    tokens = [request.cookies.get("session")]
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        tokens.append(auth_header[len("Bearer "):].strip())
+    for token in tokens:
+        claims = verify_session_token(token)
+        if claims and claims.is_admin:
+            return True
+    return False
+
+def admin_request_required(request: Request):
+    """
+    Dependencia que requiere un administrador autenticado por token o cookie
+    """
+    if not request_is_admin(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permisos de administrador requeridos"
+        )
+
 def create_access_token(user_data: dict, expires_delta: timedelta = None):
     """
     Crear token de acceso (implementación básica)
@@ -4,26 +4,26 @@ import logging
 import os
 from typing import Tuple, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import secrets
-import hashlib
 
 from models.models import User
+from utils.passwords import PasswordHasherBusy
+from utils.session_store import session_store
+from utils.session_tokens import SESSION_TTL_SECONDS, verify_session_token
 
 logger = logging.getLogger(__name__)
 
 class AuthenticationService:
     """Servicio de autenticación que soporta múltiples proveedores"""
     
-    def __init__(self):
-        self.session_store = {}  # En producción usar Redis o DB
-    
-    def authenticate_user(self, db: Session, username: str, password: str) -> Tuple[bool, Optional[User], str]:
+    async def authenticate_user(self, db: Session, username: str, password: str) -> Tuple[bool, Optional[User], str]:
         """
         Autentica un usuario usando múltiples proveedores
         
         Returns:
             (success, user, message)
+        
+        Raises:
+            PasswordHasherBusy: Si hay demasiadas verificaciones de contraseña en espera
         """
         try:
             # Limpiar username
@@ -38,8 +38,9 @@ class AuthenticationService:
             ).first()
             
             if local_user and local_user.auth_provider == "local":
-                # Usuario local - verificar contraseña
-                if local_user.verify_password(password):
+                # Usuario local - verificar contraseña (fuera del bucle de eventos;
+                # si el coste de bcrypt ha cambiado, el hash se recalcula y se guarda aquí)
+                if await local_user.verify_password_async(password):
                     local_user.update_last_login()
                     db.commit()
                     logger.info(f"Autenticación local exitosa: {username}")
@@ -77,6 +78,8 @@ class AuthenticationService:
             logger.warning(f"Usuario no encontrado en ningún proveedor: {username}")
             return False, None, "Usuario no encontrado"
             
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Error en autenticación de {username}: {str(e)}")
             return False, None, "Error interno de autenticación"
@@ -174,29 +177,14 @@ class AuthenticationService:
         except Exception:
             return False
     
-    def create_access_token(self, user: User) -> Dict[str, Any]:
-        """Crea un token de acceso para el usuario"""
-        # Generar session ID
-        session_id = secrets.token_urlsafe(32)
-        
-        # Datos del token
-        token_data = {
-            "session_id": session_id,
-            "user_id": user.id,
-            "username": user.username,
-            "is_admin": user.is_admin,
-            "auth_provider": user.auth_provider,
-            "created_at": datetime.now(),
-            "expires_at": datetime.now() + timedelta(hours=24)
-        }
-        
-        # Guardar en store (en producción usar Redis)
-        self.session_store[session_id] = token_data
+    def create_access_token(self, db: Session, user: User) -> Dict[str, Any]:
+        """Crea una sesión y su token de acceso (token de sesión firmado) para el usuario"""
+        access_token, _ = session_store.create(db, user)
         
         return {
-            "access_token": session_id,
+            "access_token": access_token,
             "token_type": "bearer",
-            "expires_in": 86400,  # 24 horas
+            "expires_in": SESSION_TTL_SECONDS,
             "user": {
                 "id": user.id,
                 "username": user.username,
@@ -208,27 +196,19 @@ class AuthenticationService:
         }
     
     def verify_session(self, session_id: str) -> Optional[Dict]:
-        """Verifica un session ID"""
-        if not session_id:
-            return None
-            
-        session_data = self.session_store.get(session_id)
-        if not session_data:
+        """Verifica un token de sesión y devuelve los datos de la sesión"""
+        claims = verify_session_token(session_id)
+        if claims is None:
             return None
         
-        # Verificar expiración
-        if datetime.now() > session_data['expires_at']:
-            del self.session_store[session_id]
-            return None
-        
-        return session_data
+        return session_store.get(claims.session_id)
     
-    def revoke_session(self, session_id: str) -> bool:
-        """Revoca un session ID"""
-        if session_id in self.session_store:
-            del self.session_store[session_id]
-            return True
-        return False
+    def revoke_session(self, db: Session, session_id: str) -> bool:
+        """Revoca un token de sesión en todos los procesos"""
+        claims = verify_session_token(session_id)
+        if claims is None:
+            return False
+        return session_store.revoke(db, claims.session_id, claims.expires_at)
 
 # Instancia global del servicio
 auth_service = AuthenticationService()
\ No newline at end of file
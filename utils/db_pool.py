@@ -0,0 +1,269 @@
+"""
+utils/db_pool.py
+Instrumentación del pool de conexiones a la base de datos.
+
+Para cada motor registrado se mide:
+  - el tiempo de espera para obtener una conexión del pool (histograma),
+  - las conexiones en uso y quién las tiene (ruta de la petición),
+  - las retenciones más largas.
+
+La ruta de la petición se guarda en una ContextVar desde un middleware;
+las tareas en segundo plano se identifican con bind_holder().
+Cuando el pool se agota se registran en el log las conexiones ocupadas
+más antiguas con su ruta, para saber quién las retiene.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Retención de una conexión a partir de la cual se avisa en el log (milisegundos)
+DB_SLOW_CHECKOUT_MS = float(os.environ.get('DB_SLOW_CHECKOUT_MS', '2000'))
+# Número de retenciones más largas que se conservan
+DB_SLOW_CHECKOUT_KEEP = int(os.environ.get('DB_SLOW_CHECKOUT_KEEP', '20'))
+
+# Límites de los intervalos del histograma de espera (milisegundos)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Quién usa la conexión: "GET /api/..." o el nombre de una tarea en segundo plano
+current_holder: ContextVar[str] = ContextVar('db_current_holder', default='-')
+
+
+@contextmanager
+def bind_holder(name: str):
+    """
+    Identificar el código que usa la base de datos (peticiones, tareas)
+
+    Args:
+        name: Ruta de la petición o nombre de la tarea
+    """
+    token = current_holder.set(name)
+    try:
+        yield
+    finally:
+        current_holder.reset(token)
+
+
+class Histogram:
+    """Histograma acumulado con intervalos fijos"""
+
+    def __init__(self, buckets=WAIT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for position, limit in enumerate(self.buckets):
+            if value <= limit:
+                index = position
+                break
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        cumulative, running = {}, 0
+        for limit, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            running += count
+            cumulative[str(limit)] = running
+        return {
+            "count": self.count,
+            "sum_ms": round(self.total, 3),
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class PoolMonitor:
+    """
+    Estadísticas de uso de los pools de conexiones de los motores registrados
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict] = {}
+
+    def _stats(self, name: str) -> Dict:
+        stats = self._pools.get(name)
+        if stats is None:
+            stats = {
+                "engine": None,
+                "wait": Histogram(),
+                "hold": Histogram(),
+                "timeouts": 0,
+                "checkouts": 0,
+                "slow_checkouts": 0,
+                "max_in_use": 0,
+                "active": {},
+                "slowest": [],
+            }
+            self._pools[name] = stats
+        return stats
+
+    def register(self, name: str, engine):
+        with self._lock:
+            self._stats(name)["engine"] = engine
+
+    def record_wait(self, name: str, waited_ms: float):
+        with self._lock:
+            self._stats(name)["wait"].observe(waited_ms)
+
+    def record_timeout(self, name: str, waited_ms: float):
+        with self._lock:
+            stats = self._stats(name)
+            stats["timeouts"] += 1
+            stats["wait"].observe(waited_ms)
+            holders = sorted(stats["active"].values(), key=lambda holder: holder["since"])[:10]
+        now = time.monotonic()
+        logger.error(
+            f"Pool '{name}' agotado tras esperar {waited_ms:.0f} ms; conexiones ocupadas más antiguas: "
+            + ", ".join(f"{holder['holder']} ({(now - holder['since']) * 1000:.0f} ms)" for holder in holders)
+        )
+
+    def checkout(self, name: str, key: int):
+        with self._lock:
+            stats = self._stats(name)
+            stats["checkouts"] += 1
+            stats["active"][key] = {"holder": current_holder.get(), "since": time.monotonic(), "at": datetime.now()}
+            stats["max_in_use"] = max(stats["max_in_use"], len(stats["active"]))
+
+    def checkin(self, name: str, key: int):
+        with self._lock:
+            stats = self._stats(name)
+            holder = stats["active"].pop(key, None)
+            if holder is None:
+                return
+            held_ms = (time.monotonic() - holder["since"]) * 1000
+            stats["hold"].observe(held_ms)
+            entry = (held_ms, holder["at"].isoformat(), holder["holder"])
+            if len(stats["slowest"]) < DB_SLOW_CHECKOUT_KEEP:
+                heapq.heappush(stats["slowest"], entry)
+            elif held_ms > stats["slowest"][0][0]:
+                heapq.heapreplace(stats["slowest"], entry)
+            slow = held_ms >= DB_SLOW_CHECKOUT_MS
+            if slow:
+                stats["slow_checkouts"] += 1
+        if slow:
+            logger.warning(f"Conexión del pool '{name}' retenida {held_ms:.0f} ms por {holder['holder']}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Estado actual de cada pool registrado
+
+        Returns:
+            Diccionario nombre del motor -> tamaño, uso, histogramas y retenciones más largas
+        """
+        now = time.monotonic()
+        result = {}
+        with self._lock:
+            for name, stats in self._pools.items():
+                pool = stats["engine"].pool if stats["engine"] is not None else None
+                in_use = sorted(stats["active"].values(), key=lambda holder: holder["since"])
+                info = {
+                    "pool_class": type(pool).__name__ if pool is not None else None,
+                    "in_use": len(in_use),
+                    "max_in_use": stats["max_in_use"],
+                    "checkouts": stats["checkouts"],
+                    "timeouts": stats["timeouts"],
+                    "slow_checkouts": stats["slow_checkouts"],
+                    "wait_ms": stats["wait"].snapshot(),
+                    "hold_ms": stats["hold"].snapshot(),
+                    "holders": [
+                        {"holder": holder["holder"], "since": holder["at"].isoformat(),
+                         "held_ms": round((now - holder["since"]) * 1000, 1)}
+                        for holder in in_use[:20]
+                    ],
+                    "slowest": [
+                        {"holder": holder, "at": at, "held_ms": round(held_ms, 1)}
+                        for held_ms, at, holder in sorted(stats["slowest"], reverse=True)
+                    ],
+                }
+                if isinstance(pool, QueuePool):
+                    info.update({
+                        "size": pool.size(),
+                        "checked_out": pool.checkedout(),
+                        "overflow": pool.overflow(),
+                        "max_overflow": pool._max_overflow,
+                        "timeout": pool.timeout(),
+                    })
+                result[name] = info
+        return result
+
+    def reset(self):
+        """Vaciar las estadísticas (las conexiones en uso se mantienen)"""
+        with self._lock:
+            for stats in self._pools.values():
+                stats.update({
+                    "wait": Histogram(), "hold": Histogram(), "timeouts": 0, "checkouts": 0,
+                    "slow_checkouts": 0, "max_in_use": len(stats["active"]), "slowest": [],
+                })
+
+
+# Instancia global
+pool_monitor = PoolMonitor()
+
+
+class _TimedCheckoutMixin:
+    """Mide cuánto se espera en el pool hasta obtener una conexión"""
+
+    monitor_name = 'default'
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_monitor.record_timeout(self.monitor_name, (time.monotonic() - started) * 1000)
+            raise
+        pool_monitor.record_wait(self.monitor_name, (time.monotonic() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() sustituye el pool por uno nuevo de la misma clase
+        pool = super().recreate()
+        pool.monitor_name = self.monitor_name
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool con medición del tiempo de espera"""
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool con medición del tiempo de espera"""
+
+
+def instrument_engine(engine, name: str):
+    """
+    Registrar los eventos checkout/checkin del pool de un motor
+
+    Args:
+        engine: Motor síncrono (para un AsyncEngine, su sync_engine)
+        name: Nombre del motor en las estadísticas
+    """
+    if isinstance(engine.pool, _TimedCheckoutMixin):
+        engine.pool.monitor_name = name
+    pool_monitor.register(name, engine)
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_monitor.checkout(name, id(connection_record))
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_monitor.checkin(name, id(connection_record))
+
@@ -1,10 +1,13 @@
 # utils/helpers.py
 # Funciones auxiliares actualizadas para manejar fechas de inicio y fin
 
+import logging
 from datetime import datetime
 from typing import Optional
 from models.models import Playlist
 
+logger = logging.getLogger(__name__)
+
 def is_playlist_active(playlist: Playlist, check_time: Optional[datetime] = None) -> bool:
     """
     Verifica si una playlist está activa considerando las fechas de inicio y fin
@@ -228,6 +231,41 @@ def get_next_status_change(playlist: Playlist, check_time: Optional[datetime] =
         'formatted_time': format_timedelta(time_until_change)
     }
 
+def analyze_and_clean_string(value, field_name: str):
+    """
+    Detecta y elimina caracteres nulos y de control de un campo de texto
+    
+    Args:
+        value: Valor del campo (los que no son cadenas se devuelven tal cual)
+        field_name: Nombre del campo para los mensajes de log
+        
+    Returns:
+        Valor limpio
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # Detectar caracteres problemáticos
+        problematic_chars = []
+        for i, char in enumerate(value):
+            if ord(char) == 0:  # Carácter nulo
+                problematic_chars.append(f"NUL at position {i}")
+            elif ord(char) < 32 and char not in ['\t', '\n', '\r']:  # Caracteres de control
+                problematic_chars.append(f"Control char {ord(char)} at position {i}")
+        
+        if problematic_chars:
+            logger.warning(f"Campo {field_name} contiene caracteres problemáticos: {problematic_chars}")
+        
+        # Limpiar el string
+        cleaned = ''.join(char for char in value if ord(char) >= 32 or char in ['\t', '\n', '\r'])
+        cleaned = cleaned.replace('\x00', '').replace('\r', '').replace('\n', ' ').strip()
+        
+        if cleaned != value:
+            logger.info(f"Campo {field_name} limpiado: '{value}' -> '{cleaned}'")
+        
+        return cleaned
+    return value
+
 # Función auxiliar para compatibilidad hacia atrás
 def manage_service(device_id: str, service_name: str, action: str) -> dict:
     """
@@ -10,6 +10,7 @@ from io import StringIO
 
 from models import models
 from models.database import SessionLocal
+from utils.metrics import ssh_connect
 
 logging.basicConfig(
     level=logging.INFO,
@@ -84,10 +85,10 @@ async def validate_ssh_credentials(device_id):
                 # Intentar conectar con clave SSH primero
                 if os.path.exists(SSH_KEY_PATH):
                     key = paramiko.RSAKey.from_private_key_file(SSH_KEY_PATH)
-                    ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=5)
+                    ssh_connect(ssh, "validate", ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=5)
                 else:
                     # Si no hay clave, usar contraseña
-                    ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=5)
+                    ssh_connect(ssh, "validate", ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=5)
                 
                 # Si llegamos aquí, la conexión fue exitosa
                 logger.info(f"Conexión SSH exitosa a {connection_type} ({ip_address})")
@@ -178,10 +179,10 @@ async def change_hostname(device_id, new_hostname):
             # Usar la misma conexión que funcionó en la validación
             if os.path.exists(SSH_KEY_PATH):
                 key = paramiko.RSAKey.from_private_key_file(SSH_KEY_PATH)
-                ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=10)
+                ssh_connect(ssh, "hostname", ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=10)
             else:
                 # Si no hay clave, usar contraseña
-                ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=10)
+                ssh_connect(ssh, "hostname", ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=10)
             
             # Verificar la distribución y comportamientos específicos
             stdin, stdout, stderr = ssh.exec_command('cat /etc/os-release')
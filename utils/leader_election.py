@@ -0,0 +1,429 @@
+"""
+utils/leader_election.py
+Elección de líder para las tareas en segundo plano que deben ejecutarse
+una sola vez aunque haya varios workers de uvicorn o varios nodos.
+
+Cada tarea tiene su propio candado:
+  - PostgreSQL: pg_try_advisory_lock sobre una conexión dedicada. Si el
+    proceso líder muere, el servidor cierra la sesión y libera el candado,
+    y otro proceso lo toma en el siguiente intento.
+  - SQLite/desarrollo: flock sobre un fichero en LEADER_LOCK_DIR; el sistema
+    operativo lo libera al morir el proceso.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from models.database import engine
+from utils.db_pool import current_holder
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# postgresql | file | none (vacío: según el motor de base de datos)
+LEADER_ELECTION_BACKEND = os.environ.get('LEADER_ELECTION_BACKEND', '')
+# Primer entero de la clave de los advisory locks, para no chocar con otras aplicaciones
+LEADER_LOCK_NAMESPACE = int(os.environ.get('LEADER_LOCK_NAMESPACE', '7311'))
+LEADER_LOCK_DIR = os.environ.get('LEADER_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'videoloop-leader'))
+LEADER_RETRY_INTERVAL = float(os.environ.get('LEADER_RETRY_INTERVAL', '5'))  # segundos
+LEADER_CHECK_INTERVAL = float(os.environ.get('LEADER_CHECK_INTERVAL', '5'))  # segundos
+
+
+def process_identity() -> str:
+    """Identificador de este proceso (se calcula en cada llamada por si el proceso se bifurca)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _job_key(job_name: str) -> int:
+    # Entero positivo de 31 bits: pg_locks expone la clave como oid sin signo
+    return zlib.crc32(job_name.encode('utf-8')) & 0x7fffffff
+
+
+_dedicated_engine = None
+
+
+def get_dedicated_engine():
+    """
+    Motor sin pool para conexiones de larga duración (candados, LISTEN),
+    así no ocupan conexiones del pool de la aplicación. Solo PostgreSQL.
+    """
+    global _dedicated_engine
+    if _dedicated_engine is None:
+        _dedicated_engine = create_engine(
+            engine.url,
+            poolclass=NullPool,
+            connect_args={
+                # Detectar pronto una conexión caída para liberar el candado
+                "keepalives": 1,
+                "keepalives_idle": 10,
+                "keepalives_interval": 5,
+                "keepalives_count": 3,
+            }
+        )
+    return _dedicated_engine
+
+
+class AdvisoryLockBackend:
+    """
+    Candado basado en pg_try_advisory_lock, mantenido en una conexión propia
+    """
+
+    kind = "postgresql-advisory"
+
+    def __init__(self, job_name: str):
+        self.job_name = job_name
+        self.key = _job_key(job_name)
+        self.connection = None
+
+    def try_acquire(self) -> bool:
+        connection = get_dedicated_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            application_name = f"leader:{self.job_name}@{process_identity()}"[:63]
+            connection.execute(text("SELECT set_config('application_name', :name, false)"), {"name": application_name})
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:namespace, :key)"),
+                {"namespace": LEADER_LOCK_NAMESPACE, "key": self.key}
+            ).scalar()
+        except Exception:
+            connection.close()
+            raise
+
+        if not acquired:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def is_held(self) -> bool:
+        if self.connection is None:
+            return False
+        try:
+            self.connection.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del candado '{self.job_name}' perdida: {str(e)}")
+            self._close()
+            return False
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(
+                text("SELECT pg_advisory_unlock(:namespace, :key)"),
+                {"namespace": LEADER_LOCK_NAMESPACE, "key": self.key}
+            )
+        except Exception:
+            # Al cerrar la conexión el servidor libera el candado igualmente
+            pass
+        self._close()
+
+    def _close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+
+    def holder(self) -> Optional[dict]:
+        with engine.connect() as connection:
+            row = connection.execute(text('''
+                SELECT a.application_name, a.pid, a.client_addr, a.backend_start
+                FROM pg_locks l
+                JOIN pg_stat_activity a ON a.pid = l.pid
+                WHERE l.locktype = 'advisory' AND l.granted
+                  AND l.classid = :namespace AND l.objid = :key AND l.objsubid = 2
+            '''), {"namespace": LEADER_LOCK_NAMESPACE, "key": self.key}).first()
+        if row is None:
+            return None
+        return {
+            "application_name": row.application_name,
+            "backend_pid": row.pid,
+            "client_addr": str(row.client_addr) if row.client_addr else None,
+            "since": row.backend_start.isoformat() if row.backend_start else None,
+        }
+
+
+class FileLockBackend:
+    """
+    Candado basado en flock, válido para varios workers en una misma máquina
+    """
+
+    kind = "file-lock"
+
+    def __init__(self, job_name: str):
+        self.job_name = job_name
+        self.path = os.path.join(LEADER_LOCK_DIR, f"{job_name}.lock")
+        self.fd = None
+
+    def try_acquire(self) -> bool:
+        os.makedirs(LEADER_LOCK_DIR, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # Dejar constancia de quién tiene el candado para el endpoint de estado
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps({"holder": process_identity(), "since": datetime.now().isoformat()}).encode())
+        self.fd = fd
+        return True
+
+    def is_held(self) -> bool:
+        return self.fd is not None
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+    def holder(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+
+        # Si se puede tomar el candado es que nadie lo tiene
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                return None
+            except OSError:
+                pass
+            content = os.read(fd, 4096)
+        finally:
+            os.close(fd)
+
+        try:
+            return json.loads(content)
+        except ValueError:
+            return {"holder": None}
+
+
+class LocalBackend:
+    """
+    Sin coordinación entre procesos: cada proceso se considera líder.
+    Solo para un único worker (o sistemas sin flock)
+    """
+
+    kind = "none"
+
+    def __init__(self, job_name: str):
+        self.job_name = job_name
+        self.held = False
+
+    def try_acquire(self) -> bool:
+        self.held = True
+        return True
+
+    def is_held(self) -> bool:
+        return self.held
+
+    def release(self):
+        self.held = False
+
+    def holder(self) -> Optional[dict]:
+        return {"holder": process_identity()} if self.held else None
+
+
+def create_backend(job_name: str):
+    """
+    Elegir el tipo de candado según LEADER_ELECTION_BACKEND o el motor de base de datos
+    """
+    backend = LEADER_ELECTION_BACKEND or ('postgresql' if engine.dialect.name == 'postgresql' else 'file')
+
+    if backend == 'postgresql':
+        return AdvisoryLockBackend(job_name)
+    if backend == 'file' and fcntl is not None:
+        return FileLockBackend(job_name)
+    if backend == 'file':
+        logger.warning(f"flock no disponible: la tarea '{job_name}' se ejecutará en cada proceso")
+    return LocalBackend(job_name)
+
+
+class SingletonJob:
+    """
+    Tarea en segundo plano que solo ejecuta el proceso que tiene su candado
+    """
+
+    def __init__(self, name: str, job_factory: Callable[[], Awaitable], backend=None):
+        """
+        Args:
+            name: Nombre de la tarea (también da nombre al candado)
+            job_factory: Función que devuelve la corrutina de la tarea
+            backend: Candado a utilizar (por defecto según la configuración)
+        """
+        self.name = name
+        self.job_factory = job_factory
+        self.backend = backend or create_backend(name)
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None
+        self.acquisitions = 0
+        self.last_error: Optional[str] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._job: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self):
+        """Empezar a competir por el candado (requiere un bucle de eventos en marcha)"""
+        if self._runner is None or self._runner.done():
+            self._stopping = False
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Detener la tarea y liberar el candado"""
+        self._stopping = True
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        # Las conexiones que use la tarea aparecen con su nombre en las estadísticas del pool
+        current_holder.set(f"job:{self.name}")
+        try:
+            while not self._stopping:
+                try:
+                    acquired = await asyncio.to_thread(self.backend.try_acquire)
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Error al intentar obtener el candado de '{self.name}': {str(e)}")
+                    acquired = False
+
+                if acquired:
+                    await self._lead()
+                else:
+                    # Dispersión para que los seguidores no reintenten todos a la vez
+                    await asyncio.sleep(LEADER_RETRY_INTERVAL * random.uniform(0.8, 1.2))
+        finally:
+            await self._step_down()
+
+    async def _lead(self):
+        self.is_leader = True
+        self.leader_since = datetime.now()
+        self.acquisitions += 1
+        logger.info(f"Este proceso ({process_identity()}) es líder de la tarea '{self.name}'")
+
+        self._job = asyncio.create_task(self.job_factory())
+        while not self._job.done():
+            done, _ = await asyncio.wait({self._job}, timeout=LEADER_CHECK_INTERVAL)
+            if done:
+                break
+            if not await asyncio.to_thread(self.backend.is_held):
+                logger.warning(f"Perdido el candado de '{self.name}', se detiene la tarea")
+                break
+
+        if self._job.done() and not self._job.cancelled() and self._job.exception():
+            self.last_error = str(self._job.exception())
+            logger.error(f"La tarea '{self.name}' terminó con error: {self.last_error}")
+
+        await self._step_down()
+        if not self._stopping:
+            await asyncio.sleep(LEADER_RETRY_INTERVAL)
+
+    async def _step_down(self):
+        if self._job is not None and not self._job.done():
+            self._job.cancel()
+            try:
+                await self._job
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._job = None
+
+        if self.is_leader:
+            logger.info(f"Este proceso deja de ser líder de la tarea '{self.name}'")
+        self.is_leader = False
+        self.leader_since = None
+        try:
+            await asyncio.to_thread(self.backend.release)
+        except Exception as e:
+            logger.error(f"Error al liberar el candado de '{self.name}': {str(e)}")
+
+    def status(self) -> dict:
+        try:
+            holder = self.backend.holder()
+        except Exception as e:
+            holder = {"error": str(e)}
+        return {
+            "name": self.name,
+            "backend": self.backend.kind,
+            "is_leader": self.is_leader,
+            "leader_since": self.leader_since.isoformat() if self.leader_since else None,
+            "acquisitions": self.acquisitions,
+            "holder": holder,
+            "last_error": self.last_error,
+        }
+
+
+class LeaderElection:
+    """
+    Registro de las tareas únicas de este proceso
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, SingletonJob] = {}
+
+    def register(self, name: str, job_factory: Callable[[], Awaitable]) -> SingletonJob:
+        if name in self.jobs:
+            raise ValueError(f"La tarea '{name}' ya está registrada")
+        job = SingletonJob(name, job_factory)
+        self.jobs[name] = job
+        return job
+
+    def status(self) -> dict:
+        return {
+            "process": process_identity(),
+            "jobs": [job.status() for job in self.jobs.values()],
+        }
+
+
+# Instancia global
+leader_election = LeaderElection()
+
+
+def run_singleton_job(app, name: str, job_factory: Callable[[], Awaitable]) -> SingletonJob:
+    """
+    Registra una tarea en segundo plano que solo debe ejecutar un proceso a la vez
+
+    Args:
+        app: Instancia de FastAPI
+        name: Nombre de la tarea
+        job_factory: Función que devuelve la corrutina de la tarea
+
+    Returns:
+        La tarea registrada
+    """
+    job = leader_election.register(name, job_factory)
+
+    @app.on_event("startup")
+    async def start_singleton_job():
+        job.start()
+
+    @app.on_event("shutdown")
+    async def stop_singleton_job():
+        await job.stop()
+
+    return job
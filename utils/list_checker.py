@@ -1,37 +1,73 @@
 """
 utils/list_checker.py
 Verificador de listas de reproducción que se ejecuta en background
-para activar/desactivar listas según sus fechas de inicio y fin
+para activar/desactivar listas según sus fechas de inicio y fin.
+
+En lugar de consultar la base de datos a intervalos fijos, el verificador
+mantiene un montículo (heap) con las próximas fechas de inicio y expiración
+y duerme justo hasta la siguiente. Al crear o editar una lista se le avisa
+con notify_playlist_changed() para que replanifique.
+
+Con varios workers solo el proceso líder ejecuta el verificador; en
+PostgreSQL los demás le avisan de los cambios mediante NOTIFY.
 """
 
 import asyncio
+import heapq
+import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, case, func, or_, text, update
 
-from models.database import SessionLocal
+from models.database import SessionLocal, engine
 from models.models import Playlist
+from utils.leader_election import get_dedicated_engine, run_singleton_job
+from utils.metrics import (
+    playlist_checker_errors_total, playlist_checker_run_duration_seconds, playlist_checker_transitions_total
+)
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Canal de PostgreSQL por el que los demás procesos avisan al líder de los cambios
+PLAYLIST_CHANGES_CHANNEL = 'playlist_changes'
+
 class PlaylistChecker:
     """
     Clase para verificar y actualizar el estado de las listas de reproducción
     según sus fechas de inicio y fin
     """
     
-    def __init__(self, check_interval: int = 300):  # 5 minutos por defecto
+    # Margen tras cada transición para que la comparación con la fecha ya se cumpla
+    TRANSITION_MARGIN = 0.05  # segundos
+    # Espera tras un fallo (p. ej. base de datos caída): se duplica en cada fallo seguido
+    ERROR_BACKOFF_INITIAL = 1.0  # segundos
+    ERROR_BACKOFF_MAX = 300.0  # segundos
+    
+    def __init__(self, check_interval: int = 3600):  # 1 hora por defecto
         """
         Inicializar el verificador de listas
         
         Args:
-            check_interval: Intervalo en segundos entre verificaciones
+            check_interval: Tiempo máximo en segundos entre verificaciones; sirve de
+                resincronización por si algún cambio no se notificó
         """
         self.check_interval = check_interval
         self.running = False
+        self.last_check: Optional[datetime] = None
+        self.schedule_loaded_at: Optional[datetime] = None
+        self.last_check_failed = False
+        self.consecutive_failures = 0
+        # Montículo de transiciones pendientes: (fecha, id de la lista, 'start' | 'expiration')
+        self._schedule: List[Tuple[datetime, int, str]] = []
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listeners: List[Callable[[List[int], List[int]], None]] = []
         
     async def start(self):
         """Iniciar el verificador en background"""
@@ -40,92 +76,327 @@ class PlaylistChecker:
             return
             
         self.running = True
-        logger.info(f"Iniciando verificador de listas cada {self.check_interval} segundos")
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info(f"Iniciando verificador de listas (resincronización cada {self.check_interval} segundos)")
         
+        listener = None
         try:
+            listener = await asyncio.to_thread(self._open_change_listener)
+            if listener is not None:
+                self._loop.add_reader(
+                    listener.dbapi_connection.fileno(), self._on_change_notification, listener.dbapi_connection
+                )
             while self.running:
+                # Limpiar antes de verificar para no perder avisos que lleguen durante la verificación
+                self._wakeup.clear()
+                
+                failed = False
+                if self._schedule_expired():
+                    try:
+                        await asyncio.to_thread(self.load_schedule)
+                    except Exception as e:
+                        logger.error(f"Error al cargar la planificación de listas: {str(e)}")
+                        failed = True
                 await self.check_and_update_playlists()
-                await asyncio.sleep(self.check_interval)
+                failed = failed or self.last_check_failed
+                
+                timeout = self.seconds_until_next_check()
+                if failed:
+                    # Sin esto, con la base de datos caída el bucle no espera nada entre intentos
+                    self.consecutive_failures += 1
+                    timeout = max(timeout, self.error_backoff())
+                else:
+                    self.consecutive_failures = 0
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
         except Exception as e:
             logger.error(f"Error en el verificador de listas: {str(e)}")
         finally:
             self.running = False
+            self._close_change_listener(listener)
+            # La próxima vez que este proceso sea líder se recarga la planificación
+            self.schedule_loaded_at = None
             
     def stop(self):
         """Detener el verificador"""
         logger.info("Deteniendo verificador de listas")
         self.running = False
+        self._wake()
+    
+    def _wake(self):
+        """Despertar el bucle del verificador (se puede llamar desde cualquier hilo)"""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # El bucle ya está cerrado
+            pass
+    
+    def _open_change_listener(self):
+        """
+        Escuchar (LISTEN) los avisos de cambios enviados desde otros procesos
         
-    async def check_and_update_playlists(self):
+        Returns:
+            Conexión DBAPI a la escucha, o None si el motor no es PostgreSQL
+        """
+        if engine.dialect.name != 'postgresql':
+            return None
+        try:
+            connection = get_dedicated_engine().raw_connection()
+            dbapi_connection = connection.dbapi_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {PLAYLIST_CHANGES_CHANNEL}")
+            return connection
+        except Exception as e:
+            logger.error(f"No se pudo escuchar el canal {PLAYLIST_CHANGES_CHANNEL}: {str(e)}")
+            return None
+    
+    def _on_change_notification(self, dbapi_connection):
+        try:
+            dbapi_connection.poll()
+        except Exception as e:
+            logger.error(f"Error al leer avisos de cambios de listas: {str(e)}")
+            self._loop.remove_reader(dbapi_connection.fileno())
+            return
+        
+        while dbapi_connection.notifies:
+            notification = dbapi_connection.notifies.pop(0)
+            try:
+                change = json.loads(notification.payload or '{}')
+            except ValueError:
+                change = {}
+            self.notify_playlist_changed(
+                change.get('id'),
+                datetime.fromisoformat(change['start_date']) if change.get('start_date') else None,
+                datetime.fromisoformat(change['expiration_date']) if change.get('expiration_date') else None
+            )
+    
+    def _close_change_listener(self, connection):
+        if connection is None:
+            return
+        try:
+            self._loop.remove_reader(connection.dbapi_connection.fileno())
+        except Exception:
+            pass
+        try:
+            connection.close()
+        except Exception:
+            pass
+    
+    def _schedule_expired(self) -> bool:
+        if self.schedule_loaded_at is None:
+            return True
+        return (datetime.now() - self.schedule_loaded_at).total_seconds() >= self.check_interval
+    
+    def load_schedule(self):
+        """
+        Reconstruir el montículo con las fechas de inicio y expiración futuras
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.now()
+            rows = db.query(Playlist.id, Playlist.start_date, Playlist.expiration_date).filter(
+                or_(Playlist.start_date > now, Playlist.expiration_date > now)
+            ).all()
+        finally:
+            db.close()
+        
+        schedule = []
+        for playlist_id, start_date, expiration_date in rows:
+            if start_date and start_date > now:
+                schedule.append((start_date, playlist_id, 'start'))
+            if expiration_date and expiration_date > now:
+                schedule.append((expiration_date, playlist_id, 'expiration'))
+        heapq.heapify(schedule)
+        
+        with self._lock:
+            self._schedule = schedule
+            self.schedule_loaded_at = now
+        logger.debug(f"Programadas {len(schedule)} transiciones de listas")
+    
+    def notify_playlist_changed(
+        self,
+        playlist_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        expiration_date: Optional[datetime] = None
+    ):
+        """
+        Avisar de que una lista se ha creado o modificado
+        
+        Las fechas futuras se añaden al montículo y el verificador se despierta
+        para aplicar de inmediato un cambio de estado que ya corresponda.
+        Las entradas antiguas de la misma lista se quedan en el montículo; como
+        mucho provocan una verificación extra.
+        
+        Args:
+            playlist_id: ID de la lista
+            start_date: Nueva fecha de inicio
+            expiration_date: Nueva fecha de expiración
+        """
+        if not self.running:
+            return
+        now = datetime.now()
+        with self._lock:
+            if start_date and start_date > now:
+                heapq.heappush(self._schedule, (start_date, playlist_id or 0, 'start'))
+            if expiration_date and expiration_date > now:
+                heapq.heappush(self._schedule, (expiration_date, playlist_id or 0, 'expiration'))
+        self._wake()
+    
+    @property
+    def next_transition(self) -> Optional[Tuple[datetime, int, str]]:
+        """Próxima transición programada, si la hay"""
+        with self._lock:
+            return self._schedule[0] if self._schedule else None
+    
+    def error_backoff(self) -> float:
+        """Segundos de espera tras consecutive_failures fallos seguidos"""
+        backoff = self.ERROR_BACKOFF_INITIAL * 2 ** min(max(self.consecutive_failures - 1, 0), 20)
+        return min(backoff, self.ERROR_BACKOFF_MAX, self.check_interval)
+    
+    def seconds_until_next_check(self) -> float:
+        """
+        Segundos hasta la próxima transición programada, limitados por la
+        resincronización periódica
+        
+        Descarta del montículo las transiciones ya cubiertas por la última verificación.
+        """
+        now = datetime.now()
+        until_resync = self.check_interval
+        if self.schedule_loaded_at:
+            until_resync -= (now - self.schedule_loaded_at).total_seconds()
+        
+        with self._lock:
+            while self._schedule and self.last_check and self._schedule[0][0] <= self.last_check:
+                heapq.heappop(self._schedule)
+            if not self._schedule:
+                return max(until_resync, 0)
+            until_next = (self._schedule[0][0] - now).total_seconds() + self.TRANSITION_MARGIN
+        
+        return max(min(until_next, until_resync), 0)
+        
+    async def check_and_update_playlists(self) -> Tuple[List[int], List[int]]:
         """
         Verificar todas las listas y actualizar su estado según las fechas
+        
+        Returns:
+            Tupla (ids activados, ids desactivados)
         """
+        return await asyncio.to_thread(self._check_and_update_playlists)
+    
+    def _check_and_update_playlists(self) -> Tuple[List[int], List[int]]:
         db = SessionLocal()
+        started = time.perf_counter()
         try:
             now = datetime.now()
             logger.debug(f"Verificando listas de reproducción - {now}")
             
-            # Obtener todas las listas que podrían necesitar actualización
-            playlists = db.query(Playlist).filter(
-                or_(
-                    # Listas que tienen fecha de inicio y podrían necesitar activarse
-                    and_(
-                        Playlist.start_date.isnot(None),
-                        Playlist.start_date <= now,
-                        Playlist.is_active == False
-                    ),
-                    # Listas que tienen fecha de fin y podrían necesitar desactivarse
-                    and_(
-                        Playlist.expiration_date.isnot(None),
-                        Playlist.expiration_date <= now,
-                        Playlist.is_active == True
-                    ),
-                    # Listas que deberían estar activas pero no lo están
-                    and_(
-                        Playlist.is_active == False,
-                        or_(
-                            Playlist.start_date.is_(None),
-                            Playlist.start_date <= now
-                        ),
-                        or_(
-                            Playlist.expiration_date.is_(None),
-                            Playlist.expiration_date > now
-                        )
-                    )
-                )
-            ).all()
-            
-            updated_count = 0
-            activated_count = 0
-            deactivated_count = 0
+            # Mismo criterio que _should_be_active, aplicado en bloque en la base de datos
+            activated = self._bulk_transition(
+                db,
+                and_(
+                    Playlist.is_active == False,
+                    or_(Playlist.start_date.is_(None), Playlist.start_date <= now),
+                    or_(Playlist.expiration_date.is_(None), Playlist.expiration_date >= now)
+                ),
+                True
+            )
+            deactivated = self._bulk_transition(
+                db,
+                and_(
+                    Playlist.is_active == True,
+                    Playlist.expiration_date.isnot(None),
+                    Playlist.expiration_date < now
+                ),
+                False
+            )
             
-            for playlist in playlists:
-                old_status = playlist.is_active
-                new_status = self._should_be_active(playlist, now)
-                
-                if old_status != new_status:
-                    playlist.is_active = new_status
-                    updated_count += 1
-                    
-                    if new_status:
-                        activated_count += 1
-                        logger.info(f"Lista activada: '{playlist.title}' (ID: {playlist.id})")
-                    else:
-                        deactivated_count += 1
-                        logger.info(f"Lista desactivada: '{playlist.title}' (ID: {playlist.id})")
-            
-            if updated_count > 0:
+            if activated or deactivated:
                 db.commit()
-                logger.info(f"Actualización completada: {activated_count} activadas, {deactivated_count} desactivadas")
+                for playlist_id, title in activated:
+                    logger.info(f"Lista activada: '{title}' (ID: {playlist_id})")
+                for playlist_id, title in deactivated:
+                    logger.info(f"Lista desactivada: '{title}' (ID: {playlist_id})")
+                logger.info(f"Actualización completada: {len(activated)} activadas, {len(deactivated)} desactivadas")
             else:
                 logger.debug("No se requirieron actualizaciones")
+            
+            self.last_check = now
+            self.last_check_failed = False
+            
+            activated_ids = [playlist_id for playlist_id, _ in activated]
+            deactivated_ids = [playlist_id for playlist_id, _ in deactivated]
+            if activated_ids:
+                playlist_checker_transitions_total.inc(len(activated_ids), transition="activated")
+            if deactivated_ids:
+                playlist_checker_transitions_total.inc(len(deactivated_ids), transition="deactivated")
+            if activated_ids or deactivated_ids:
+                self._notify_listeners(activated_ids, deactivated_ids)
+            return activated_ids, deactivated_ids
                 
         except Exception as e:
             logger.error(f"Error al verificar listas: {str(e)}")
+            self.last_check_failed = True
+            playlist_checker_errors_total.inc()
             db.rollback()
+            return [], []
         finally:
+            playlist_checker_run_duration_seconds.observe(time.perf_counter() - started)
             db.close()
     
+    def _bulk_transition(self, db: Session, condition, new_status: bool) -> List[Tuple[int, str]]:
+        """
+        Cambiar el estado de todas las listas que cumplen la condición con un único UPDATE
+        
+        Args:
+            db: Sesión de base de datos
+            condition: Condición SQL de las listas a actualizar
+            new_status: Nuevo valor de is_active
+            
+        Returns:
+            Lista de tuplas (id, título) de las listas actualizadas
+        """
+        statement = update(Playlist).where(condition).values(is_active=new_status)
+        
+        if db.get_bind().dialect.update_returning:
+            return [tuple(row) for row in db.execute(
+                statement.returning(Playlist.id, Playlist.title),
+                execution_options={"synchronize_session": False}
+            ).all()]
+        
+        # Motores sin UPDATE ... RETURNING: obtener primero los ids afectados
+        rows = [tuple(row) for row in db.query(Playlist.id, Playlist.title).filter(condition).all()]
+        if rows:
+            db.execute(
+                update(Playlist).where(Playlist.id.in_([row[0] for row in rows])).values(is_active=new_status),
+                execution_options={"synchronize_session": False}
+            )
+        return rows
+    
+    def add_transition_listener(self, listener: Callable[[List[int], List[int]], None]):
+        """
+        Registrar una función a la que avisar tras cada cambio de estado
+        
+        La función recibe las listas de ids activados y desactivados y se llama
+        desde el hilo de trabajo del verificador.
+        
+        Args:
+            listener: Función (activated_ids, deactivated_ids)
+        """
+        self._listeners.append(listener)
+    
+    def _notify_listeners(self, activated_ids: List[int], deactivated_ids: List[int]):
+        for listener in self._listeners:
+            try:
+                listener(activated_ids, deactivated_ids)
+            except Exception as e:
+                logger.error(f"Error en el aviso de cambio de estado de listas: {str(e)}")
+    
     def _should_be_active(self, playlist: Playlist, now: datetime) -> bool:
         """
         Determinar si una lista debería estar activa según las fechas
@@ -163,6 +434,19 @@ class PlaylistChecker:
         if not playlist:
             return {"error": "Lista no encontrada"}
         
+        return self.describe_playlist_status(playlist)
+    
+    def describe_playlist_status(self, playlist: Playlist) -> dict:
+        """
+        Estado de una lista ya cargada (sin acceso a la base de datos;
+        sirve tanto para sesiones síncronas como asíncronas)
+        
+        Args:
+            playlist: La lista de reproducción
+            
+        Returns:
+            Diccionario con información del estado de la lista
+        """
         now = datetime.now()
         should_be_active = self._should_be_active(playlist, now)
         
@@ -191,45 +475,199 @@ class PlaylistChecker:
         
         return status_info
 
+# Estados posibles de una lista en el informe de estado
+PLAYLIST_STATUSES = ('active', 'scheduled', 'expired', 'disabled')
+
+def playlist_status_columns(now: datetime):
+    """
+    Expresiones SQL con la clasificación de cada lista, con el mismo criterio
+    que PlaylistChecker._should_be_active
+    
+    Args:
+        now: Fecha y hora de referencia
+        
+    Returns:
+        Tupla (status, should_be_active, needs_update) de expresiones SQL
+    """
+    is_active = func.coalesce(Playlist.is_active, False)
+    should_be_active = and_(
+        or_(Playlist.start_date.is_(None), Playlist.start_date <= now),
+        or_(Playlist.expiration_date.is_(None), Playlist.expiration_date >= now)
+    )
+    status = case(
+        (Playlist.start_date > now, 'scheduled'),
+        (Playlist.expiration_date < now, 'expired'),
+        (is_active == True, 'active'),
+        else_='disabled'
+    )
+    needs_update = case(
+        (should_be_active, is_active == False),
+        else_=is_active == True
+    )
+    return status, case((should_be_active, True), else_=False), needs_update
+
+def playlist_status_report(
+    db: Session,
+    status: Optional[str] = None,
+    needs_update: Optional[bool] = None,
+    page: int = 1,
+    page_size: int = 100
+) -> dict:
+    """
+    Informe de estado de las listas calculado en la base de datos
+    
+    La clasificación se hace con expresiones CASE en una sola consulta por
+    página, y el resumen con un único GROUP BY.
+    
+    Args:
+        db: Sesión de base de datos
+        status: Filtrar por estado (active, scheduled, expired, disabled)
+        needs_update: Filtrar por listas cuyo estado no coincide con sus fechas
+        page: Número de página (desde 1)
+        page_size: Tamaño de página
+        
+    Returns:
+        Diccionario con las listas de la página, la paginación y el resumen
+    """
+    now = datetime.now()
+    status_column, should_be_active_column, needs_update_column = playlist_status_columns(now)
+    
+    # Resumen de todas las listas (sin filtros)
+    summary = {
+        "total": 0,
+        "should_be_active": 0,
+        "should_be_inactive": 0,
+        "needs_update": 0,
+        "by_status": {name: 0 for name in PLAYLIST_STATUSES}
+    }
+    filtered_total = 0
+    summary_rows = db.query(
+        status_column, should_be_active_column, needs_update_column, func.count()
+    ).group_by(status_column, should_be_active_column, needs_update_column).all()
+    for row_status, row_should_be_active, row_needs_update, count in summary_rows:
+        summary["total"] += count
+        summary["by_status"][row_status] += count
+        if row_should_be_active:
+            summary["should_be_active"] += count
+        else:
+            summary["should_be_inactive"] += count
+        if row_needs_update:
+            summary["needs_update"] += count
+        if (status is None or row_status == status) and (needs_update is None or bool(row_needs_update) == needs_update):
+            filtered_total += count
+    
+    query = db.query(
+        Playlist.id, Playlist.title, Playlist.is_active, Playlist.start_date, Playlist.expiration_date,
+        status_column.label("status"),
+        should_be_active_column.label("should_be_active"),
+        needs_update_column.label("needs_update")
+    )
+    if status is not None:
+        query = query.filter(status_column == status)
+    if needs_update is not None:
+        query = query.filter(needs_update_column == needs_update)
+    rows = query.order_by(Playlist.id).offset((page - 1) * page_size).limit(page_size).all()
+    
+    playlists = []
+    for row in rows:
+        if row.status == 'scheduled':
+            reason = f"Programada para iniciar en {row.start_date - now}"
+        elif row.status == 'expired':
+            reason = f"Expiró hace {now - row.expiration_date}"
+        elif row.should_be_active:
+            reason = "Debería estar activa"
+        else:
+            reason = "No cumple criterios de activación"
+        playlists.append({
+            "id": row.id,
+            "title": row.title,
+            "status": row.status,
+            "current_status": bool(row.is_active),
+            "should_be_active": bool(row.should_be_active),
+            "needs_update": bool(row.needs_update),
+            "start_date": row.start_date.isoformat() if row.start_date else None,
+            "expiration_date": row.expiration_date.isoformat() if row.expiration_date else None,
+            "status_reason": reason,
+            "checked_at": now.isoformat()
+        })
+    
+    total_pages = (filtered_total + page_size - 1) // page_size
+    return {
+        "playlists": playlists,
+        "page": page,
+        "page_size": page_size,
+        "total_items": filtered_total,
+        "total_pages": total_pages,
+        "has_next": page < total_pages,
+        "has_prev": page > 1,
+        "summary": summary
+    }
+
 # Instancia global del verificador
 playlist_checker = PlaylistChecker()
 
-def start_playlist_checker(app=None, check_interval: int = 300):
+def start_playlist_checker(app=None, check_interval: int = 3600):
     """
-    Iniciar el verificador de listas de reproducción
+    Iniciar el verificador de listas de reproducción.
+    Con una app FastAPI solo lo ejecuta el proceso que tenga el liderazgo.
     
     Args:
         app: Instancia de la aplicación FastAPI (opcional)
-        check_interval: Intervalo en segundos entre verificaciones
+        check_interval: Tiempo máximo en segundos entre verificaciones
     """
-    global playlist_checker
-    
     if playlist_checker.running:
         logger.warning("El verificador de listas ya está en ejecución")
         return
     
-    playlist_checker = PlaylistChecker(check_interval)
+    # Se reutiliza la instancia global: otros módulos la importan directamente
+    playlist_checker.check_interval = check_interval
     
     # Si se proporciona una app FastAPI, agregar el evento de inicio
     if app:
-        @app.on_event("startup")
-        async def startup_event():
-            asyncio.create_task(playlist_checker.start())
-        
-        @app.on_event("shutdown")
-        async def shutdown_event():
-            playlist_checker.stop()
+        run_singleton_job(app, "playlist_checker", playlist_checker.start)
     else:
         # Iniciar directamente
         asyncio.create_task(playlist_checker.start())
     
     logger.info("Verificador de listas configurado correctamente")
 
+def notify_playlist_changed(playlist: Optional[Playlist] = None):
+    """
+    Avisar al verificador de que una lista se ha creado o modificado
+    
+    Args:
+        playlist: Lista afectada (si no se indica solo se fuerza una verificación)
+    """
+    playlist_id = playlist.id if playlist else None
+    start_date = playlist.start_date if playlist else None
+    expiration_date = playlist.expiration_date if playlist else None
+    
+    if playlist_checker.running:
+        playlist_checker.notify_playlist_changed(playlist_id, start_date, expiration_date)
+    else:
+        _publish_playlist_change(playlist_id, start_date, expiration_date)
+
+def _publish_playlist_change(playlist_id, start_date, expiration_date):
+    """
+    Avisar al proceso líder (que puede ser otro worker u otro nodo) mediante NOTIFY
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+    payload = json.dumps({
+        "id": playlist_id,
+        "start_date": start_date.isoformat() if start_date else None,
+        "expiration_date": expiration_date.isoformat() if expiration_date else None
+    })
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": PLAYLIST_CHANGES_CHANNEL, "payload": payload})
+            connection.commit()
+    except Exception as e:
+        logger.warning(f"No se pudo avisar del cambio de la lista {playlist_id}: {str(e)}")
+
 def stop_playlist_checker():
     """Detener el verificador de listas"""
-    global playlist_checker
-    if playlist_checker:
-        playlist_checker.stop()
+    playlist_checker.stop()
 
 def get_playlist_status(playlist_id: int) -> dict:
     """
@@ -250,10 +688,6 @@ def get_playlist_status(playlist_id: int) -> dict:
 # Función para verificación manual
 async def manual_check():
     """Ejecutar una verificación manual de todas las listas"""
-    global playlist_checker
-    if not playlist_checker:
-        playlist_checker = PlaylistChecker()
-    
     await playlist_checker.check_and_update_playlists()
 
 if __name__ == "__main__":
@@ -0,0 +1,455 @@
+"""
+utils/log_archive.py
+Archivo append-only de logs de dispositivos en bloques comprimidos.
+
+Cada ingesta guarda solo las líneas nuevas (deduplicadas contra el final
+de lo ya archivado o por número de secuencia del agente) en la tabla
+device_log_chunks. La retención y la compactación se configuran por
+variables de entorno y se ejecutan en un mantenimiento periódico.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal
+from models.models import Device, DeviceLogChunk
+from utils.leader_election import run_singleton_job
+
+logger = logging.getLogger(__name__)
+
+# Configuración desde variables de entorno
+LOG_ARCHIVE_RETENTION_DAYS = int(os.environ.get('LOG_ARCHIVE_RETENTION_DAYS', '30'))
+LOG_ARCHIVE_COMPACT_AFTER_MINUTES = int(os.environ.get('LOG_ARCHIVE_COMPACT_AFTER_MINUTES', '60'))
+LOG_ARCHIVE_CHUNK_MAX_LINES = int(os.environ.get('LOG_ARCHIVE_CHUNK_MAX_LINES', '5000'))
+LOG_ARCHIVE_COMPRESSION_LEVEL = int(os.environ.get('LOG_ARCHIVE_COMPRESSION_LEVEL', '6'))
+LOG_ARCHIVE_MAINTENANCE_INTERVAL = int(os.environ.get('LOG_ARCHIVE_MAINTENANCE_INTERVAL', '3600'))  # segundos
+
+# Candados por dispositivo (repartidos por hash) para las ingestas de este proceso
+_DEVICE_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _hash_line(line: str) -> str:
+    return hashlib.sha256(line.encode('utf-8', errors='replace')).hexdigest()
+
+
+def split_lines(text: Optional[str]) -> List[str]:
+    """
+    Divide un bloque de texto en líneas descartando las vacías
+    """
+    if not text:
+        return []
+    return [line.rstrip() for line in text.replace('\r\n', '\n').split('\n') if line.strip()]
+
+
+def compress_lines(lines: List[str]) -> bytes:
+    return zlib.compress('\n'.join(lines).encode('utf-8', errors='replace'), LOG_ARCHIVE_COMPRESSION_LEVEL)
+
+
+def decompress_chunk(chunk: DeviceLogChunk) -> List[str]:
+    """
+    Devuelve las líneas almacenadas en un bloque
+    """
+    if not chunk.data:
+        return []
+    return zlib.decompress(chunk.data).decode('utf-8', errors='replace').split('\n')
+
+
+def _latest_chunk(db: Session, device_id: str) -> Optional[DeviceLogChunk]:
+    return db.query(DeviceLogChunk).filter(
+        DeviceLogChunk.device_id == device_id
+    ).order_by(DeviceLogChunk.last_ts.desc(), DeviceLogChunk.id.desc()).first()
+
+
+def _overlap_length(archived_tail: List[str], new_lines: List[str], candidates: List[int]) -> int:
+    """
+    Longitud del mayor prefijo de new_lines que coincide con el final de lo archivado.
+    Solo se comprueban las posiciones candidatas (donde aparece la última línea archivada).
+    """
+    for index in sorted(candidates, reverse=True):
+        k = index + 1
+        if k <= len(archived_tail) and new_lines[:k] == archived_tail[-k:]:
+            return k
+    return 0
+
+
+def _new_chunk(device_id: str, lines: List[str], first_ts: datetime, last_ts: datetime,
+               last_seq: Optional[int] = None, created_at: Optional[datetime] = None) -> DeviceLogChunk:
+    data = compress_lines(lines)
+    return DeviceLogChunk(
+        device_id=device_id,
+        first_ts=first_ts,
+        last_ts=last_ts,
+        line_count=len(lines),
+        raw_size=sum(len(line) + 1 for line in lines),
+        tail_hash=_hash_line(lines[-1]),
+        last_seq=last_seq,
+        data=data,
+        created_at=created_at or datetime.now()
+    )
+
+
+def append_text(db: Session, device_id: str, text: Optional[str],
+                received_at: Optional[datetime] = None) -> Optional[DeviceLogChunk]:
+    """
+    Archiva las líneas nuevas de un volcado de logs obtenido del dispositivo.
+
+    El volcado suele solaparse con el anterior (últimas N líneas del journal),
+    así que se descarta el prefijo que ya coincide con el final del archivo.
+
+    Args:
+        db: Sesión de base de datos
+        device_id: ID del dispositivo
+        text: Texto de logs tal como lo devuelve el agente
+        received_at: Momento de la ingesta (por defecto ahora)
+
+    Returns:
+        El bloque creado o None si no había líneas nuevas
+    """
+    lines = split_lines(text)
+    if not lines:
+        return None
+
+    received_at = received_at or datetime.now()
+    latest = _latest_chunk(db, device_id)
+
+    if latest is not None and latest.tail_hash:
+        # Solo hace falta leer el archivo si la última línea archivada aparece en el volcado
+        candidates = [i for i, line in enumerate(lines) if _hash_line(line) == latest.tail_hash]
+        if candidates:
+            archived_tail = read_lines(db, device_id, limit=len(lines))
+            lines = lines[_overlap_length(archived_tail, lines, candidates):]
+            if not lines:
+                return None
+
+    chunk = _new_chunk(device_id, lines, received_at, received_at)
+    db.add(chunk)
+    db.commit()
+
+    logger.debug(f"Archivadas {len(lines)} líneas nuevas de logs para {device_id}")
+    return chunk
+
+
+def append_entries(db: Session, device_id: str,
+                   entries: Iterable[Tuple[int, datetime, str]]) -> Tuple[int, Optional[int]]:
+    """
+    Archiva entradas con número de secuencia enviadas por el agente.
+    Las entradas con secuencia menor o igual a la ya archivada se descartan.
+
+    Args:
+        db: Sesión de base de datos
+        device_id: ID del dispositivo
+        entries: Tuplas (seq, timestamp, mensaje)
+
+    Returns:
+        (número de entradas archivadas, secuencia más alta archivada)
+    """
+    # Leer el high-water mark e insertar debe ser atómico por dispositivo, o un lote
+    # reintentado a la vez que el original se archivaría dos veces: candado local
+    # para los hilos de este proceso y bloqueo de la fila del dispositivo
+    # (SELECT ... FOR UPDATE) para los demás procesos y nodos
+    with _DEVICE_LOCKS[zlib.crc32(device_id.encode('utf-8')) % len(_DEVICE_LOCKS)]:
+        try:
+            db.query(Device.id).filter(Device.device_id == device_id).with_for_update().first()
+            return _append_entries_locked(db, device_id, entries)
+        except Exception:
+            db.rollback()
+            raise
+
+
+def _append_entries_locked(db: Session, device_id: str,
+                           entries: Iterable[Tuple[int, datetime, str]]) -> Tuple[int, Optional[int]]:
+    high_water_mark = get_high_water_mark(db, device_id)
+
+    fresh = sorted(
+        (entry for entry in entries if high_water_mark is None or entry[0] > high_water_mark),
+        key=lambda entry: entry[0]
+    )
+
+    # Eliminar secuencias repetidas dentro del propio lote
+    unique = []
+    last_seen_seq = None
+    for seq, ts, message in fresh:
+        if seq == last_seen_seq:
+            continue
+        unique.append((seq, ts, message))
+        last_seen_seq = seq
+
+    if not unique:
+        # Liberar el bloqueo de la fila del dispositivo
+        db.commit()
+        return 0, high_water_mark
+
+    for start in range(0, len(unique), LOG_ARCHIVE_CHUNK_MAX_LINES):
+        batch = unique[start:start + LOG_ARCHIVE_CHUNK_MAX_LINES]
+        lines = [message.rstrip() for _, _, message in batch]
+        timestamps = [ts for _, ts, _ in batch]
+        db.add(_new_chunk(device_id, lines, min(timestamps), max(timestamps), last_seq=batch[-1][0]))
+
+    db.commit()
+    return len(unique), unique[-1][0]
+
+
+def get_high_water_mark(db: Session, device_id: str) -> Optional[int]:
+    """
+    Secuencia más alta archivada para un dispositivo (None si nunca envió secuencias)
+    """
+    return db.query(func.max(DeviceLogChunk.last_seq)).filter(
+        DeviceLogChunk.device_id == device_id
+    ).scalar()
+
+
+def last_push_at(db: Session, device_id: str) -> Optional[datetime]:
+    """
+    Momento en que se archivó el último lote enviado por el agente (con secuencia)
+    """
+    return db.query(func.max(DeviceLogChunk.created_at)).filter(
+        DeviceLogChunk.device_id == device_id,
+        DeviceLogChunk.last_seq.isnot(None)
+    ).scalar()
+
+
+def read_lines(db: Session, device_id: str, since: Optional[datetime] = None,
+               until: Optional[datetime] = None, limit: Optional[int] = None) -> List[str]:
+    """
+    Lee líneas archivadas de un dispositivo en orden cronológico.
+
+    Args:
+        db: Sesión de base de datos
+        device_id: ID del dispositivo
+        since: Solo bloques que terminan a partir de esta fecha
+        until: Solo bloques que empiezan antes de esta fecha
+        limit: Si se indica, devuelve solo las últimas `limit` líneas
+
+    Returns:
+        Lista de líneas
+    """
+    query = db.query(DeviceLogChunk).filter(DeviceLogChunk.device_id == device_id)
+    if since:
+        query = query.filter(DeviceLogChunk.last_ts >= since)
+    if until:
+        query = query.filter(DeviceLogChunk.first_ts <= until)
+
+    if limit:
+        # Recorrer desde el final y parar en cuanto haya líneas suficientes
+        lines: List[str] = []
+        for chunk in query.order_by(DeviceLogChunk.last_ts.desc(), DeviceLogChunk.id.desc()).yield_per(50):
+            lines = decompress_chunk(chunk) + lines
+            if len(lines) >= limit:
+                break
+        return lines[-limit:]
+
+    lines = []
+    for chunk in query.order_by(DeviceLogChunk.last_ts, DeviceLogChunk.id).yield_per(50):
+        lines.extend(decompress_chunk(chunk))
+    return lines
+
+
+def purge_expired(db: Session, retention_days: Optional[int] = None) -> int:
+    """
+    Elimina los bloques más antiguos que el período de retención
+
+    Returns:
+        Número de bloques eliminados
+    """
+    retention_days = LOG_ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    deleted = db.query(DeviceLogChunk).filter(
+        DeviceLogChunk.last_ts < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    if deleted:
+        logger.info(f"Retención de logs: {deleted} bloques eliminados (anteriores a {cutoff})")
+    return deleted
+
+
+def compact_device(db: Session, device_id: str, older_than: Optional[datetime] = None) -> int:
+    """
+    Une bloques pequeños consecutivos de un dispositivo hasta LOG_ARCHIVE_CHUNK_MAX_LINES líneas.
+
+    Solo se unen bloques contiguos en el orden de lectura (last_ts, id): un
+    bloque lleno corta el grupo, para que el bloque resultante no se solape
+    con él y read_lines() siga devolviendo las líneas en orden.
+
+    Returns:
+        Número de bloques eliminados por la compactación
+    """
+    if older_than is None:
+        older_than = datetime.now() - timedelta(minutes=LOG_ARCHIVE_COMPACT_AFTER_MINUTES)
+
+    # Recorrer todos los bloques (sin sus datos); los más recientes que older_than
+    # quedan al final del orden, así que filtrarlos no rompe la contigüidad
+    rows = db.query(DeviceLogChunk.id, DeviceLogChunk.line_count).filter(
+        DeviceLogChunk.device_id == device_id,
+        DeviceLogChunk.last_ts < older_than
+    ).order_by(DeviceLogChunk.last_ts, DeviceLogChunk.id).all()
+
+    id_groups: List[List[int]] = []
+    current: List[int] = []
+    current_lines = 0
+    for chunk_id, line_count in rows:
+        if line_count >= LOG_ARCHIVE_CHUNK_MAX_LINES:
+            # Bloque lleno: cierra el grupo actual y no entra en ninguno
+            if current:
+                id_groups.append(current)
+            current, current_lines = [], 0
+            continue
+        if current and current_lines + line_count > LOG_ARCHIVE_CHUNK_MAX_LINES:
+            id_groups.append(current)
+            current, current_lines = [], 0
+        current.append(chunk_id)
+        current_lines += line_count
+    if current:
+        id_groups.append(current)
+
+    groups: List[List[DeviceLogChunk]] = [
+        db.query(DeviceLogChunk).filter(DeviceLogChunk.id.in_(ids)).order_by(
+            DeviceLogChunk.last_ts, DeviceLogChunk.id
+        ).all()
+        for ids in id_groups if len(ids) >= 2
+    ]
+
+    removed = 0
+    for group in groups:
+        lines: List[str] = []
+        for chunk in group:
+            lines.extend(decompress_chunk(chunk))
+        pushed = [chunk for chunk in group if chunk.last_seq is not None]
+        # Conservar el momento de ingesta original: last_push_at() lo usa para saber
+        # si el agente está enviando logs
+        sources = pushed or group
+        db.add(_new_chunk(
+            device_id,
+            lines,
+            min(chunk.first_ts for chunk in group),
+            max(chunk.last_ts for chunk in group),
+            last_seq=max(chunk.last_seq for chunk in pushed) if pushed else None,
+            created_at=max((chunk.created_at for chunk in sources if chunk.created_at), default=None)
+        ))
+        for chunk in group:
+            db.delete(chunk)
+        removed += len(group) - 1
+
+    if removed:
+        db.commit()
+    return removed
+
+
+def compact_all(db: Session) -> int:
+    """
+    Compacta el archivo de todos los dispositivos
+
+    Returns:
+        Número total de bloques eliminados
+    """
+    device_ids = [row[0] for row in db.query(DeviceLogChunk.device_id).distinct().all()]
+    removed = 0
+    for device_id in device_ids:
+        try:
+            removed += compact_device(db, device_id)
+        except Exception as e:
+            logger.error(f"Error al compactar logs de {device_id}: {str(e)}")
+            db.rollback()
+
+    if removed:
+        logger.info(f"Compactación de logs: {removed} bloques fusionados")
+    return removed
+
+
+def migrate_service_logs(db: Session, batch_size: int = 100) -> int:
+    """
+    Mueve el contenido de la columna obsoleta devices.service_logs al archivo
+    y la deja a NULL.
+
+    Returns:
+        Número de dispositivos migrados
+    """
+    migrated = 0
+    while True:
+        rows = db.query(Device.id, Device.device_id, Device.service_logs).filter(
+            Device.service_logs.isnot(None)
+        ).limit(batch_size).all()
+        if not rows:
+            break
+
+        for row_id, device_id, service_logs in rows:
+            append_text(db, device_id, service_logs)
+            db.query(Device).filter(Device.id == row_id).update(
+                {Device.service_logs: None}, synchronize_session=False
+            )
+            migrated += 1
+        db.commit()
+
+    return migrated
+
+
+def run_maintenance() -> dict:
+    """
+    Ejecuta retención y compactación en una sesión propia
+    """
+    db = SessionLocal()
+    try:
+        purged = purge_expired(db)
+        compacted = compact_all(db)
+        return {"purged": purged, "compacted": compacted}
+    finally:
+        db.close()
+
+
+async def periodic_maintenance(interval_seconds: int = LOG_ARCHIVE_MAINTENANCE_INTERVAL):
+    """
+    Ejecuta el mantenimiento del archivo de logs de forma periódica
+
+    Args:
+        interval_seconds (int): Intervalo entre ejecuciones en segundos
+    """
+    while True:
+        try:
+            result = await asyncio.to_thread(run_maintenance)
+            logger.info(f"Mantenimiento del archivo de logs completado: {result}")
+        except Exception as e:
+            logger.error(f"Error en el mantenimiento del archivo de logs: {str(e)}")
+
+        await asyncio.sleep(interval_seconds)
+
+
+def start_log_archive_maintenance(app):
+    """
+    Inicia el mantenimiento del archivo de logs en segundo plano
+    (solo en el proceso que tenga el liderazgo de la tarea)
+
+    Args:
+        app: Instancia de FastAPI
+    """
+    run_singleton_job(app, "log_archive_maintenance", periodic_maintenance)
+
+
+if __name__ == "__main__":
+    # Para ejecución manual: migrate | purge | compact
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "maintenance"
+    session = SessionLocal()
+    try:
+        if command == "migrate":
+            print(f"Dispositivos migrados: {migrate_service_logs(session)}")
+        elif command == "purge":
+            print(f"Bloques eliminados: {purge_expired(session)}")
+        elif command == "compact":
+            print(f"Bloques fusionados: {compact_all(session)}")
+        else:
+            print(run_maintenance())
+    finally:
+        session.close()
@@ -0,0 +1,114 @@
+"""
+utils/log_ingest.py
+Ingesta de lotes de logs enviados por los agentes (modo push).
+
+Los agentes envían entradas del journal con número de secuencia, normalmente
+comprimidas con gzip. El servidor archiva solo las secuencias nuevas,
+confirma el high-water mark y, cuando hay demasiadas ingestas en curso,
+pide al agente que reintente más tarde (Retry-After).
+"""
+
+import json
+import logging
+import os
+import random
+import zlib
+from typing import Optional, Tuple
+
+from models.database import SessionLocal
+from models.models import Device
+from models.schemas import LogBatch
+from utils import log_archive
+
+logger = logging.getLogger(__name__)
+
+LOG_INGEST_MAX_CONCURRENCY = int(os.environ.get('LOG_INGEST_MAX_CONCURRENCY', '8'))
+LOG_INGEST_RETRY_AFTER = int(os.environ.get('LOG_INGEST_RETRY_AFTER', '30'))  # segundos
+LOG_INGEST_MAX_BODY_BYTES = int(os.environ.get('LOG_INGEST_MAX_BODY_BYTES', str(2 * 1024 * 1024)))
+LOG_INGEST_MAX_DECODED_BYTES = int(os.environ.get('LOG_INGEST_MAX_DECODED_BYTES', str(16 * 1024 * 1024)))
+LOG_INGEST_MAX_ENTRIES = int(os.environ.get('LOG_INGEST_MAX_ENTRIES', '10000'))
+
+
+class PayloadTooLarge(Exception):
+    """El lote supera los límites de tamaño configurados"""
+
+
+class IngestGate:
+    """
+    Limita el número de ingestas simultáneas en este proceso.
+    Solo se usa desde el bucle de eventos, así que no necesita bloqueo.
+    """
+
+    def __init__(self, max_concurrency: int = LOG_INGEST_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.max_concurrency:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight = max(self.in_flight - 1, 0)
+
+    def retry_after(self) -> int:
+        """Segundos de espera sugeridos, con algo de dispersión para no sincronizar a los agentes"""
+        return LOG_INGEST_RETRY_AFTER + random.randint(0, max(LOG_INGEST_RETRY_AFTER // 2, 1))
+
+
+# Instancia global
+ingest_gate = IngestGate()
+
+
+def decode_batch(body: bytes, content_encoding: Optional[str] = None) -> LogBatch:
+    """
+    Descomprime (si es gzip) y valida el cuerpo de un lote de logs
+
+    Raises:
+        PayloadTooLarge: Si el cuerpo o su versión descomprimida superan los límites
+        ValueError: Si el cuerpo no es un lote válido
+    """
+    if len(body) > LOG_INGEST_MAX_BODY_BYTES:
+        raise PayloadTooLarge(f"El lote supera {LOG_INGEST_MAX_BODY_BYTES} bytes")
+
+    if (content_encoding or '').lower() == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, LOG_INGEST_MAX_DECODED_BYTES)
+        except zlib.error as e:
+            raise ValueError(f"Contenido gzip inválido: {str(e)}")
+        if decompressor.unconsumed_tail:
+            raise PayloadTooLarge(f"El lote descomprimido supera {LOG_INGEST_MAX_DECODED_BYTES} bytes")
+
+    try:
+        batch = LogBatch(**json.loads(body))
+    except Exception as e:
+        raise ValueError(f"Lote de logs inválido: {str(e)}")
+
+    if len(batch.entries) > LOG_INGEST_MAX_ENTRIES:
+        raise PayloadTooLarge(f"El lote supera {LOG_INGEST_MAX_ENTRIES} entradas")
+
+    return batch
+
+
+def store_batch(device_id: str, batch: LogBatch) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Archiva un lote en una sesión propia (se ejecuta fuera del bucle de eventos)
+
+    Returns:
+        (entradas archivadas, high-water mark) o None si el dispositivo no existe
+    """
+    db = SessionLocal()
+    try:
+        if db.query(Device.id).filter(Device.device_id == device_id).first() is None:
+            return None
+        entries = [(entry.seq, entry.ts, entry.message) for entry in batch.entries]
+        return log_archive.append_entries(db, device_id, entries)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,312 @@
+"""
+utils/log_search.py
+Índice invertido sobre el archivo de logs de dispositivos.
+
+En PostgreSQL se usa una tabla con una columna tsvector e índice GIN;
+en SQLite (desarrollo y pruebas locales) una tabla virtual FTS5. La
+indexación se hace en segundo plano a medida que se archivan bloques.
+"""
+
+import asyncio
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, engine
+from utils.leader_election import run_singleton_job
+
+logger = logging.getLogger(__name__)
+
+LOG_SEARCH_INDEX_INTERVAL = int(os.environ.get('LOG_SEARCH_INDEX_INTERVAL', '30'))  # segundos
+LOG_SEARCH_BATCH_SIZE = int(os.environ.get('LOG_SEARCH_BATCH_SIZE', '200'))
+# to_tsvector no admite documentos de más de 1 MB
+LOG_SEARCH_MAX_DOCUMENT_CHARS = int(os.environ.get('LOG_SEARCH_MAX_DOCUMENT_CHARS', '500000'))
+
+# Los bloques pueden confirmarse fuera de orden de id; se revisa esta ventana hacia atrás
+_REINDEX_WINDOW = 1000
+
+# DDL del índice por dialecto
+index_scripts = {
+    'postgresql': [
+        '''
+        CREATE TABLE IF NOT EXISTS device_log_search (
+            chunk_id INTEGER PRIMARY KEY REFERENCES device_log_chunks(id) ON DELETE CASCADE,
+            document TSVECTOR NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS ix_device_log_search_document ON device_log_search USING GIN (document)',
+    ],
+    'sqlite': [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS device_log_fts USING fts5(
+            body,
+            tokenize = 'unicode61'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS device_log_chunks_fts_delete
+        AFTER DELETE ON device_log_chunks
+        BEGIN
+            DELETE FROM device_log_fts WHERE rowid = old.id;
+        END
+        ''',
+    ],
+}
+
+# Tabla del índice y columna con el id del bloque, por dialecto
+_index_tables = {
+    'postgresql': ('device_log_search', 'chunk_id'),
+    'sqlite': ('device_log_fts', 'rowid'),
+}
+
+
+def _dialect(db_engine=None) -> str:
+    dialect = (db_engine or engine).dialect.name
+    if dialect not in index_scripts:
+        raise NotImplementedError(f"Búsqueda de logs no disponible para el dialecto {dialect}")
+    return dialect
+
+
+def ensure_search_index(db_engine=None):
+    """
+    Crea las tablas e índices de búsqueda si no existen
+    """
+    db_engine = db_engine or engine
+    dialect = _dialect(db_engine)
+    with db_engine.begin() as conn:
+        for statement in index_scripts[dialect]:
+            conn.execute(text(statement))
+
+
+def _indexed_high_water_mark(db: Session, dialect: str) -> int:
+    table, column = _index_tables[dialect]
+    return db.execute(text(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")).scalar() or 0
+
+
+def pending_chunks(db: Session, limit: int = LOG_SEARCH_BATCH_SIZE):
+    """
+    Bloques archivados que todavía no están en el índice
+
+    Returns:
+        Lista de filas (id, data)
+    """
+    dialect = _dialect(db.get_bind())
+    table, column = _index_tables[dialect]
+    floor = max(_indexed_high_water_mark(db, dialect) - _REINDEX_WINDOW, 0)
+
+    return db.execute(text(f'''
+        SELECT c.id, c.data
+        FROM device_log_chunks c
+        WHERE c.id > :floor
+          AND NOT EXISTS (SELECT 1 FROM {table} i WHERE i.{column} = c.id)
+        ORDER BY c.id
+        LIMIT :limit
+    '''), {"floor": floor, "limit": limit}).all()
+
+
+def index_pending(db: Session, limit: int = LOG_SEARCH_BATCH_SIZE) -> int:
+    """
+    Indexa un lote de bloques pendientes
+
+    Returns:
+        Número de bloques indexados
+    """
+    dialect = _dialect(db.get_bind())
+    rows = pending_chunks(db, limit)
+    if not rows:
+        return 0
+
+    documents = [
+        {
+            "chunk_id": chunk_id,
+            "body": zlib.decompress(data).decode('utf-8', errors='replace')[:LOG_SEARCH_MAX_DOCUMENT_CHARS]
+        }
+        for chunk_id, data in rows
+    ]
+
+    if dialect == 'postgresql':
+        statement = text('''
+            INSERT INTO device_log_search (chunk_id, document)
+            VALUES (:chunk_id, to_tsvector('simple', :body))
+            ON CONFLICT (chunk_id) DO NOTHING
+        ''')
+    else:
+        statement = text('INSERT OR IGNORE INTO device_log_fts (rowid, body) VALUES (:chunk_id, :body)')
+
+    db.execute(statement, documents)
+    db.commit()
+    return len(documents)
+
+
+def search_devices(
+    db: Session,
+    query: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    tienda: Optional[str] = None,
+    model: Optional[str] = None,
+    limit: int = 100
+) -> List[dict]:
+    """
+    Busca una frase en los logs archivados y agrupa los resultados por dispositivo.
+
+    Args:
+        db: Sesión de base de datos
+        query: Texto a buscar (se trata como frase)
+        since: Inicio del rango de tiempo (por defecto hace 24 horas)
+        until: Fin del rango de tiempo (por defecto ahora)
+        tienda: Filtrar por tienda
+        model: Filtrar por modelo de dispositivo
+        limit: Número máximo de dispositivos devueltos
+
+    Returns:
+        Lista de diccionarios con los dispositivos y su número de bloques coincidentes,
+        ordenada de más a menos coincidencias
+    """
+    dialect = _dialect(db.get_bind())
+    until = until or datetime.now()
+    since = since or (until - timedelta(hours=24))
+
+    params = {"since": since, "until": until, "limit": limit}
+    filters = ["c.last_ts >= :since", "c.first_ts <= :until"]
+
+    if dialect == 'postgresql':
+        source = "device_log_search s JOIN device_log_chunks c ON c.id = s.chunk_id"
+        filters.append("s.document @@ phraseto_tsquery('simple', :query)")
+        params["query"] = query
+    else:
+        source = "device_log_fts f JOIN device_log_chunks c ON c.id = f.rowid"
+        filters.append("device_log_fts MATCH :query")
+        params["query"] = '"' + query.replace('"', '""') + '"'
+
+    if tienda:
+        filters.append("d.tienda = :tienda")
+        params["tienda"] = tienda
+    if model:
+        filters.append("d.model = :model")
+        params["model"] = model
+
+    rows = db.execute(text(f'''
+        SELECT c.device_id, d.name, d.tienda, d.model,
+               COUNT(*) AS hits, MIN(c.first_ts) AS first_match, MAX(c.last_ts) AS last_match
+        FROM {source}
+        JOIN devices d ON d.device_id = c.device_id
+        WHERE {" AND ".join(filters)}
+        GROUP BY c.device_id, d.name, d.tienda, d.model
+        ORDER BY hits DESC, last_match DESC
+        LIMIT :limit
+    '''), params).all()
+
+    return [
+        {
+            "device_id": row.device_id,
+            "name": row.name,
+            "tienda": row.tienda,
+            "model": row.model,
+            "hits": row.hits,
+            "first_match": row.first_match,
+            "last_match": row.last_match,
+        }
+        for row in rows
+    ]
+
+
+class LogIndexer:
+    """
+    Indexador en segundo plano: se despierta cuando se archivan logs
+    o, como respaldo, cada LOG_SEARCH_INDEX_INTERVAL segundos
+    """
+
+    def __init__(self, interval: int = LOG_SEARCH_INDEX_INTERVAL):
+        self.interval = interval
+        self.running = False
+        self.indexed_total = 0
+        self.last_run = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def notify(self):
+        """Avisar de que hay bloques nuevos (se puede llamar desde cualquier hilo)"""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # El bucle ya está cerrado
+            pass
+
+    def _index_all_pending(self) -> int:
+        db = SessionLocal()
+        try:
+            total = 0
+            while True:
+                indexed = index_pending(db)
+                total += indexed
+                if indexed < LOG_SEARCH_BATCH_SIZE:
+                    return total
+        finally:
+            db.close()
+
+    async def start(self):
+        """Iniciar el indexador en background"""
+        if self.running:
+            logger.warning("El indexador de logs ya está en ejecución")
+            return
+
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        try:
+            await asyncio.to_thread(ensure_search_index)
+        except Exception as e:
+            logger.error(f"No se pudo preparar el índice de búsqueda de logs: {str(e)}")
+            self.running = False
+            return
+
+        logger.info("Indexador de logs iniciado")
+        try:
+            while self.running:
+                try:
+                    indexed = await asyncio.to_thread(self._index_all_pending)
+                    self.indexed_total += indexed
+                    self.last_run = datetime.now()
+                    if indexed:
+                        logger.debug(f"Indexados {indexed} bloques de logs")
+                except Exception as e:
+                    logger.error(f"Error al indexar logs: {str(e)}")
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self.running = False
+            self._loop = None
+
+    def stop(self):
+        """Detener el indexador"""
+        self.running = False
+        self.notify()
+
+
+# Instancia global del indexador
+log_indexer = LogIndexer()
+
+
+def start_log_indexer(app):
+    """
+    Inicia el indexador de logs en segundo plano (solo en el proceso líder;
+    en los demás notify() no hace nada y el líder recoge los bloques en su
+    siguiente ciclo)
+
+    Args:
+        app: Instancia de FastAPI
+    """
+    run_singleton_job(app, "log_indexer", log_indexer.start)
@@ -0,0 +1,423 @@
+"""
+utils/metrics.py
+Métricas del servidor en el formato de texto de Prometheus (GET /metrics).
+
+Registro propio y sin dependencias: contadores, indicadores (gauges) e
+histogramas con etiquetas, más métricas que leen el estado de otros módulos
+(pool de conexiones, caché de exportaciones, tareas en segundo plano) en el
+momento de la consulta.
+
+Para que la cardinalidad esté acotada, las etiquetas solo deben tomar
+valores de conjuntos cerrados (plantilla de la ruta, no la URL; operación,
+no el dispositivo). Aun así cada métrica admite como máximo
+METRICS_MAX_SERIES combinaciones y las siguientes se agrupan en "other".
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Combinaciones de etiquetas por métrica antes de agrupar en "other"
+METRICS_MAX_SERIES = int(os.environ.get('METRICS_MAX_SERIES', '500'))
+# Token opcional para proteger /metrics (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Intervalos por defecto de los histogramas de duración (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OVERFLOW_LABEL = "other"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Métrica con etiquetas y número de series acotado"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        if key not in self._series and len(self._series) >= METRICS_MAX_SERIES:
+            return (OVERFLOW_LABEL,) * len(self.labelnames)
+        return key
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for index, limit in enumerate(self.buckets):
+                if value <= limit:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                running = 0
+                for limit, count in zip(self.buckets, series["counts"]):
+                    running += count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(limit),))} {running}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas del proceso
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in sorted(metrics, key=lambda metric: metric.name):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Instancia global
+registry = MetricsRegistry()
+
+
+# Peticiones HTTP
+http_requests_total = registry.counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status"))
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP", ("method", "route"))
+http_requests_in_progress = registry.gauge(
+    "http_requests_in_progress", "Peticiones HTTP en curso")
+
+# Sentencias SQL por petición (utils/sql_accounting.py)
+http_request_db_statements = registry.histogram(
+    "http_request_db_statements", "Sentencias SQL ejecutadas por petición", ("route",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000))
+http_request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Tiempo en la base de datos por petición", ("route",))
+sql_repeated_statements_total = registry.counter(
+    "sql_repeated_statements_total", "Peticiones que repitieron una misma sentencia (posible N+1)", ("route",))
+
+# Llamadas salientes a los dispositivos (API del agente y SSH)
+outbound_calls_total = registry.counter(
+    "outbound_calls_total", "Llamadas a los dispositivos", ("target", "operation", "outcome"))
+outbound_call_duration_seconds = registry.histogram(
+    "outbound_call_duration_seconds", "Duración de las llamadas a los dispositivos", ("target", "operation"))
+
+# Verificación periódica por ping
+ping_sweep_duration_seconds = registry.histogram(
+    "ping_sweep_duration_seconds", "Duración de cada verificación de dispositivos por ping",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200))
+ping_sweep_devices = registry.gauge(
+    "ping_sweep_devices", "Dispositivos según el resultado de la última verificación", ("state",))
+ping_sweep_interfaces_up = registry.gauge(
+    "ping_sweep_interfaces_up", "Interfaces que respondieron en la última verificación", ("interface",))
+ping_sweep_last_run_timestamp_seconds = registry.gauge(
+    "ping_sweep_last_run_timestamp_seconds", "Fin de la última verificación por ping (epoch)")
+
+# Verificador de listas de reproducción
+playlist_checker_run_duration_seconds = registry.histogram(
+    "playlist_checker_run_duration_seconds", "Duración de cada verificación de listas")
+playlist_checker_transitions_total = registry.counter(
+    "playlist_checker_transitions_total", "Listas activadas o desactivadas por fecha", ("transition",))
+playlist_checker_errors_total = registry.counter(
+    "playlist_checker_errors_total", "Verificaciones de listas que terminaron con error")
+
+# Series conocidas a 0 para que rate()/increase() funcionen desde el arranque
+for _transition in ("activated", "deactivated"):
+    playlist_checker_transitions_total.inc(0, transition=_transition)
+playlist_checker_errors_total.inc(0)
+
+
+def route_template(scope: Dict) -> str:
+    """
+    Plantilla de la ruta que atendió la petición (p. ej. /api/devices/{device_id})
+    o "unmatched" si ninguna coincidió, para no usar la URL como etiqueta
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    return path or "/"
+
+
+def observe_request(method: str, route: str, status: int, duration: float, sql_stats=None):
+    """Registrar una petición HTTP terminada (y sus sentencias SQL si se contabilizaron)"""
+    http_requests_total.inc(method=method, route=route, status=str(status))
+    http_request_duration_seconds.observe(duration, method=method, route=route)
+    if sql_stats is not None:
+        http_request_db_statements.observe(sql_stats.statements, route=route)
+        http_request_db_seconds.observe(sql_stats.duration, route=route)
+        if sql_stats.repeated():
+            sql_repeated_statements_total.inc(route=route)
+
+
+@contextmanager
+def track_call(target: str, operation: str):
+    """
+    Medir una llamada a un dispositivo. Se cuenta como error si lanza una
+    excepción; el llamante puede marcar otros fallos con call["outcome"]
+
+    Args:
+        target: agent (API HTTP del dispositivo) o ssh
+        operation: Operación (conjunto cerrado: logs, screenshot, service...)
+    """
+    call = {"outcome": "ok"}
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call["outcome"] = "error"
+        raise
+    finally:
+        outbound_call_duration_seconds.observe(time.perf_counter() - started, target=target, operation=operation)
+        outbound_calls_total.inc(target=target, operation=operation, outcome=call["outcome"])
+
+
+class CallbackMetric(Metric):
+    """
+    Métrica cuyos valores se leen de otro módulo al exportar
+
+    La función devuelve pares (valores de las etiquetas, valor); para un
+    histograma, el valor es un diccionario con buckets {límite: acumulado},
+    sum y count.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Tuple[str, ...], object]]]):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        try:
+            samples = list(self.callback())
+        except Exception as e:
+            logger.error(f"Error al leer la métrica {self.name}: {str(e)}")
+            return lines
+        names = self.labelnames + ('le',)
+        for key, value in samples[:METRICS_MAX_SERIES]:
+            key = tuple(str(part) for part in key)
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+                continue
+            for limit, count in value["buckets"].items():
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(limit),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(value['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {value['count']}")
+        return lines
+
+
+def agent_get(url: str, operation: str, timeout: float):
+    """
+    GET a la API local de un dispositivo midiendo la llamada
+    (las respuestas 4xx/5xx cuentan como http_error)
+
+    Args:
+        url: URL completa
+        operation: Etiqueta de la operación
+        timeout: Tiempo máximo en segundos
+    """
+    import requests
+
+    with track_call("agent", operation) as call:
+        response = requests.get(url, timeout=timeout)
+        if response.status_code >= 400:
+            call["outcome"] = "http_error"
+        return response
+
+
+def ssh_connect(client, operation: str, *args, **kwargs):
+    """
+    client.connect() de paramiko midiendo la conexión
+
+    Args:
+        client: paramiko.SSHClient
+        operation: Etiqueta de la operación
+    """
+    with track_call("ssh", operation):
+        client.connect(*args, **kwargs)
+
+
+def _pool_stats():
+    from utils.db_pool import pool_monitor
+    return pool_monitor.snapshot().items()
+
+
+def _pool_value(field: str):
+    return lambda: [((name,), info[field]) for name, info in _pool_stats() if field in info]
+
+
+def _pool_histogram(field: str):
+    def collect():
+        samples = []
+        for name, info in _pool_stats():
+            histogram = info[field]
+            # El monitor del pool mide en milisegundos
+            buckets = {(float('inf') if limit == '+Inf' else float(limit) / 1000): count
+                       for limit, count in histogram["buckets"].items()}
+            samples.append(((name,), {"buckets": buckets, "sum": histogram["sum_ms"] / 1000,
+                                      "count": histogram["count"]}))
+        return samples
+    return collect
+
+
+def _export_cache_requests():
+    from utils.playlist_export import export_cache
+    return [(("hit",), export_cache.hits), (("miss",), export_cache.misses)]
+
+
+def _export_cache_entries():
+    from utils.playlist_export import export_cache
+    return [((), len(export_cache._entries))]
+
+
+def _background_jobs():
+    from utils.leader_election import leader_election
+    return [((job.name,), 1 if job.is_leader else 0) for job in leader_election.jobs.values()]
+
+
+# Valores leídos de otros módulos al exportar
+for _metric in (
+    CallbackMetric("db_pool_in_use", "Conexiones del pool en uso", 'gauge', ("engine",), _pool_value("in_use")),
+    CallbackMetric("db_pool_max_in_use", "Máximo de conexiones en uso a la vez", 'gauge', ("engine",),
+                   _pool_value("max_in_use")),
+    CallbackMetric("db_pool_size", "Tamaño configurado del pool", 'gauge', ("engine",), _pool_value("size")),
+    CallbackMetric("db_pool_checked_out", "Conexiones entregadas por el pool ahora mismo", 'gauge', ("engine",),
+                   _pool_value("checked_out")),
+    CallbackMetric("db_pool_checkouts_total", "Conexiones entregadas por el pool", 'counter', ("engine",),
+                   _pool_value("checkouts")),
+    CallbackMetric("db_pool_timeouts_total", "Esperas del pool que agotaron el tiempo", 'counter', ("engine",),
+                   _pool_value("timeouts")),
+    CallbackMetric("db_pool_wait_seconds", "Espera hasta obtener una conexión del pool", 'histogram', ("engine",),
+                   _pool_histogram("wait_ms")),
+    CallbackMetric("db_pool_hold_seconds", "Tiempo que se retiene cada conexión del pool", 'histogram', ("engine",),
+                   _pool_histogram("hold_ms")),
+    CallbackMetric("playlist_export_cache_requests_total", "Consultas a la caché de exportaciones de playlists",
+                   'counter', ("result",), _export_cache_requests),
+    CallbackMetric("playlist_export_cache_entries", "Exportaciones de playlists en caché", 'gauge', (),
+                   _export_cache_entries),
+    CallbackMetric("background_job_leader", "1 si este proceso ejecuta la tarea en segundo plano", 'gauge', ("job",),
+                   _background_jobs),
+):
+    registry.register(_metric)
+
+
+def authorized(authorization: Optional[str]) -> bool:
+    """Comprobar el token de /metrics (si METRICS_TOKEN está definido)"""
+    if not METRICS_TOKEN:
+        return True
+    return authorization == f"Bearer {METRICS_TOKEN}"
@@ -0,0 +1,246 @@
+"""
+utils/pagination.py
+Paginación por cursor (keyset) para los listados de la API.
+
+En lugar de OFFSET, cada página continúa a partir del último par
+(clave de ordenación, id) de la anterior, así que el coste de una página
+no depende de su profundidad si existe un índice sobre (columna, id).
+Los valores NULL de la clave de ordenación van siempre al final; se
+recorren en una segunda fase para que ambas fases puedan usar el índice.
+"""
+
+import base64
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+logger = logging.getLogger(__name__)
+
+# Modos de cálculo del total de elementos
+TOTAL_MODES = ('none', 'estimate', 'exact')
+
+
+class CursorError(ValueError):
+    """Cursor mal formado o que no corresponde al listado solicitado"""
+
+
+def encode_cursor(sort_by: str, sort_order: str, sort_value: Any, row_id: int, direction: str = 'next') -> str:
+    """
+    Generar un cursor opaco para continuar un listado
+
+    Args:
+        sort_by: Nombre de la ordenación
+        sort_order: asc o desc
+        sort_value: Valor de la clave de ordenación de la fila límite
+        row_id: ID de la fila límite
+        direction: next (filas posteriores) o prev (filas anteriores)
+
+    Returns:
+        Cursor codificado en base64 (URL-safe)
+    """
+    value_type = None
+    if isinstance(sort_value, datetime):
+        sort_value, value_type = sort_value.isoformat(), 'datetime'
+    elif isinstance(sort_value, date):
+        sort_value, value_type = sort_value.isoformat(), 'date'
+
+    payload = {"s": sort_by, "o": sort_order, "k": sort_value, "t": value_type, "i": row_id, "d": direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int, str]:
+    """
+    Decodificar un cursor y comprobar que corresponde a la ordenación pedida
+
+    Returns:
+        Tupla (valor de la clave, id, dirección)
+
+    Raises:
+        CursorError: Si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort_value, value_type = payload["k"], payload.get("t")
+        if value_type == 'datetime':
+            sort_value = datetime.fromisoformat(sort_value)
+        elif value_type == 'date':
+            sort_value = date.fromisoformat(sort_value)
+        row_id, direction = int(payload["i"]), payload.get("d", "next")
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError(f"Cursor no válido: {str(e)}")
+
+    if payload.get("s") != sort_by or payload.get("o") != sort_order:
+        raise CursorError("El cursor corresponde a otra ordenación")
+    if direction not in ('next', 'prev'):
+        raise CursorError("Dirección de cursor no válida")
+    return sort_value, row_id, direction
+
+
+def _fetch(query: Query, sort_column, id_column, descending: bool, after: Optional[Tuple[Any, int]],
+           nullable: bool, nulls_after: Optional[int], limit: int) -> List:
+    """
+    Filas en el orden indicado (NULL al final) posteriores al límite dado
+
+    Args:
+        after: (valor, id) de la última fila vista con clave no nula, o None
+        nulls_after: id de la última fila vista con clave nula (fase de nulos), o None
+    """
+    rows = []
+    key, row_id = after if after else (None, None)
+
+    # Fase 1: filas con clave no nula
+    if nulls_after is None:
+        phase = query
+        if nullable:
+            phase = phase.filter(sort_column.isnot(None))
+        if after is not None:
+            boundary = tuple_(sort_column, id_column)
+            phase = phase.filter(boundary < tuple_(key, row_id) if descending else boundary > tuple_(key, row_id))
+        order = (sort_column.desc(), id_column.desc()) if descending else (sort_column.asc(), id_column.asc())
+        rows = phase.order_by(*order).limit(limit).all()
+
+    # Fase 2: filas con clave nula, ordenadas por id
+    if nullable and len(rows) < limit:
+        phase = query.filter(sort_column.is_(None))
+        if nulls_after is not None:
+            phase = phase.filter(id_column < nulls_after if descending else id_column > nulls_after)
+        phase = phase.order_by(id_column.desc() if descending else id_column.asc())
+        rows += phase.limit(limit - len(rows)).all()
+
+    return rows
+
+
+def _fetch_before(query: Query, sort_column, id_column, descending: bool, key: Any, row_id: int,
+                  nullable: bool, limit: int) -> List:
+    """
+    Filas anteriores (en el orden indicado) a la fila límite, devueltas en orden inverso
+    """
+    rows = []
+
+    # Recorrido inverso: primero los nulos anteriores, si la fila límite es nula
+    if key is None:
+        phase = query.filter(sort_column.is_(None))
+        phase = phase.filter(id_column > row_id if descending else id_column < row_id)
+        rows = phase.order_by(id_column.asc() if descending else id_column.desc()).limit(limit).all()
+
+    if len(rows) < limit:
+        phase = query
+        if nullable:
+            phase = phase.filter(sort_column.isnot(None))
+        if key is not None:
+            boundary = tuple_(sort_column, id_column)
+            phase = phase.filter(boundary > tuple_(key, row_id) if descending else boundary < tuple_(key, row_id))
+        order = (sort_column.asc(), id_column.asc()) if descending else (sort_column.desc(), id_column.desc())
+        rows += phase.order_by(*order).limit(limit - len(rows)).all()
+
+    return rows
+
+
+def keyset_paginate(
+    query: Query,
+    sort_column,
+    id_column,
+    sort_by: str,
+    sort_order: str = 'asc',
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    nullable: bool = True,
+    row_key=None
+) -> dict:
+    """
+    Obtener una página de resultados por cursor
+
+    Args:
+        query: Consulta ya filtrada (sin ORDER BY ni LIMIT)
+        sort_column: Columna de ordenación
+        id_column: Columna id (desempate único)
+        sort_by: Nombre público de la ordenación (se guarda en el cursor)
+        sort_order: asc o desc
+        limit: Tamaño de página
+        cursor: Cursor recibido del cliente
+        nullable: Si la columna de ordenación admite NULL
+        row_key: Función fila -> (valor de ordenación, id); por defecto lee los
+            atributos de las columnas indicadas
+
+    Returns:
+        Diccionario con items, next_cursor y prev_cursor
+
+    Raises:
+        CursorError: Si el cursor no es válido
+    """
+    descending = sort_order == 'desc'
+    if row_key is None:
+        row_key = lambda row: (getattr(row, sort_column.key), getattr(row, id_column.key))
+
+    direction = 'next'
+    if cursor:
+        key, row_id, direction = decode_cursor(cursor, sort_by, sort_order)
+
+    if direction == 'prev':
+        rows = _fetch_before(query, sort_column, id_column, descending, key, row_id, nullable, limit + 1)
+        has_more_before = len(rows) > limit
+        items = list(reversed(rows[:limit]))
+        has_more_after = True
+    else:
+        after, nulls_after = None, None
+        if cursor:
+            if key is None:
+                nulls_after = row_id
+            else:
+                after = (key, row_id)
+        rows = _fetch(query, sort_column, id_column, descending, after, nullable, nulls_after, limit + 1)
+        has_more_after = len(rows) > limit
+        items = rows[:limit]
+        has_more_before = cursor is not None
+
+    next_cursor = prev_cursor = None
+    if items and has_more_after:
+        next_cursor = encode_cursor(sort_by, sort_order, *row_key(items[-1]), direction='next')
+    if items and has_more_before:
+        prev_cursor = encode_cursor(sort_by, sort_order, *row_key(items[0]), direction='prev')
+
+    return {"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+def count_total(query: Query, mode: str = 'none') -> Optional[int]:
+    """
+    Número total de filas de una consulta
+
+    Args:
+        query: Consulta filtrada
+        mode: none (no se calcula), exact (COUNT) o estimate (estadísticas del
+            planificador de PostgreSQL; en otros motores se cuenta)
+
+    Returns:
+        Total (exacto o estimado) o None
+    """
+    if mode == 'none':
+        return None
+
+    if mode == 'estimate':
+        session = query.session
+        if session.get_bind().dialect.name == 'postgresql':
+            try:
+                return _estimate_rows(query)
+            except Exception as e:
+                logger.warning(f"No se pudo estimar el total, se usa COUNT: {str(e)}")
+
+    return query.order_by(None).count()
+
+
+def _estimate_rows(query: Query) -> int:
+    session = query.session
+    statement = query.order_by(None).statement
+    compiled = statement.compile(dialect=session.get_bind().dialect)
+    plan = session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,106 @@
+"""
+utils/passwords.py
+Hash de contraseñas de usuarios locales (bcrypt).
+
+Un único CryptContext para todo el proceso, con el coste configurable en
+BCRYPT_ROUNDS. Los hashes con otro coste se consideran obsoletos y se
+recalculan en el siguiente login correcto (verify_and_update).
+
+bcrypt tarda del orden de cientos de milisegundos por verificación, así
+que desde el código asíncrono se ejecuta en un pool de hilos propio
+(PASSWORD_HASH_THREADS) y no en el del bucle de eventos, con un límite
+de verificaciones en espera (PASSWORD_HASH_MAX_PENDING): una oleada de
+logins no bloquea el bucle ni acapara los hilos que usan las consultas.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', '2'))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', '5'))  # segundos
+
+
+class PasswordHasherBusy(Exception):
+    """Hay demasiadas verificaciones de contraseña en espera"""
+
+
+class PasswordHasher:
+    """
+    Hash y verificación de contraseñas con un pool de hilos acotado.
+    El contador de pendientes solo se usa desde el bucle de eventos, así que
+    no necesita bloqueo.
+    """
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, threads: int = PASSWORD_HASH_THREADS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        # min_rounds = max_rounds = rounds: cualquier otro coste necesita rehash
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds
+        )
+        self.threads = threads
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verificar una contraseña
+
+        Returns:
+            (correcta, nuevo hash si el actual usa otro coste o esquema)
+        """
+        try:
+            return self.context.verify_and_update(password, password_hash)
+        except ValueError:
+            # Hash con un formato desconocido
+            logger.warning("Hash de contraseña con formato no reconocido")
+            return False, None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, function, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy(f"Más de {self.max_pending} verificaciones de contraseña en espera")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), function, *args)
+        finally:
+            self.pending -= 1
+
+    async def verify_async(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        verify() en el pool de hilos del hasher
+
+        Raises:
+            PasswordHasherBusy: Si ya hay max_pending verificaciones en espera
+        """
+        return await self._run(self.verify, password, password_hash)
+
+    async def hash_async(self, password: str) -> str:
+        """hash() en el pool de hilos del hasher"""
+        return await self._run(self.hash, password)
+
+
+# Instancia global
+password_hasher = PasswordHasher()
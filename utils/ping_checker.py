@@ -5,9 +5,14 @@ import asyncio
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import logging
+import time
 
 from models import models
 from models.database import SessionLocal
+from utils.leader_election import run_singleton_job
+from utils.metrics import (
+    ping_sweep_devices, ping_sweep_duration_seconds, ping_sweep_interfaces_up, ping_sweep_last_run_timestamp_seconds
+)
 
 logger = logging.getLogger(__name__)
 
@@ -144,7 +149,9 @@ async def periodic_check_devices(interval_minutes=5):
     while True:
         try:
             logger.info("Iniciando verificación periódica de dispositivos")
+            started = time.perf_counter()
             results = await check_device_status()
+            ping_sweep_duration_seconds.observe(time.perf_counter() - started)
             
             # Contar dispositivos activos e inactivos
             active_count = sum(1 for result in results.values() if result['is_active'])
@@ -153,6 +160,12 @@ async def periodic_check_devices(interval_minutes=5):
             # Contar conexiones por tipo de interfaz
             lan_active_count = sum(1 for result in results.values() if result['lan_active'])
             wifi_active_count = sum(1 for result in results.values() if result['wifi_active'])
+
+            ping_sweep_devices.set(active_count, state="active")
+            ping_sweep_devices.set(inactive_count, state="inactive")
+            ping_sweep_interfaces_up.set(lan_active_count, interface="lan")
+            ping_sweep_interfaces_up.set(wifi_active_count, interface="wifi")
+            ping_sweep_last_run_timestamp_seconds.set(time.time())
             
             logger.info(f"Verificación completada. Dispositivos activos: {active_count}, inactivos: {inactive_count}")
             logger.info(f"Conexiones activas por LAN: {lan_active_count}, por WiFi: {wifi_active_count}")
@@ -165,12 +178,10 @@ async def periodic_check_devices(interval_minutes=5):
 # Función para iniciar la verificación periódica desde main.py
 def start_background_ping_checker(app):
     """
-    Inicia el verificador de ping en segundo plano
+    Inicia el verificador de ping en segundo plano.
+    Solo lo ejecuta el proceso que tenga el liderazgo de la tarea.
     
     Args:
         app: Instancia de FastAPI
     """
-    @app.on_event("startup")
-    async def start_ping_checker():
-        asyncio.create_task(periodic_check_devices())
-    start_ping_checker()
\ No newline at end of file
+    run_singleton_job(app, "ping_checker", periodic_check_devices)
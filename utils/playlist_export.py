@@ -0,0 +1,219 @@
+"""
+utils/playlist_export.py
+Exportación JSON de playlists generada en memoria.
+
+El contenido exportado se guarda en una caché LRU por proceso, indexada por
+la versión de la playlist (su updated_at). Cualquier cambio en la playlist,
+sus videos o su orden debe pasar por touch_playlists() para que la versión
+cambie. El ETag es un hash del contenido, así que es el mismo en todos los
+procesos.
+
+También incluye el limpiador de los ficheros playlist_*.json que la versión
+anterior escribía en disco en cada descarga.
+"""
+
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from models.models import Playlist, PlaylistVideo
+from utils.leader_election import run_singleton_job
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_EXPORT_CACHE_SIZE = int(os.environ.get('PLAYLIST_EXPORT_CACHE_SIZE', '256'))
+PLAYLIST_JANITOR_INTERVAL = int(os.environ.get('PLAYLIST_JANITOR_INTERVAL', '3600'))  # segundos
+
+# Directorio donde se acumulaban las exportaciones antiguas
+PLAYLIST_DIR = "playlists"
+
+
+class PlaylistExportCache:
+    """
+    Caché LRU de exportaciones: playlist_id -> (versión, etag, contenido)
+    """
+
+    def __init__(self, max_entries: int = PLAYLIST_EXPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, playlist_id: int, version: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(playlist_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(playlist_id)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, playlist_id: int, version: str, etag: str, body: bytes):
+        with self._lock:
+            self._entries[playlist_id] = (version, etag, body)
+            self._entries.move_to_end(playlist_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, playlist_id: int):
+        with self._lock:
+            self._entries.pop(playlist_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Instancia global
+export_cache = PlaylistExportCache()
+
+
+def touch_playlists(db: Session, playlist_ids: Optional[Iterable[int]] = None, video_id: Optional[int] = None):
+    """
+    Cambiar la versión (updated_at) de las playlists afectadas por un cambio.
+    No hace commit: forma parte de la transacción del cambio.
+
+    Args:
+        db: Sesión de base de datos
+        playlist_ids: Playlists modificadas directamente
+        video_id: Video modificado; se actualizan todas las playlists que lo contienen
+    """
+    statement = update(Playlist).values(updated_at=datetime.now())
+    if video_id is not None:
+        statement = statement.where(Playlist.id.in_(
+            select(PlaylistVideo.playlist_id).where(PlaylistVideo.video_id == video_id)
+        ))
+    else:
+        statement = statement.where(Playlist.id.in_(list(playlist_ids or [])))
+    db.execute(statement.execution_options(synchronize_session=False))
+
+
+def playlist_version(playlist: Playlist) -> str:
+    """Versión del contenido exportable de una playlist"""
+    stamp = playlist.updated_at or playlist.creation_date
+    return stamp.isoformat() if stamp else "0"
+
+
+def build_export(playlist: Playlist) -> bytes:
+    """
+    Generar el JSON de exportación de una playlist (videos en su orden)
+    """
+    playlist_data = {
+        "id": playlist.id,
+        "title": playlist.title,
+        "description": playlist.description,
+        "start_date": playlist.start_date.isoformat() if playlist.start_date else None,
+        "expiration_date": playlist.expiration_date.isoformat() if playlist.expiration_date else None,
+        "videos": [
+            {
+                "id": video.id,
+                "title": video.title,
+                "description": video.description,
+                "file_path": video.file_path,
+                "duration": video.duration
+            }
+            for video in playlist.videos
+        ]
+    }
+    return json.dumps(playlist_data, indent=4).encode("utf-8")
+
+
+def export_playlist(playlist: Playlist) -> Tuple[str, bytes]:
+    """
+    Exportación de una playlist, desde la caché si su versión no ha cambiado
+
+    Returns:
+        Tupla (etag, contenido JSON)
+    """
+    version = playlist_version(playlist)
+    cached = export_cache.get(playlist.id, version)
+    if cached is not None:
+        return cached
+
+    body = build_export(playlist)
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    export_cache.put(playlist.id, version, etag, body)
+    return etag, body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comprobar una cabecera If-None-Match contra un ETag"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    return "*" in candidates or any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+        for candidate in candidates
+    )
+
+
+def content_disposition(filename: str) -> str:
+    """
+    Cabecera Content-Disposition de una descarga con cualquier nombre de fichero:
+    filename* en UTF-8 (RFC 5987) y un filename ASCII de respaldo sin comillas
+    """
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', '_', filename)
+    quoted = quote(filename, safe='')
+    if quoted == filename:
+        return f'attachment; filename="{filename}"'
+    return f'attachment; filename="{fallback}"; filename*=utf-8\'\'{quoted}'
+
+
+def purge_playlist_files(directory: str = PLAYLIST_DIR) -> int:
+    """
+    Eliminar los ficheros de exportación acumulados en disco
+
+    Returns:
+        Número de ficheros eliminados
+    """
+    removed = 0
+    for path in glob.glob(os.path.join(directory, "playlist_*.json")):
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {path}: {str(e)}")
+    if removed:
+        logger.info(f"Eliminados {removed} ficheros de exportación de playlists en {directory}")
+    return removed
+
+
+async def periodic_playlist_file_purge():
+    """
+    Tarea periódica que vacía el directorio de exportaciones antiguas
+    (por si una instancia con la versión anterior sigue escribiendo en él)
+    """
+    while True:
+        try:
+            await asyncio.to_thread(purge_playlist_files)
+        except Exception as e:
+            logger.error(f"Error al limpiar las exportaciones de playlists: {str(e)}")
+        await asyncio.sleep(PLAYLIST_JANITOR_INTERVAL)
+
+
+def start_playlist_file_janitor(app):
+    """
+    Inicia la limpieza de exportaciones antiguas en segundo plano
+    (solo en el proceso que tenga el liderazgo de la tarea)
+
+    Args:
+        app: Instancia de FastAPI
+    """
+    run_singleton_job(app, "playlist_file_janitor", periodic_playlist_file_purge)
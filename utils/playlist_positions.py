@@ -0,0 +1,216 @@
+"""
+utils/playlist_positions.py
+Posiciones dispersas de los videos dentro de una playlist.
+
+Las posiciones se asignan con huecos de POSITION_GAP, así que insertar o
+mover un video solo escribe su propia fila (se le asigna el punto medio
+entre sus vecinos). Solo cuando dos vecinos quedan contiguos se renumera
+la playlist entera, con una única sentencia UPDATE.
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from models.models import PlaylistVideo, Video
+
+logger = logging.getLogger(__name__)
+
+# Separación entre posiciones consecutivas tras una renumeración
+POSITION_GAP = 1024
+
+
+class PlaylistItemsError(ValueError):
+    """Operación sobre los videos de una playlist que no se puede aplicar"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def load_items(db: Session, playlist_id: int) -> List[Tuple[int, int]]:
+    """
+    Videos de la playlist en orden
+
+    Returns:
+        Lista de tuplas (posición, video_id)
+    """
+    rows = db.execute(
+        select(PlaylistVideo.position, PlaylistVideo.video_id)
+        .where(PlaylistVideo.playlist_id == playlist_id)
+        .order_by(PlaylistVideo.position, PlaylistVideo.id)
+    ).all()
+    return [(row.position, row.video_id) for row in rows]
+
+
+def renumber(db: Session, playlist_id: int, video_ids: Sequence[int],
+             current: Optional[Sequence[int]] = None) -> List[Tuple[int, int]]:
+    """
+    Asignar posiciones equiespaciadas a todos los videos en el orden dado
+    con una sola sentencia UPDATE
+
+    Las nuevas posiciones se toman de un rango que no se solapa con las
+    actuales, así la restricción uix_position_playlist no falla a mitad
+    de la sentencia aunque el motor la compruebe fila a fila.
+
+    Args:
+        db: Sesión de base de datos
+        playlist_id: ID de la playlist
+        video_ids: Todos los videos de la playlist en el nuevo orden
+        current: Posiciones actuales (si ya se conocen)
+
+    Returns:
+        Lista de tuplas (posición, video_id) con el nuevo orden
+    """
+    if not video_ids:
+        return []
+
+    if current is None:
+        current = [position for position, _ in load_items(db, playlist_id)]
+    span = (len(video_ids) + 1) * POSITION_GAP
+    # Banda baja [GAP, N*GAP] si está libre; si no, por encima de la posición máxima
+    base = 0 if not current or min(current) > span else max(current)
+    items = [(base + (index + 1) * POSITION_GAP, video_id) for index, video_id in enumerate(video_ids)]
+
+    db.execute(
+        update(PlaylistVideo)
+        .where(PlaylistVideo.playlist_id == playlist_id)
+        .values(position=case(
+            {video_id: position for position, video_id in items},
+            value=PlaylistVideo.video_id
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    return items
+
+
+def _slot(items: List[Tuple[int, int]], index: int) -> Optional[int]:
+    """Posición libre para insertar en el índice dado, o None si no hay hueco"""
+    before = items[index - 1][0] if index > 0 else None
+    after = items[index][0] if index < len(items) else None
+    if before is None and after is None:
+        return POSITION_GAP
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def _target_index(items: List[Tuple[int, int]], after_video_id: Optional[int],
+                  before_video_id: Optional[int]) -> int:
+    video_ids = [video_id for _, video_id in items]
+    if after_video_id is not None:
+        if after_video_id not in video_ids:
+            raise PlaylistItemsError(f"El video {after_video_id} no está en la lista de reproducción")
+        return video_ids.index(after_video_id) + 1
+    if before_video_id is not None:
+        if before_video_id not in video_ids:
+            raise PlaylistItemsError(f"El video {before_video_id} no está en la lista de reproducción")
+        return video_ids.index(before_video_id)
+    return len(items)
+
+
+def apply_operations(db: Session, playlist_id: int, operations: Sequence[Dict]) -> Dict:
+    """
+    Aplicar una lista de operaciones add/remove/move sobre los videos de una
+    playlist. No hace commit: el llamante confirma o deshace todo el lote.
+
+    Args:
+        db: Sesión de base de datos
+        playlist_id: ID de la playlist
+        operations: Diccionarios con op, video_id y opcionalmente
+            after_video_id o before_video_id (por defecto, al final)
+
+    Returns:
+        Diccionario con el número de operaciones aplicadas, las renumeraciones
+        realizadas y el orden final
+
+    Raises:
+        PlaylistItemsError: Si alguna operación no es válida
+    """
+    items = load_items(db, playlist_id)
+    rebalances = 0
+
+    added_ids = {op["video_id"] for op in operations if op["op"] == "add"}
+    if added_ids:
+        existing_videos = set(db.execute(select(Video.id).where(Video.id.in_(added_ids))).scalars())
+        missing = sorted(added_ids - existing_videos)
+        if missing:
+            raise PlaylistItemsError(f"Videos no encontrados: {missing}", status_code=404)
+
+    for number, op in enumerate(operations):
+        kind, video_id = op["op"], op["video_id"]
+        video_ids = [item_video for _, item_video in items]
+
+        if kind == "remove":
+            if video_id not in video_ids:
+                raise PlaylistItemsError(f"Operación {number}: el video {video_id} no está en la lista de reproducción")
+            db.execute(delete(PlaylistVideo).where(
+                PlaylistVideo.playlist_id == playlist_id,
+                PlaylistVideo.video_id == video_id
+            ))
+            del items[video_ids.index(video_id)]
+            continue
+
+        if kind == "add" and video_id in video_ids:
+            raise PlaylistItemsError(f"Operación {number}: el video {video_id} ya está en la lista de reproducción")
+        if kind == "move":
+            if video_id not in video_ids:
+                raise PlaylistItemsError(f"Operación {number}: el video {video_id} no está en la lista de reproducción")
+            if video_id in (op.get("after_video_id"), op.get("before_video_id")):
+                raise PlaylistItemsError(f"Operación {number}: un video no puede moverse respecto a sí mismo")
+            # El hueco se calcula sin el propio video
+            del items[video_ids.index(video_id)]
+
+        try:
+            index = _target_index(items, op.get("after_video_id"), op.get("before_video_id"))
+        except PlaylistItemsError as e:
+            raise PlaylistItemsError(f"Operación {number}: {str(e)}")
+
+        position = _slot(items, index)
+        if position is None:
+            # Sin hueco entre los vecinos: renumerar y volver a calcular
+            ordered = [item_video for _, item_video in items]
+            if kind == "move":
+                # El video movido sigue en la tabla; conserva su sitio hasta el UPDATE de abajo
+                ordered.insert(index, video_id)
+            items = renumber(db, playlist_id, ordered)
+            rebalances += 1
+            if kind == "move":
+                del items[index]
+            position = _slot(items, index)
+
+        if kind == "add":
+            db.execute(insert(PlaylistVideo).values(
+                playlist_id=playlist_id, video_id=video_id, position=position
+            ))
+        else:
+            db.execute(
+                update(PlaylistVideo)
+                .where(PlaylistVideo.playlist_id == playlist_id, PlaylistVideo.video_id == video_id)
+                .values(position=position)
+                .execution_options(synchronize_session=False)
+            )
+        items.insert(index, (position, video_id))
+
+    if rebalances:
+        logger.info(f"Playlist {playlist_id}: {rebalances} renumeración(es) por falta de huecos")
+
+    return {
+        "applied": len(operations),
+        "rebalances": rebalances,
+        "items": [{"video_id": video_id, "position": position} for position, video_id in items],
+    }
+
+
+def next_position(db: Session, playlist_id: int) -> int:
+    """Posición para añadir un video al final de la playlist"""
+    last = db.execute(
+        select(func.max(PlaylistVideo.position)).where(PlaylistVideo.playlist_id == playlist_id)
+    ).scalar()
+    return POSITION_GAP if last is None else last + POSITION_GAP
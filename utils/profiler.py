@@ -0,0 +1,365 @@
+"""
+utils/profiler.py
+Perfilado de peticiones bajo demanda y muestreo de peticiones lentas.
+
+- Perfilado bajo demanda: un administrador añade la cabecera
+  "X-Profile: 1" (o el parámetro ?__profile=1) y la petición se ejecuta con
+  un perfilador por muestreo. Un hilo toma la pila del bucle de eventos y
+  de los hilos del threadpool ocupados cada PROFILER_INTERVAL_MS. El resultado se guarda en PROFILE_DIR en formato
+  speedscope (https://www.speedscope.app) con sus metadatos, y se conservan
+  como mucho PROFILE_RETENTION_COUNT perfiles de PROFILE_MAX_AGE_DAYS días.
+  Con tráfico concurrente el perfil también incluye el trabajo de otras
+  peticiones de este proceso.
+
+- Muestreo de peticiones lentas (siempre activo): un vigilante revisa las
+  peticiones en curso y, cuando una supera SLOW_REQUEST_THRESHOLD_MS, toma
+  una muestra de las pilas y la guarda en memoria (las últimas
+  SLOW_REQUEST_KEEP) además de registrarla en el log.
+"""
+
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', '5'))
+PROFILE_RETENTION_COUNT = int(os.environ.get('PROFILE_RETENTION_COUNT', '50'))
+PROFILE_MAX_AGE_DAYS = int(os.environ.get('PROFILE_MAX_AGE_DAYS', '7'))
+# Una petición perfilada no se muestrea más de este tiempo
+PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', '60'))
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '2000'))
+SLOW_REQUEST_KEEP = int(os.environ.get('SLOW_REQUEST_KEEP', '50'))
+SLOW_REQUEST_CHECK_INTERVAL = float(os.environ.get('SLOW_REQUEST_CHECK_INTERVAL', '0.5'))  # segundos
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "__profile"
+
+# Funciones en las que un hilo está esperando trabajo, no trabajando
+_IDLE_FUNCTIONS = {
+    ('threading.py', 'wait'), ('queue.py', 'get'), ('selectors.py', 'select'),
+    ('threading.py', '_wait_for_tstate_lock'), ('thread.py', '_worker'),
+}
+# Hilos que ejecutan trabajo de las peticiones además del bucle de eventos:
+# threadpool de Starlette (endpoints y dependencias síncronas) y asyncio.to_thread
+_REQUEST_THREAD_PREFIXES = ("AnyIO worker thread", "asyncio_", "ThreadPoolExecutor-")
+_PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+
+def _frame_key(frame) -> tuple:
+    # Una entrada por función (no por línea) para que las muestras se agrupen
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _stack(frame) -> List[tuple]:
+    """Pila de un hilo de la raíz a la hoja"""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _is_idle(stack: List[tuple]) -> bool:
+    if not stack:
+        return True
+    name, filename, _ = stack[-1]
+    return (os.path.basename(filename), name) in _IDLE_FUNCTIONS
+
+
+def format_stacks(thread_ids: Optional[List[int]] = None, limit: int = 40) -> Dict[str, str]:
+    """
+    Pilas actuales de los hilos indicados (por defecto todos los que trabajan)
+
+    Returns:
+        Diccionario nombre del hilo -> pila formateada
+    """
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    result = {}
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == threading.get_ident():
+            continue
+        if thread_ids is not None and thread_id not in thread_ids:
+            continue
+        if thread_ids is None and _is_idle(_stack(frame)):
+            continue
+        result[names.get(thread_id, str(thread_id))] = ''.join(traceback.format_stack(frame, limit=limit))
+    return result
+
+
+class SamplingProfiler:
+    """
+    Toma muestras periódicas de las pilas de los hilos que trabajan
+    """
+
+    def __init__(self, loop_thread_id: int, interval_ms: float = PROFILER_INTERVAL_MS):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval_ms / 1000
+        self.samples: List[List[tuple]] = []
+        self.weights: List[float] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped_at = time.perf_counter()
+
+    def _run(self):
+        deadline = self.started_at + PROFILER_MAX_SECONDS
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            workers = {thread.ident for thread in threading.enumerate()
+                       if thread.name.startswith(_REQUEST_THREAD_PREFIXES)}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != self.loop_thread_id and thread_id not in workers:
+                    continue
+                stack = _stack(frame)
+                if thread_id == self.loop_thread_id:
+                    # El bucle esperando E/S también es parte del tiempo de la petición
+                    if _is_idle(stack):
+                        stack = [("[bucle de eventos en espera]", "", 0)]
+                elif _is_idle(stack):
+                    continue
+                self.samples.append(stack)
+                self.weights.append(elapsed)
+
+    def speedscope(self, name: str) -> Dict:
+        """Perfil en el formato "sampled" de speedscope"""
+        frames, index = [], {}
+        samples = []
+        for stack in self.samples:
+            sample = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frame_name, filename, line = key
+                    frames.append({"name": frame_name, "file": filename, "line": line})
+                sample.append(index[key])
+            samples.append(sample)
+        total = sum(self.weights)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": self.weights,
+            }],
+            "name": name,
+            "exporter": "raspberry-video-manager",
+        }
+
+    def top_functions(self, limit: int = 25) -> List[Dict]:
+        """Funciones con más tiempo propio (hoja de la pila) y acumulado"""
+        own, cumulative = {}, {}
+        for stack, weight in zip(self.samples, self.weights):
+            if stack:
+                own[stack[-1]] = own.get(stack[-1], 0.0) + weight
+            for key in set(stack):
+                cumulative[key] = cumulative.get(key, 0.0) + weight
+        rows = [
+            {"function": key[0], "file": key[1], "line": key[2],
+             "own_ms": round(own.get(key, 0.0) * 1000, 1), "cumulative_ms": round(value * 1000, 1)}
+            for key, value in cumulative.items()
+        ]
+        rows.sort(key=lambda row: (row["own_ms"], row["cumulative_ms"]), reverse=True)
+        return rows[:limit]
+
+
+class ProfileStore:
+    """
+    Perfiles guardados en disco: <id>.speedscope.json y <id>.meta.json
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, suffix: str) -> str:
+        if not _PROFILE_ID.match(profile_id):
+            raise ValueError("Identificador de perfil no válido")
+        return os.path.join(self.directory, f"{profile_id}.{suffix}.json")
+
+    def save(self, profiler: SamplingProfiler, metadata: Dict) -> str:
+        """
+        Guardar un perfil y aplicar la retención
+
+        Returns:
+            Identificador del perfil
+        """
+        profile_id = datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        name = f"{metadata.get('method', '')} {metadata.get('path', '')}".strip()
+        metadata = dict(metadata, id=profile_id, samples=len(profiler.samples),
+                        sampled_ms=round(sum(profiler.weights) * 1000, 1),
+                        top_functions=profiler.top_functions())
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile_id, "speedscope"), "w") as f:
+                json.dump(profiler.speedscope(name), f)
+            with open(self._path(profile_id, "meta"), "w") as f:
+                json.dump(metadata, f, default=str)
+            self._prune()
+        return profile_id
+
+    def _prune(self):
+        profiles = self._list_ids()
+        cutoff = (datetime.now() - timedelta(days=PROFILE_MAX_AGE_DAYS)).strftime("%Y%m%d-%H%M%S")
+        keep = set(profiles[:PROFILE_RETENTION_COUNT])
+        for profile_id in profiles:
+            if profile_id in keep and profile_id >= cutoff:
+                continue
+            for suffix in ("speedscope", "meta"):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _list_ids(self) -> List[str]:
+        """Identificadores de los perfiles, del más reciente al más antiguo"""
+        if not os.path.isdir(self.directory):
+            return []
+        ids = {name.split('.', 1)[0] for name in os.listdir(self.directory) if name.endswith('.meta.json')}
+        return sorted((profile_id for profile_id in ids if _PROFILE_ID.match(profile_id)), reverse=True)
+
+    def list(self) -> List[Dict]:
+        """Metadatos de los perfiles guardados (sin la tabla de funciones)"""
+        result = []
+        for profile_id in self._list_ids():
+            metadata = self.metadata(profile_id)
+            if metadata:
+                metadata.pop("top_functions", None)
+                result.append(metadata)
+        return result
+
+    def metadata(self, profile_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(profile_id, "meta")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def profile_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, "speedscope")
+        return path if os.path.exists(path) else None
+
+    def delete(self, profile_id: str) -> bool:
+        removed = False
+        with self._lock:
+            for suffix in ("speedscope", "meta"):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                    removed = True
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class SlowRequestSampler:
+    """
+    Vigila las peticiones en curso y toma una muestra de las pilas de las
+    que superan el umbral
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS, keep: int = SLOW_REQUEST_KEEP):
+        self.threshold = threshold_ms / 1000
+        self.samples = deque(maxlen=keep)
+        self._requests: Dict[int, Dict] = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.loop_thread_id: Optional[int] = None
+
+    def begin(self, label: str) -> int:
+        """Registrar el inicio de una petición (desde el bucle de eventos)"""
+        token = next(self._tokens)
+        with self._lock:
+            self.loop_thread_id = threading.get_ident()
+            self._requests[token] = {"label": label, "started": time.perf_counter(),
+                                     "at": datetime.now(), "sampled": False}
+        self._ensure_running()
+        return token
+
+    def end(self, token: int):
+        with self._lock:
+            self._requests.pop(token, None)
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name="slow-request-sampler", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(min(SLOW_REQUEST_CHECK_INTERVAL, self.threshold / 4))
+            now = time.perf_counter()
+            with self._lock:
+                slow = [request for request in self._requests.values()
+                        if not request["sampled"] and now - request["started"] >= self.threshold]
+                for request in slow:
+                    request["sampled"] = True
+            if slow:
+                self._sample(slow, now)
+
+    def _sample(self, requests: List[Dict], now: float):
+        stacks = format_stacks()
+        if self.loop_thread_id:
+            # El hilo del bucle se incluye aunque esté esperando E/S
+            stacks.update(format_stacks([self.loop_thread_id]))
+        for request in requests:
+            elapsed_ms = round((now - request["started"]) * 1000, 1)
+            self.samples.appendleft({
+                "request": request["label"],
+                "started_at": request["at"].isoformat(),
+                "elapsed_ms": elapsed_ms,
+                "sampled_at": datetime.now().isoformat(),
+                "stacks": stacks,
+            })
+            logger.warning(
+                f"Petición lenta: {request['label']} lleva {elapsed_ms:.0f} ms; pilas de los hilos activos:\n"
+                + "\n".join(f"--- {name}\n{stack}" for name, stack in stacks.items())
+            )
+
+    def recent(self) -> List[Dict]:
+        return list(self.samples)
+
+
+# Instancias globales
+profile_store = ProfileStore()
+slow_request_sampler = SlowRequestSampler()
+
+
+def profiling_requested(request) -> bool:
+    """La petición pide ser perfilada (cabecera X-Profile o ?__profile=1)"""
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_PARAM)
+    return flag is not None and flag.lower() in ('1', 'true', 'yes')
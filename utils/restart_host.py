@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 
 from models import models
 from models.database import SessionLocal
+from utils.metrics import ssh_connect
 
 logging.basicConfig(
     level=logging.INFO,
@@ -82,10 +83,10 @@ async def validate_ssh_credentials(device_id):
                 # Intentar conectar con clave SSH primero
                 if os.path.exists(SSH_KEY_PATH):
                     key = paramiko.RSAKey.from_private_key_file(SSH_KEY_PATH)
-                    ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=5)
+                    ssh_connect(ssh, "validate", ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=5)
                 else:
                     # Si no hay clave, usar contraseña
-                    ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=5)
+                    ssh_connect(ssh, "validate", ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=5)
                 
                 # Si llegamos aquí, la conexión fue exitosa
                 logger.info(f"Conexión SSH exitosa a {connection_type} ({ip_address})")
@@ -159,9 +160,9 @@ async def restart_host(device_id):
         try:
             if os.path.exists(SSH_KEY_PATH):
                 key = paramiko.RSAKey.from_private_key_file(SSH_KEY_PATH)
-                ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=10)
+                ssh_connect(ssh, "restart", ip_address, port=SSH_PORT, username=SSH_USER, pkey=key, timeout=10)
             else:
-                ssh.connect(ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=10)
+                ssh_connect(ssh, "restart", ip_address, port=SSH_PORT, username=SSH_USER, password=SSH_PASSWORD, timeout=10)
 
             # Reinicia el dispositivo
             stdin, stdout, stderr = ssh.exec_command('sudo reboot')
@@ -0,0 +1,45 @@
+"""
+utils/schema_indexes.py
+Creación de los índices que create_all no añade a las tablas existentes
+(índices de los modelos e índices de trigramas de la búsqueda).
+
+Construir un índice sobre una tabla con datos lleva tiempo, así que no se
+hace al importar la aplicación en cada worker sino una sola vez, desde el
+proceso que tenga el liderazgo de la tarea. Las sentencias son idempotentes
+(IF NOT EXISTS): si el líder cambia, el nuevo solo comprueba que existen.
+"""
+
+import asyncio
+import logging
+
+from models.database import ensure_indexes
+from utils.leader_election import run_singleton_job
+from utils.search import ensure_search_indexes
+
+logger = logging.getLogger(__name__)
+
+
+async def build_schema_indexes():
+    """Crea los índices que falten y conserva el liderazgo para no repetirlo"""
+    try:
+        await asyncio.to_thread(ensure_indexes)
+        logger.info("Índices de los modelos comprobados")
+    except Exception as e:
+        logger.error(f"Error al crear los índices de los modelos: {str(e)}")
+    try:
+        await asyncio.to_thread(ensure_search_indexes)
+    except Exception as e:
+        logger.error(f"Error al crear los índices de búsqueda: {str(e)}")
+
+    # Sin nada más que hacer: mantener el candado para que otro proceso no lo repita
+    await asyncio.Event().wait()
+
+
+def start_schema_index_builder(app):
+    """
+    Crea en segundo plano los índices que falten (solo en el proceso líder)
+
+    Args:
+        app: Instancia de FastAPI
+    """
+    run_singleton_job(app, "schema_indexes", build_schema_indexes)
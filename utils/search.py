@@ -0,0 +1,271 @@
+"""
+utils/search.py
+Búsqueda por subcadena indexada sobre dispositivos, listas y videos.
+
+Un ILIKE '%texto%' no puede usar un índice B-tree. En PostgreSQL se crean
+índices GIN de trigramas (pg_trgm), que sí sirven para esos ILIKE; en
+SQLite (desarrollo y pruebas locales) se mantienen tablas FTS5 con el
+tokenizador trigram sincronizadas por triggers con las tablas originales.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlalchemy.orm import Session
+
+from models.database import engine
+from models.models import Device, Playlist, Video
+
+logger = logging.getLogger(__name__)
+
+# Longitud mínima del texto para poder usar los índices de trigramas
+MIN_INDEXED_LENGTH = 3
+
+# Entidades buscables: tabla, modelo y columnas de texto indexadas
+SEARCH_ENTITIES = {
+    'device': {
+        'table': 'devices',
+        'model': Device,
+        'columns': ['device_id', 'name', 'location', 'tienda', 'model', 'ip_address_lan', 'ip_address_wifi'],
+    },
+    'playlist': {
+        'table': 'playlists',
+        'model': Playlist,
+        'columns': ['title', 'description'],
+    },
+    'video': {
+        'table': 'videos',
+        'model': Video,
+        'columns': ['title', 'description'],
+    },
+}
+
+
+# Campos de búsqueda de dispositivos del formulario (search_field) -> columnas
+DEVICE_SEARCH_FIELDS = {
+    'name': ['name'],
+    'location': ['location'],
+    'tienda': ['tienda'],
+    'model': ['model'],
+    'ip': ['ip_address_lan', 'ip_address_wifi'],
+}
+
+
+def _fts_table(entity: str) -> str:
+    return f"{SEARCH_ENTITIES[entity]['table']}_search"
+
+
+def _postgresql_index_statements() -> List[str]:
+    # CONCURRENTLY: construir el índice sin bloquear las escrituras en la tabla
+    statements = []
+    for spec in SEARCH_ENTITIES.values():
+        for column_name in spec['columns']:
+            statements.append(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{spec['table']}_{column_name}_trgm "
+                f"ON {spec['table']} USING GIN ({column_name} gin_trgm_ops)"
+            )
+    return statements
+
+
+def _sqlite_scripts() -> List[str]:
+    statements = []
+    for entity, spec in SEARCH_ENTITIES.items():
+        table, fts, columns = spec['table'], _fts_table(entity), spec['columns']
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column_name}' for column_name in columns)
+        old_values = ', '.join(f'old.{column_name}' for column_name in columns)
+        statements += [
+            f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {column_list},
+                content = '{table}',
+                content_rowid = 'id',
+                tokenize = 'trigram'
+            )
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+            ''',
+        ]
+    return statements
+
+
+def _dialect(db_engine=None) -> str:
+    return (db_engine or engine).dialect.name
+
+
+def ensure_search_indexes(db_engine=None):
+    """
+    Crea los índices de trigramas de PostgreSQL que falten
+
+    Construirlos sobre tablas con datos lleva tiempo: cada índice se crea con
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS en su propia sentencia y en
+    autocommit (CONCURRENTLY no admite transacciones), y la función se
+    ejecuta una sola vez desde el proceso líder (utils/schema_indexes.py).
+    """
+    db_engine = db_engine or engine
+    if _dialect(db_engine) != 'postgresql':
+        return
+
+    with db_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        except Exception as e:
+            # Crear la extensión requiere permisos; sin ella la búsqueda funciona sin índice
+            logger.warning(f"No se pudieron crear los índices de trigramas: {str(e)}")
+            return
+        for statement in _postgresql_index_statements():
+            try:
+                conn.execute(text(statement))
+            except Exception as e:
+                logger.warning(f"No se pudo crear un índice de trigramas ({statement}): {str(e)}")
+
+
+def ensure_search_tables(db_engine=None):
+    """
+    Crea las tablas FTS5 y sus triggers en SQLite si no existen (y rellena las
+    tablas nuevas). Las búsquedas las necesitan, así que se crean al arrancar;
+    SQLite serializa las transacciones de escritura de los distintos workers.
+    """
+    db_engine = db_engine or engine
+    dialect = _dialect(db_engine)
+    if dialect == 'postgresql':
+        return
+    if dialect != 'sqlite':
+        logger.info(f"Sin índices de búsqueda para el dialecto {dialect}")
+        return
+
+    with db_engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        }
+        for statement in _sqlite_scripts():
+            conn.execute(text(statement))
+        for entity in SEARCH_ENTITIES:
+            fts = _fts_table(entity)
+            if fts not in existing:
+                # Tabla recién creada: indexar las filas que ya existían
+                conn.execute(text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"))
+
+
+def _fts_query(term: str, columns: Optional[Iterable[str]] = None) -> str:
+    phrase = '"' + term.replace('"', '""') + '"'
+    if columns:
+        return '{' + ' '.join(columns) + '} : ' + phrase
+    return phrase
+
+
+def _uses_fts(db: Session, term: str) -> bool:
+    return _dialect(db.get_bind()) == 'sqlite' and len(term) >= MIN_INDEXED_LENGTH
+
+
+def search_filter(db: Session, entity: str, term: str, columns: Optional[Iterable[str]] = None):
+    """
+    Condición SQL "alguna de las columnas contiene el texto" que aprovecha
+    los índices de búsqueda del motor
+
+    Args:
+        db: Sesión de base de datos
+        entity: device, playlist o video
+        term: Texto a buscar
+        columns: Columnas en las que buscar (por defecto todas las indexadas)
+
+    Returns:
+        Expresión para usar en query.filter()
+    """
+    spec = SEARCH_ENTITIES[entity]
+    model = spec['model']
+    columns = list(columns or spec['columns'])
+    term = term.strip()
+
+    if _uses_fts(db, term):
+        fts = _fts_table(entity)
+        matches = text(f"SELECT rowid FROM {fts} WHERE {fts} MATCH :fts_{entity}").bindparams(
+            **{f"fts_{entity}": _fts_query(term, columns)}
+        )
+        return model.id.in_(matches)
+
+    # PostgreSQL usa los índices GIN de trigramas para estos ILIKE
+    pattern = f"%{term}%"
+    return or_(*[getattr(model, column_name).ilike(pattern) for column_name in columns])
+
+
+def _describe(entity: str, row) -> Dict:
+    if entity == 'device':
+        subtitle = " · ".join(part for part in (row.tienda, row.location, row.ip_address_lan or row.ip_address_wifi) if part)
+        return {"id": row.id, "key": row.device_id, "title": row.name, "subtitle": subtitle,
+                "url": f"/ui/devices/{row.device_id}"}
+    if entity == 'playlist':
+        return {"id": row.id, "key": str(row.id), "title": row.title, "subtitle": row.description,
+                "url": f"/ui/playlists/{row.id}"}
+    return {"id": row.id, "key": str(row.id), "title": row.title, "subtitle": row.description,
+            "url": f"/api/videos/{row.id}"}
+
+
+def search_entity(db: Session, entity: str, term: str, limit: int = 20) -> List[Dict]:
+    """
+    Buscar un texto en una entidad y devolver los resultados ordenados por relevancia
+
+    Args:
+        db: Sesión de base de datos
+        entity: device, playlist o video
+        term: Texto a buscar
+        limit: Número máximo de resultados
+
+    Returns:
+        Lista de resultados con tipo, id, título, subtítulo, url y puntuación
+    """
+    spec = SEARCH_ENTITIES[entity]
+    model = spec['model']
+    term = term.strip()
+    dialect = _dialect(db.get_bind())
+
+    if _uses_fts(db, term):
+        fts = _fts_table(entity)
+        fts_table = table(fts, column('rowid'))
+        # bm25 devuelve valores menores cuanto más relevante es la fila
+        rank = literal_column(f"-bm25({fts})")
+        query = db.query(model, rank.label("rank")).join(
+            fts_table, fts_table.c.rowid == model.id
+        ).filter(text(f"{fts} MATCH :fts_query").bindparams(fts_query=_fts_query(term)))
+    elif dialect == 'postgresql':
+        rank = func.greatest(*[
+            func.word_similarity(term, func.coalesce(getattr(model, column_name), '')) for column_name in spec['columns']
+        ])
+        query = db.query(model, rank.label("rank")).filter(search_filter(db, entity, term))
+    else:
+        query = db.query(model, literal_column("0").label("rank")).filter(search_filter(db, entity, term))
+
+    rows = query.order_by(literal_column("rank").desc(), model.id).limit(limit).all()
+
+    results = []
+    for row, score in rows:
+        result = {"type": entity, "rank": float(score or 0)}
+        result.update(_describe(entity, row))
+        results.append(result)
+    return results
+
+
+def search_all(db: Session, term: str, types: Optional[Iterable[str]] = None, limit: int = 20) -> Dict[str, List[Dict]]:
+    """
+    Búsqueda unificada sobre varias entidades
+
+    Returns:
+        Diccionario tipo -> lista de resultados ordenados por relevancia
+    """
+    types = list(types or SEARCH_ENTITIES)
+    return {entity: search_entity(db, entity, term, limit) for entity in types}
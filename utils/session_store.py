@@ -0,0 +1,311 @@
+"""
+utils/session_store.py
+Sesiones de usuario persistentes en la tabla sessions, compartidas por
+todos los workers y nodos y conservadas entre despliegues.
+
+- Las lecturas (get) pasan por una caché TTL de cada proceso, así que una
+  sesión conocida se resuelve sin ir a la base de datos.
+- last_seen no se escribe en cada petición: touch() lo anota en memoria y
+  una tarea de cada proceso lo escribe por lotes cada SESSION_FLUSH_INTERVAL
+  segundos.
+- Las sesiones caducadas se borran en bloque desde el proceso líder.
+- La validación del token en el middleware no depende de esta tabla
+  (utils/session_tokens.py); de aquí se refresca su lista de revocaciones.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal
+from models.models import User, UserSession
+from utils.leader_election import run_singleton_job
+from utils.session_tokens import (
+    SESSION_REVOCATION_REFRESH_INTERVAL, SESSION_TTL_SECONDS, issue_session_token, new_session_id, revocations
+)
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '30'))  # segundos
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+SESSION_LAST_SEEN_RESOLUTION = float(os.environ.get('SESSION_LAST_SEEN_RESOLUTION', '60'))  # segundos
+SESSION_FLUSH_INTERVAL = float(os.environ.get('SESSION_FLUSH_INTERVAL', '10'))  # segundos
+SESSION_PURGE_INTERVAL = int(os.environ.get('SESSION_PURGE_INTERVAL', '3600'))  # segundos
+
+
+def session_to_dict(row: UserSession) -> Dict:
+    return {
+        "session_id": row.session_id,
+        "user_id": row.user_id,
+        "username": row.username,
+        "is_admin": row.is_admin,
+        "auth_provider": row.auth_provider,
+        "created_at": row.created_at,
+        "expires_at": row.expires_at,
+        "last_seen": row.last_seen,
+    }
+
+
+class SessionCache:
+    """
+    Caché LRU con TTL: session_id -> (guardado en, sesión o None).
+    También guarda las búsquedas sin resultado, para que un token de una
+    sesión borrada no vaya a la base de datos en cada petición.
+    """
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> Tuple[bool, Optional[Dict]]:
+        """(encontrada en caché, sesión)"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, session_id: str, session: Optional[Dict]):
+        with self._lock:
+            self._entries[session_id] = (time.monotonic(), session)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SessionStore:
+    """Sesiones en base de datos con caché local y last_seen diferido"""
+
+    def __init__(self):
+        self.cache = SessionCache()
+        self._pending_last_seen: Dict[str, datetime] = {}
+        self._last_touch: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, db: Session, user: User, ttl_seconds: int = SESSION_TTL_SECONDS) -> Tuple[str, Dict]:
+        """
+        Crear una sesión para el usuario
+
+        Returns:
+            (token firmado, datos de la sesión)
+        """
+        now = datetime.now()
+        expires_at = int(time.time()) + ttl_seconds
+        row = UserSession(
+            session_id=new_session_id(),
+            user_id=user.id,
+            username=user.username,
+            is_admin=bool(user.is_admin),
+            auth_provider=user.auth_provider,
+            created_at=now,
+            expires_at=datetime.fromtimestamp(expires_at),
+            last_seen=now
+        )
+        db.add(row)
+        db.commit()
+        session = session_to_dict(row)
+        self.cache.put(row.session_id, session)
+        return issue_session_token(user.id, user.is_admin, row.session_id, expires_at), session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Sesión vigente (no revocada ni caducada), o None"""
+        found, session = self.cache.get(session_id)
+        if not found:
+            db = SessionLocal()
+            try:
+                row = db.execute(
+                    select(UserSession).where(UserSession.session_id == session_id, UserSession.revoked_at.is_(None))
+                ).scalar_one_or_none()
+                session = session_to_dict(row) if row is not None else None
+            finally:
+                db.close()
+            self.cache.put(session_id, session)
+        if session is None or session["expires_at"] <= datetime.now() or session_id in revocations:
+            return None
+        return session
+
+    def touch(self, session_id: str):
+        """Anotar actividad de la sesión; se escribe en el siguiente flush"""
+        now = time.monotonic()
+        if now - self._last_touch.get(session_id, float('-inf')) < SESSION_LAST_SEEN_RESOLUTION:
+            return
+        with self._lock:
+            self._last_touch[session_id] = now
+            self._pending_last_seen[session_id] = datetime.now()
+
+    def flush_last_seen(self) -> int:
+        """
+        Escribir los last_seen pendientes en una sola sentencia por lotes
+
+        Returns:
+            Sesiones actualizadas
+        """
+        with self._lock:
+            pending, self._pending_last_seen = self._pending_last_seen, {}
+            # Olvidar las marcas antiguas para que el diccionario no crezca sin límite
+            horizon = time.monotonic() - SESSION_LAST_SEEN_RESOLUTION
+            self._last_touch = {key: value for key, value in self._last_touch.items() if value > horizon}
+        if not pending:
+            return 0
+        table = UserSession.__table__
+        # UPDATE de Core con executemany: sin comprobación de filas afectadas, así una
+        # sesión borrada (p. ej. por el borrado de su usuario) no hace fallar el lote
+        statement = (
+            update(table)
+            .where(table.c.session_id == bindparam("target_session_id"))
+            .values(last_seen=bindparam("target_last_seen"))
+        )
+        db = SessionLocal()
+        try:
+            db.connection().execute(statement, [
+                {"target_session_id": session_id, "target_last_seen": last_seen}
+                for session_id, last_seen in pending.items()
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Devolver los pendientes para el siguiente flush, sin pisar actividad más reciente
+            with self._lock:
+                for session_id, last_seen in pending.items():
+                    self._pending_last_seen.setdefault(session_id, last_seen)
+            raise
+        finally:
+            db.close()
+        return len(pending)
+
+    def revoke(self, db: Session, session_id: str, expires_at: int) -> bool:
+        """
+        Revocar una sesión (logout). Se aplica en este proceso al momento y
+        en los demás en el siguiente refresco de revocaciones.
+
+        Returns:
+            True si la sesión existía y no estaba revocada
+        """
+        revocations.add(session_id, expires_at)
+        self.cache.invalidate(session_id)
+        result = db.execute(
+            update(UserSession)
+            .where(UserSession.session_id == session_id, UserSession.revoked_at.is_(None))
+            .values(revoked_at=datetime.now())
+        )
+        db.commit()
+        return result.rowcount > 0
+
+    def purge_expired(self) -> int:
+        """
+        Borrar en bloque las sesiones caducadas (también las revocadas)
+
+        Returns:
+            Filas eliminadas
+        """
+        db = SessionLocal()
+        try:
+            result = db.execute(delete(UserSession).where(UserSession.expires_at <= datetime.now()))
+            db.commit()
+            if result.rowcount:
+                logger.info(f"Eliminadas {result.rowcount} sesiones caducadas")
+            return result.rowcount
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        return {
+            "cache_entries": len(self.cache._entries),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "pending_last_seen": len(self._pending_last_seen),
+            "revocations": len(revocations),
+        }
+
+
+# Instancia global
+session_store = SessionStore()
+
+
+def refresh_revocations() -> int:
+    db = SessionLocal()
+    try:
+        return revocations.refresh(db)
+    finally:
+        db.close()
+
+
+async def periodic_revocation_refresh():
+    """Tarea de cada proceso que mantiene al día su lista de revocaciones"""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_revocations)
+        except Exception as e:
+            logger.error(f"Error al refrescar las revocaciones de sesión: {str(e)}")
+        await asyncio.sleep(SESSION_REVOCATION_REFRESH_INTERVAL)
+
+
+async def periodic_last_seen_flush():
+    """Tarea de cada proceso que escribe los last_seen pendientes"""
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(session_store.flush_last_seen)
+        except Exception as e:
+            logger.error(f"Error al guardar la actividad de las sesiones: {str(e)}")
+
+
+async def periodic_session_purge():
+    while True:
+        try:
+            await asyncio.to_thread(session_store.purge_expired)
+        except Exception as e:
+            logger.error(f"Error al limpiar las sesiones caducadas: {str(e)}")
+        await asyncio.sleep(SESSION_PURGE_INTERVAL)
+
+
+def start_session_store(app):
+    """
+    Inicia en este proceso el refresco de revocaciones y la escritura
+    diferida de last_seen, y la limpieza de sesiones caducadas (solo en el
+    proceso líder)
+
+    Args:
+        app: Instancia de FastAPI
+    """
+    tasks = []
+
+    @app.on_event("startup")
+    async def start_session_tasks():
+        tasks.append(asyncio.create_task(periodic_revocation_refresh()))
+        tasks.append(asyncio.create_task(periodic_last_seen_flush()))
+
+    @app.on_event("shutdown")
+    async def stop_session_tasks():
+        for task in tasks:
+            task.cancel()
+        tasks.clear()
+        try:
+            await asyncio.to_thread(session_store.flush_last_seen)
+        except Exception as e:
+            logger.error(f"Error al guardar la actividad de las sesiones: {str(e)}")
+
+    run_singleton_job(app, "session_purge", periodic_session_purge)
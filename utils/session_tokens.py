@@ -0,0 +1,180 @@
+"""
+utils/session_tokens.py
+Tokens de sesión firmados con HMAC-SHA256.
+
+El token lleva el id del usuario, si es administrador, la caducidad y un
+identificador de sesión (jti):
+
+    v1.<user_id>.<admin 0|1>.<caducidad epoch>.<jti>.<firma base64url>
+
+Se valida sin consultar la base de datos ni memoria compartida: basta con
+la clave SESSION_SECRET_KEY, que debe ser la misma en todos los workers y
+nodos. Los logouts marcan la sesión como revocada en la tabla sessions;
+cada proceso mantiene en memoria las revocaciones vigentes y las refresca
+periódicamente (utils/session_store.py), así que una revocación tarda como
+mucho SESSION_REVOCATION_REFRESH_INTERVAL segundos en llegar a los demás
+procesos.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import UserSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_SECRET_KEY = os.environ.get('SESSION_SECRET_KEY', '')
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', '86400'))  # 24 horas
+SESSION_REVOCATION_REFRESH_INTERVAL = float(os.environ.get('SESSION_REVOCATION_REFRESH_INTERVAL', '15'))  # segundos
+SESSION_REVOCATION_CACHE_SIZE = int(os.environ.get('SESSION_REVOCATION_CACHE_SIZE', '100000'))
+# Margen mínimo para revocaciones confirmadas tarde o escritas con el reloj de otro nodo atrasado
+SESSION_REVOCATION_OVERLAP = float(os.environ.get('SESSION_REVOCATION_OVERLAP', '60'))  # segundos
+
+if not SESSION_SECRET_KEY:
+    logger.warning("SESSION_SECRET_KEY no está definido en las variables de entorno. Se usará una clave aleatoria: "
+                   "las sesiones no servirán en otros workers ni sobrevivirán a un reinicio.")
+    SESSION_SECRET_KEY = secrets.token_urlsafe(32)
+
+TOKEN_VERSION = "v1"
+
+
+class SessionClaims(NamedTuple):
+    """Contenido de un token de sesión válido"""
+    user_id: int
+    is_admin: bool
+    expires_at: int  # epoch en segundos
+    session_id: str  # jti
+
+
+def _signature(key: bytes, payload: str) -> str:
+    digest = hmac.new(key, payload.encode('ascii'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+class RevocationList:
+    """
+    Sesiones revocadas aún no caducadas: jti -> caducidad (epoch).
+    LRU acotada; si se llena se descartan primero las revocaciones más antiguas,
+    que son las que antes caducan.
+    """
+
+    def __init__(self, max_entries: int = SESSION_REVOCATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._since: Optional[datetime] = None  # revoked_at más reciente ya cargado
+
+    def __contains__(self, session_id: str) -> bool:
+        # Lectura sin candado: una búsqueda en un dict es atómica
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, session_id: str, expires_at: int):
+        with self._lock:
+            self._entries[session_id] = expires_at
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                dropped, _ = self._entries.popitem(last=False)
+                logger.warning(f"Lista de revocaciones llena ({self.max_entries}); se descarta {dropped[:8]}...")
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Quitar las revocaciones de tokens ya caducados"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            expired = [session_id for session_id, expires_at in self._entries.items() if expires_at <= now]
+            for session_id in expired:
+                del self._entries[session_id]
+        return len(expired)
+
+    def refresh(self, db: Session) -> int:
+        """
+        Cargar las revocaciones nuevas de la base de datos
+
+        Returns:
+            Número de filas leídas
+        """
+        statement = select(UserSession.session_id, UserSession.expires_at, UserSession.revoked_at)
+        if self._since is None:
+            statement = statement.where(UserSession.revoked_at.isnot(None), UserSession.expires_at > datetime.now())
+        else:
+            # revoked_at lo pone el reloj de cada proceso y se confirma más tarde: se vuelve
+            # a leer una ventana anterior para no perder revocaciones con marca más antigua
+            # (add es idempotente)
+            overlap = timedelta(seconds=max(SESSION_REVOCATION_REFRESH_INTERVAL * 2, SESSION_REVOCATION_OVERLAP))
+            statement = statement.where(UserSession.revoked_at >= self._since - overlap)
+        rows = db.execute(statement).all()
+        for session_id, expires_at, revoked_at in rows:
+            self.add(session_id, int(expires_at.timestamp()))
+            if self._since is None or revoked_at > self._since:
+                self._since = revoked_at
+        if self._since is None:
+            self._since = datetime.now()
+        self.prune()
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._since = None
+
+
+# Instancia global
+revocations = RevocationList()
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(12)
+
+
+def issue_session_token(user_id: int, is_admin: bool, session_id: str, expires_at: int) -> str:
+    """
+    Crear un token de sesión firmado
+
+    Args:
+        user_id: Id del usuario
+        is_admin: Si el usuario es administrador
+        session_id: Identificador de la sesión (new_session_id())
+        expires_at: Caducidad (epoch en segundos)
+
+    Returns:
+        Token para la cookie "session"
+    """
+    payload = f"{TOKEN_VERSION}.{int(user_id)}.{int(bool(is_admin))}.{int(expires_at)}.{session_id}"
+    return f"{payload}.{_signature(SESSION_SECRET_KEY.encode('utf-8'), payload)}"
+
+
+def verify_session_token(token: Optional[str]) -> Optional[SessionClaims]:
+    """
+    Validar un token de sesión: firma (en tiempo constante), caducidad y revocación
+
+    Returns:
+        Contenido del token, o None si no es válido
+    """
+    # Solo ASCII: compare_digest y la firma fallarían con otros caracteres (cookie basura)
+    if not token or len(token) > 256 or not token.isascii():
+        return None
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature, _signature(SESSION_SECRET_KEY.encode('utf-8'), payload)):
+        return None
+    try:
+        version, user_id, is_admin, expires_at, session_id = payload.split(".")
+        claims = SessionClaims(int(user_id), is_admin == "1", int(expires_at), session_id)
+    except ValueError:
+        return None
+    if version != TOKEN_VERSION or claims.expires_at <= time.time() or claims.session_id in revocations:
+        return None
+    return claims
@@ -0,0 +1,154 @@
+"""
+utils/sql_accounting.py
+Contabilidad de las sentencias SQL de cada petición.
+
+Los eventos before_cursor_execute/after_cursor_execute de los motores
+cuentan las sentencias y el tiempo en la base de datos de la petición en
+curso (una ContextVar que fija el middleware). Las sentencias se agrupan
+por huella normalizada (sin literales ni listas IN), así un bucle que
+lanza la misma consulta por cada fila (N+1) se detecta al terminar la
+petición.
+
+En modo estricto (SQL_STRICT_MODE=true, pensado para pruebas) la petición
+falla con RepeatedQueryError en lugar de registrar solo un aviso.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Repeticiones de una misma sentencia en una petición a partir de las que se avisa
+SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', '10'))
+# Fallar la petición en lugar de avisar (pruebas)
+SQL_STRICT_MODE = os.environ.get('SQL_STRICT_MODE', 'false').lower() in ('1', 'true', 'yes')
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                              # cadenas
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),                           # números
+    (re.compile(r"%\(\w+\)s|:\w+|\$\d+|%s"), "?"),                     # parámetros con nombre/posición
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),                # listas IN (?, ?, ...)
+    (re.compile(r"\(\s*__\[POSTCOMPILE_\w+\]\s*\)"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Huella de una sentencia: la misma consulta con otros parámetros da la misma huella
+
+    Args:
+        statement: Texto SQL
+
+    Returns:
+        Sentencia normalizada
+    """
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class RepeatedQueryError(RuntimeError):
+    """Una petición repitió la misma sentencia más veces de lo permitido (N+1)"""
+
+    def __init__(self, label: str, repeated: List[Dict], threshold: int):
+        self.label = label
+        self.repeated = repeated
+        worst = repeated[0]
+        super().__init__(
+            f"{label}: sentencia repetida {worst['count']} veces (máximo {threshold}): {worst['statement']}"
+        )
+
+
+class SqlStats:
+    """Sentencias y tiempo en la base de datos de una petición"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.statements = 0
+        self.duration = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.duration += elapsed
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int = None) -> List[Dict]:
+        """Sentencias que se repiten más de threshold veces, de más a menos"""
+        threshold = SQL_REPEAT_THRESHOLD if threshold is None else threshold
+        return [
+            {"statement": statement, "count": count}
+            for statement, count in self.fingerprints.most_common()
+            if count > threshold
+        ]
+
+    def server_timing(self) -> str:
+        """Valor de la cabecera Server-Timing"""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.statements} queries"'
+
+
+current_sql_stats: ContextVar[Optional[SqlStats]] = ContextVar('current_sql_stats', default=None)
+
+
+@contextmanager
+def track_sql(label: str, strict: Optional[bool] = None, threshold: Optional[int] = None):
+    """
+    Contabilizar las sentencias ejecutadas dentro del bloque
+
+    Al salir avisa (o, en modo estricto, lanza RepeatedQueryError) si alguna
+    sentencia se repitió más de threshold veces.
+
+    Args:
+        label: Identificador en los avisos (p. ej. "GET /api/playlists/")
+        strict: Lanzar una excepción en lugar de avisar (por defecto SQL_STRICT_MODE)
+        threshold: Repeticiones permitidas (por defecto SQL_REPEAT_THRESHOLD)
+
+    Yields:
+        SqlStats de la petición
+    """
+    stats = SqlStats(label)
+    token = current_sql_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_sql_stats.reset(token)
+
+    threshold = SQL_REPEAT_THRESHOLD if threshold is None else threshold
+    repeated = stats.repeated(threshold)
+    if repeated:
+        if SQL_STRICT_MODE if strict is None else strict:
+            raise RepeatedQueryError(label, repeated, threshold)
+        logger.warning(
+            f"Posible N+1 en {label}: {stats.statements} sentencias; repetidas: "
+            + "; ".join(f"{entry['count']}x {entry['statement'][:200]}" for entry in repeated[:3])
+        )
+
+
+def instrument_sql(engine):
+    """
+    Registrar los eventos de ejecución de un motor
+
+    Args:
+        engine: Motor síncrono (para un AsyncEngine, su sync_engine)
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and current_sql_stats.get() is not None:
+            context._sql_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_sql_stats.get()
+        started = getattr(context, '_sql_started', None)
+        if stats is None or started is None:
+            return
+        stats.record(statement, time.perf_counter() - started)
@@ -5,6 +5,7 @@ import paramiko
 import logging
 import os
 import time
+from utils.metrics import ssh_connect
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
@@ -76,7 +77,7 @@ def get_ssh_connection(host, port=None, username=None, password=None, key_path=N
             raise ValueError("Se requiere contraseña o clave SSH para la conexión")
         
         # Intentar conectar
-        client.connect(**connect_kwargs)
+        ssh_connect(client, "command", **connect_kwargs)
         logger.info(f"Conexión SSH establecida con {host}")
         
         return client